@@ -0,0 +1,182 @@
+# 相手の手札の推定（誰がどのカードを持っていそうか）
+#
+# 全員に見えている情報（場札・捨て札・各自の枚数・出した / 引いた）だけから、
+#   weight[p][c] ∝ 「p がカード c を持っている確率」
+# を席ごとにカード枚数 + 1 要素（index 0 は未使用。1組なら 53 要素）で持つ。
+#   ・出した   : そのカードは誰の手札にも無い（見えるカードになる）
+#   ・引いた   : 手札が2枚以上で引いた＝場札と同じマーク / 数字のカードを1枚も持っていなかった
+#                → それらを 0 にしてから、合計を手札の枚数に合わせ、
+#                  山から来た1枚ぶん（見えていないカードに一様）を足す：p + (1 - p) / free
+#   ・山札補充 : 捨て札が見えないカードに戻る（山札にあるので、誰の手札にも無い）
+#
+# 「一様に足す」は全カードに同じ変換 p → A*p + B をかけることなので、
+# 席ごとに weight = scale * raw + offset の形で持ち、scale / offset だけ書き換える。
+# おかげで引いたときの更新は「場札に出せるカード（16枚）を 0 にする」だけで済む。
+# 近似：引いたカードの行き先を考えるとき、他の人の手札との重なりは見ない。
+
+from __future__ import annotations
+
+from typing import Optional
+
+from cardtable import N_CARDS, RANK, playable_cards_for
+
+class _Seat:
+    """1人ぶんの重み（pool にあるカード c の重み = scale * raw[c] + offset）"""
+    __slots__ = ("raw", "scale", "offset", "raw_sum")
+
+    def __init__(self, raw: list[float], raw_sum: float):
+        self.raw = raw
+        self.scale = 1.0
+        self.offset = 0.0
+        self.raw_sum = raw_sum  # pool にあるカードの raw の合計
+
+    def copy(self) -> "_Seat":
+        s = _Seat(self.raw[:], self.raw_sum)
+        s.scale = self.scale
+        s.offset = self.offset
+        return s
+
+    def zero_raw(self) -> float:
+        """重み 0 に当たる raw の値"""
+        return -self.offset / self.scale
+
+
+class HandBelief:
+    """
+    GameState が play / draw / deal / 山札補充 をためておき、state.belief を読んだときにまとめて反映する。
+    自分の手札は問い合わせのときに exclude で渡して除く。
+    """
+    __slots__ = ("seats", "pool", "pool_size", "playable")
+
+    def __init__(self, players=(), n_cards: int = N_CARDS):
+        self.seats: dict[str, _Seat] = {p: _Seat([0.0] * (n_cards + 1), 0.0) for p in players}
+        # pool[c] = 誰にも見えていない（だれかの手札 or 山札にある）
+        self.pool = [False] * (n_cards + 1)
+        self.pool_size = 0
+        # playable[field] = 場札 field に出せるカード（この卓の組数の分だけ）
+        self.playable = playable_cards_for(n_cards // N_CARDS)
+
+    def reset(self, field: Optional[int] = None, discard=()):
+        """配り直し（見えているのは field と discard だけ）。全員の重みを一様に戻す"""
+        n = len(self.pool) - 1
+        pool = [False] + [True] * n
+        row = [0.0] + [1.0] * n
+        for c in discard:
+            pool[c] = False
+            row[c] = 0.0
+            n -= 1
+        if field is not None:
+            pool[field] = False
+            row[field] = 0.0
+            n -= 1
+        self.pool = pool
+        self.pool_size = n
+        for p in self.seats:
+            self.seats[p] = _Seat(row[:], float(n))
+
+    def copy(self) -> "HandBelief":
+        b = HandBelief.__new__(HandBelief)
+        b.seats = {p: s.copy() for p, s in self.seats.items()}
+        b.pool = self.pool[:]
+        b.pool_size = self.pool_size
+        b.playable = self.playable
+        return b
+
+    @property
+    def weights(self) -> dict[str, list[float]]:
+        """席ごとの重み（JSON 用。pool に無いカードは 0）"""
+        return {p: self._weights(s) for p, s in self.seats.items()}
+
+    @weights.setter
+    def weights(self, data: dict[str, list[float]]):
+        pool = self.pool
+        for p, w in data.items():
+            raw = [x if inp else 0.0 for x, inp in zip(w, pool)]
+            self.seats[p] = _Seat(raw, sum(raw))
+
+    def _weights(self, s: _Seat) -> list[float]:
+        a, b = s.scale, s.offset
+        return [a * x + b if inp else 0.0 for x, inp in zip(s.raw, self.pool)]
+
+    # ===== 更新 =====
+    def play(self, c: int):
+        """カード c が場に出た"""
+        if not self.pool[c]:
+            return
+        self.pool[c] = False
+        self.pool_size -= 1
+        for s in self.seats.values():
+            s.raw_sum -= s.raw[c]
+
+    def draw(self, player: str, field: Optional[int], hand_size: int):
+        """player が山から1枚引いた（hand_size は引く前の枚数）"""
+        s = self.seats[player]
+        raw = s.raw
+        pool = self.pool
+        # 残り1枚は出せないので、引いても何も分からない
+        if hand_size >= 2 and field is not None:
+            z = s.zero_raw()
+            for c in self.playable[field]:
+                if pool[c]:
+                    s.raw_sum += z - raw[c]
+                    raw[c] = z
+
+        # 合計を hand_size に合わせて（k 倍）、引いた1枚ぶんを一様に足す（(1 - p) / free）
+        total = s.scale * s.raw_sum + s.offset * self.pool_size
+        k = hand_size / total if total > 0 else 0.0
+        free = self.pool_size - hand_size
+        b = 1.0 / free if free > 0 else 0.0
+        a = (1.0 - b) * k
+        s.scale *= a
+        s.offset = s.offset * a + b
+        if not (1e-9 < s.scale < 1e9):
+            self._flatten(s)
+
+    def refill(self, cards):
+        """捨て札 cards が山札に戻った（見えなくなるが、山札にあるので手札の重みは 0）"""
+        pool = self.pool
+        seats = list(self.seats.values())
+        for c in cards:
+            if pool[c]:
+                continue
+            pool[c] = True
+            self.pool_size += 1
+            for s in seats:
+                z = s.zero_raw()
+                s.raw[c] = z
+                s.raw_sum += z
+
+    def _flatten(self, s: _Seat):
+        """scale / offset を raw に書き戻す（桁あふれ対策）"""
+        s.raw = self._weights(s)
+        s.raw_sum = sum(s.raw)
+        s.scale = 1.0
+        s.offset = 0.0
+
+    # ===== 問い合わせ =====
+    def probabilities(self, player: str, hand_size: int, exclude=()) -> list[float]:
+        """
+        probs[c] = player がカード c を持っている確率（合計はおよそ hand_size、1 を超えた分は切る）
+        exclude: 問い合わせる人から見えているカード（自分の手札など）
+        """
+        w = self._weights(self.seats[player])
+        for c in exclude:
+            w[c] = 0.0
+        s = sum(w)
+        if s <= 0 or hand_size <= 0:
+            return [0.0] * len(w)
+        k = hand_size / s
+        return [x * k if x * k < 1.0 else 1.0 for x in w]
+
+    def rank_weights(self, player: str, hand_size: int, exclude=()) -> list[float]:
+        """counts[r] = player が持っている数字 r の枚数の期待値（index 0 は未使用）"""
+        probs = self.probabilities(player, hand_size, exclude)
+        counts = [0.0] * 14
+        for c in range(1, len(probs)):
+            counts[RANK[c]] += probs[c]
+        return counts
+
+    def expected_total(self, player: str, hand_size: int, exclude=()) -> float:
+        """player の手札の合計（数字）の期待値"""
+        probs = self.probabilities(player, hand_size, exclude)
+        return sum(probs[c] * RANK[c] for c in range(1, len(probs)))
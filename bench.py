@@ -0,0 +1,241 @@
+# CPU の思考とエンジンの基本操作のベンチマーク（ヘッドレス・Pyodide 不要）
+#
+#   python bench.py                 # 計測して bench_baseline.json と比べる（遅くなっていたら終了コード 1）
+#   python bench.py --save          # いまの結果を基準として保存
+#   python bench.py --threshold 0.3 # 基準より 30% 以上遅ければ失敗（既定 25%）
+#
+# 局面は seed 固定の対戦から集めた「CPU の手番の局面」なので、毎回同じものを測る。
+# 各項目は --repeat 回測っていちばん速い回を使う（他のプロセスの影響を減らす）。
+# 基準値はマシンごとに違うので、比べるのは同じマシンで --save したものとだけ。
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from typing import Callable
+
+from cpu import (
+    choose_card_lv1,
+    choose_card_lv2,
+    choose_card_lv3,
+    danger_score_for_target,
+)
+from decision_cache import DecisionCache
+from engine import (
+    DEFAULT_POLICIES,
+    GameState,
+    can_play,
+    check_interrupt,
+    play_game,
+    play_turn,
+    policy_lv1,
+)
+from odds import dobon_probability, sum_ways
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+def build_corpus(n_positions: int, seed: int) -> list[GameState]:
+    """seed 固定の lv1 同士の対戦から、手札2枚以上の人の手番の局面を n_positions 個集める"""
+    state = GameState(seed=seed)
+    seats = ("you",)
+    corpus = []
+    while len(corpus) < n_positions:
+        state.deal()
+        while not state.game_over and len(corpus) < n_positions:
+            p = state.current_player
+            if len(state.hands[p]) >= 2 and state.has_playable(p):
+                corpus.append(state.copy())
+            play_turn(state, policy_lv1)
+            if state.game_over or check_interrupt(state, seats):
+                break
+            state.next_player()
+    return corpus
+
+def lv3_args(state: GameState) -> dict:
+    """policy_lv3 と同じ引数（「あなた」の枚数は別枠）"""
+    p = state.current_player
+    others = [len(state.hands[q]) for q in state.turn_order if q not in (p, "you")]
+    you = len(state.hands["you"]) if p != "you" else others.pop(0)
+    return {
+        "discard": state.discard,
+        "you_hand_count": you,
+        "other_counts": others,
+        "keep_field_bias": True,
+        "stats": state.stats[p],
+        "seen": state.seen,
+    }
+
+def make_cases(corpus: list[GameState]) -> dict[str, Callable[[], int]]:
+    """名前 -> 局面を1周ぶん呼んで、呼んだ回数を返す関数"""
+    lv12 = [(s.hands[s.current_player], s.field, s.stats[s.current_player]) for s in corpus]
+    lv3 = [(s.hands[s.current_player], s.field, lv3_args(s)) for s in corpus]
+    pairs = [(c, s.field) for s in corpus for c in s.hands[s.current_player]]
+    danger = [
+        (target, a["you_hand_count"], a["other_counts"], a["discard"], s.field, a["seen"])
+        for s, (_, _, a) in zip(corpus, lv3)
+        for target in range(1, 14)  # 場札になりうる数字を全部
+    ]
+
+    def run_can_play():
+        for c, f in pairs:
+            can_play(c, f)
+        return len(pairs)
+
+    def run_lv1():
+        for hand, field, _ in lv12:
+            choose_card_lv1(hand, field, can_play)
+        return len(lv12)
+
+    def run_lv2():
+        for hand, field, stats in lv12:
+            choose_card_lv2(hand, field, can_play, stats=stats)
+        return len(lv12)
+
+    def run_lv3():
+        for hand, field, kw in lv3:
+            choose_card_lv3(hand, field, can_play, **kw)
+        return len(lv3)
+
+    def run_lv3_exact():
+        # 確率表のキャッシュは毎回空から（同じ局面ばかり測って速く見えないように）
+        sum_ways.cache_clear()
+        dobon_probability.cache_clear()
+        for hand, field, kw in lv3:
+            choose_card_lv3(hand, field, can_play, exact_danger=True, **kw)
+        return len(lv3)
+
+    # 置換表を通した lv2 / lv3。表は毎回空から（全部当たる速さではなく、局面の重なりの分だけ当たる実際の速さ）
+    def run_cached_lv2():
+        decisions = DecisionCache()
+        for hand, field, stats in lv12:
+            decisions.lv2(hand, field, can_play, stats=stats)
+        return len(lv12)
+
+    def run_cached_lv3():
+        decisions = DecisionCache()
+        for hand, field, kw in lv3:
+            decisions.lv3(hand, field, can_play, **kw)
+        return len(lv3)
+
+    def run_cached_lv3_exact():
+        sum_ways.cache_clear()
+        dobon_probability.cache_clear()
+        decisions = DecisionCache()
+        for hand, field, kw in lv3:
+            decisions.lv3(hand, field, can_play, exact_danger=True, **kw)
+        return len(lv3)
+
+    def run_danger():
+        for target, you, others, discard, field, seen in danger:
+            danger_score_for_target(target, you, others, discard, field, seen)
+        return len(danger)
+
+    return {
+        "can_play": run_can_play,
+        "choose_card_lv1": run_lv1,
+        "choose_card_lv2": run_lv2,
+        "choose_card_lv3": run_lv3,
+        "choose_card_lv3_exact": run_lv3_exact,
+        "decision_cache_lv2": run_cached_lv2,
+        "decision_cache_lv3": run_cached_lv3,
+        "decision_cache_lv3_exact": run_cached_lv3_exact,
+        "danger_score_for_target": run_danger,
+    }
+
+def time_case(fn: Callable[[], int], repeat: int) -> float:
+    """ns/call（repeat 回のうち最速）"""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter_ns()
+        calls = fn()
+        best = min(best, (time.perf_counter_ns() - t0) / calls)
+    return best
+
+def time_games(n_games: int, seed: int, repeat: int) -> float:
+    """既定の CPU 構成（あなた = lv1）で n_games 対戦したときの games/sec（最速の回）"""
+    policies = dict(DEFAULT_POLICIES)
+    policies["you"] = policy_lv1
+    best = 0.0
+    for _ in range(repeat):
+        state = GameState(seed=seed)
+        t0 = time.perf_counter()
+        for _ in range(n_games):
+            play_game(state, policies)
+        best = max(best, n_games / (time.perf_counter() - t0))
+    return best
+
+def run_bench(*, positions: int = 2000, games: int = 1000, seed: int = 1, repeat: int = 5) -> dict:
+    corpus = build_corpus(positions, seed)
+    ns_per_call = {name: time_case(fn, repeat) for name, fn in make_cases(corpus).items()}
+    return {
+        "python": platform.python_version(),
+        "positions": positions,
+        "games": games,
+        "seed": seed,
+        "ns_per_call": ns_per_call,
+        "games_per_sec": time_games(games, seed, repeat),
+    }
+
+def compare(res: dict, base: dict, threshold: float) -> list[str]:
+    """基準より threshold 以上遅くなった項目の説明（無ければ空）"""
+    slow = []
+    for name, ns in res["ns_per_call"].items():
+        old = base.get("ns_per_call", {}).get(name)
+        if old and ns > old * (1 + threshold):
+            slow.append(f"{name}: {old:.0f} -> {ns:.0f} ns/call")
+    old = base.get("games_per_sec")
+    if old and res["games_per_sec"] * (1 + threshold) < old:
+        slow.append(f"full game: {old:.0f} -> {res['games_per_sec']:.0f} games/sec")
+    return slow
+
+def format_report(res: dict, base: dict) -> str:
+    lines = [f"{'benchmark':<26} {'ns/call':>10} {'baseline':>10} {'ratio':>7}"]
+    for name, ns in res["ns_per_call"].items():
+        old = base.get("ns_per_call", {}).get(name)
+        ratio = f"{ns / old:>6.2f}x" if old else ""
+        lines.append(f"{name:<26} {ns:>10.0f} {old or 0:>10.0f} {ratio:>7}")
+    old = base.get("games_per_sec")
+    ratio = f"{old / res['games_per_sec']:>6.2f}x" if old else ""
+    lines.append(f"{'full game (games/sec)':<26} {res['games_per_sec']:>10.0f} {old or 0:>10.0f} {ratio:>7}")
+    return "\n".join(lines)
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="DOBON benchmarks")
+    ap.add_argument("--positions", type=int, default=2000, help="局面の数")
+    ap.add_argument("--games", type=int, default=1000, help="対戦速度を測るゲーム数")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--threshold", type=float, default=0.25, help="これ以上遅くなったら失敗（割合）")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--save", action="store_true", help="結果を基準として保存する")
+    ap.add_argument("--json", action="store_true", help="結果を JSON で出力")
+    args = ap.parse_args(argv)
+
+    res = run_bench(positions=args.positions, games=args.games, seed=args.seed, repeat=args.repeat)
+
+    base = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            base = json.load(f)
+
+    print(json.dumps(res, ensure_ascii=False) if args.json else format_report(res, base))
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(res, f, ensure_ascii=False, indent=2)
+        print(f"saved: {args.baseline}", file=sys.stderr)
+        return 0
+
+    if base and base.get("python") != res["python"]:
+        print(f"note: baseline was measured on Python {base.get('python')}", file=sys.stderr)
+    slow = compare(res, base, args.threshold)
+    for line in slow:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if slow else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,90 @@
 // cards.js
 // c0.svg = 裏面
 // c1.svg ～ c52.svg = 表面カード
+//
+// 起動時に 53 枚ぶんの画像を1回だけ取りに行き、object URL にしてデコードまで済ませておく。
+// 以降の getUrl() はその object URL を返すので、ゲーム中の差し替えは通信もデコードも無し。
+// 全部を待たなくても、whenLoaded([...]) で画面に出すカードだけ待てる（残りは裏で読み続ける）。
+//
+// 画像の置き場所は <script src="cards.js" data-base-url="cards_img/"> で変えられる（同梱コピー用）。
+// 1枚のスプライトシートから切り出す場合は data-sprite="cards.png" data-sprite-cols="13"
+// （並びは c0, c1, ... c52 の順で左上から、セルの大きさは画像の幅 / cols で決める）。
 
 (function () {
 
-  const BASE_URL = "https://mone847.github.io/cards_assets/cards_img/";
+  const script = document.currentScript;
+  const opts = (script && script.dataset) || {};
+
+  const DEFAULT_BASE_URL = "https://mone847.github.io/cards_assets/cards_img/";
 
   const TOTAL_CARDS = 52;  // 表面は1～52
 
+  const objectUrls = {};   // index -> object URL（読み込み済みのもの）
+  const decoded = {};      // index -> デコード済みの Image（参照を持っておくとデコード結果が捨てられにくい）
+  const loading = {};      // index -> 読み込みが終わったら resolve する Promise（失敗しても resolve）
+
+  let readyPromise = null;
+
+  function remoteUrl(index) {
+    return window.cards.baseUrl + "c" + index + ".svg";
+  }
+
+  function decodeImage(url) {
+    const img = new Image();
+    img.src = url;
+    return img.decode().then(function () { return img; });
+  }
+
+  // 1枚ずつ取ってくる（svg）
+  function loadOne(index) {
+    return fetch(remoteUrl(index))
+      .then(function (res) {
+        if (!res.ok) throw new Error("HTTP " + res.status);
+        return res.blob();
+      })
+      .then(function (blob) {
+        const url = URL.createObjectURL(blob);
+        return decodeImage(url).then(function (img) {
+          objectUrls[index] = url;
+          decoded[index] = img;
+        });
+      });
+  }
+
+  // スプライトシートから全部切り出す（png）
+  function loadSprite(src, cols) {
+    return decodeImage(src).then(function (sheet) {
+      const cellW = Math.floor(sheet.naturalWidth / cols);
+      const rows = Math.ceil((TOTAL_CARDS + 1) / cols);
+      const cellH = Math.floor(sheet.naturalHeight / rows);
+      const canvas = document.createElement("canvas");
+      canvas.width = cellW;
+      canvas.height = cellH;
+      const ctx = canvas.getContext("2d");
+
+      const jobs = [];
+      for (let i = 0; i <= TOTAL_CARDS; i++) {
+        ctx.clearRect(0, 0, cellW, cellH);
+        ctx.drawImage(sheet, (i % cols) * cellW, Math.floor(i / cols) * cellH, cellW, cellH, 0, 0, cellW, cellH);
+        jobs.push(new Promise(function (resolve) {
+          const index = i;
+          canvas.toBlob(function (blob) {
+            if (!blob) { resolve(); return; }
+            const url = URL.createObjectURL(blob);
+            decodeImage(url).then(function (img) {
+              objectUrls[index] = url;
+              decoded[index] = img;
+            }).catch(function () {}).then(resolve);
+          });
+        }));
+      }
+      return Promise.all(jobs);
+    });
+  }
+
   window.cards = {
 
-    baseUrl: BASE_URL,
+    baseUrl: opts.baseUrl || DEFAULT_BASE_URL,
 
     total: TOTAL_CARDS,
 
@@ -19,6 +93,7 @@
      * @param {number} index
      * 0 = 裏面 (c0.svg)
      * 1～52 = 表面 (c1.svg～c52.svg)
+     * 読み込み済みなら object URL、まだなら元の URL
      */
     getUrl: function (index) {
 
@@ -32,9 +107,62 @@
         return "";
       }
 
-      return BASE_URL + "c" + index + ".svg";
+      return objectUrls[index] || remoteUrl(index);
+    },
+
+    /**
+     * 53 枚をまとめて読み込んでデコードする（何回呼んでも1回だけ）
+     * 失敗したカードは元の URL のまま使う
+     * @returns {Promise<number>} 読み込めた枚数
+     */
+    preloadAll: function () {
+      if (readyPromise) return readyPromise;
+
+      let job;
+      if (opts.sprite) {
+        job = loadSprite(opts.sprite, parseInt(opts.spriteCols || "13", 10));
+        const done = job.catch(function () {});
+        for (let i = 0; i <= TOTAL_CARDS; i++) loading[i] = done;
+      } else {
+        const jobs = [];
+        for (let i = 0; i <= TOTAL_CARDS; i++) {
+          loading[i] = loadOne(i).catch(function (e) {
+            console.warn("card preload failed:", i, e);
+          });
+          jobs.push(loading[i]);
+        }
+        job = Promise.all(jobs);
+      }
+
+      readyPromise = job
+        .catch(function (e) { console.warn("card preload failed:", e); })
+        .then(function () { return Object.keys(objectUrls).length; });
+      return readyPromise;
+    },
+
+    /**
+     * 指定したカードの読み込みが済むまで待つ（失敗したものも待ち終わる）
+     * @param {number[]} indices
+     * @returns {Promise<void>}
+     */
+    whenLoaded: function (indices) {
+      this.preloadAll();
+      const jobs = [];
+      for (let k = 0; k < indices.length; k++) jobs.push(loading[indices[k]]);
+      return Promise.all(jobs).then(function () {});
+    },
+
+    /** 読み込み済みか */
+    isLoaded: function (index) {
+      return !!objectUrls[index];
     }
 
   };
 
-})();
\ No newline at end of file
+  // Pyodide の起動と並行して読み込み始める
+  window.cards.ready = window.cards.preloadAll();
+
+  // main.py は window.cards が無ければこのイベントを待つ（ポーリングしない）
+  window.dispatchEvent(new Event("cards:bridge"));
+
+})();
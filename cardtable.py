@@ -0,0 +1,92 @@
+# カード番号 → 数字・マーク・表示名・出せるかどうか の早見表
+# c1..c52 の並びは「♣→♦→♥→♠（各A..K）」、0 は裏面（どれにも当てはまらない）
+# 毎回 divmod やリスト生成をしないよう、import 時に1回だけ作っておく
+#
+# 複数デッキのときは 2 組目が c53..c104、3 組目が c105..c156 … と続く（中身は c1..c52 と同じ）。
+# ensure_decks(n) で表を n 組ぶんまで伸ばす（リストはその場で伸ばすので、import 済みの名前もそのまま使える）
+
+N_CARDS = 52   # 1組の枚数
+MAX_DECKS = 4  # カード番号は1バイト（ログ・snapshot）に収める
+SUITS = ["C", "D", "H", "S"]  # ♣ ♦ ♥ ♠
+SUIT_SYMBOLS = {"C": "♣", "D": "♦", "H": "♥", "S": "♠"}
+
+CARD_IDS = range(1, N_CARDS + 1)
+
+# RANK[c] = 1..13 / SUIT[c] = 0..3（index 0 は裏面用のダミー）
+RANK = [0]
+SUIT = [-1]
+SUIT_LETTER = [""]
+SUIT_RANK = [("", 0)]
+LABEL = [""]
+
+# CAN_PLAY[field][card] : 場札 field に card を出せるか（同じマーク or 同じ数字）
+CAN_PLAY = [[False]]
+
+# PLAYABLE_MASK[field] : 出せるカードの集合（card c → bit (c-1)）
+# BitHand.mask と AND すれば「出せる手札」が1回で分かる
+PLAYABLE_MASK = [0]
+
+# PLAYABLE_CARDS[field] : 出せるカードの番号（順に回したいとき用）
+PLAYABLE_CARDS = [()]
+# 組数ごとの PLAYABLE_CARDS（その組数のカード番号だけ）。表を伸ばしたあとも、少ない組数の卓はこちらを使う
+_PLAYABLE_BY_DECKS: dict[int, list[tuple[int, ...]]] = {}
+
+def deck_cards(decks: int = 1) -> range:
+    """decks 組ぶんのカード番号"""
+    return range(1, N_CARDS * decks + 1)
+
+def ensure_decks(decks: int) -> None:
+    """表を decks 組ぶんまで伸ばす（もう足りていれば何もしない）"""
+    if not (1 <= decks <= MAX_DECKS):
+        raise ValueError(f"decks must be 1..{MAX_DECKS}: {decks}")
+    old = len(RANK) - 1
+    total = N_CARDS * decks
+    if total <= old:
+        return
+
+    new_ids = range(old + 1, total + 1)
+    for c in new_ids:
+        base = (c - 1) % N_CARDS
+        r = base % 13 + 1
+        s = base // 13
+        RANK.append(r)
+        SUIT.append(s)
+        SUIT_LETTER.append(SUITS[s])
+        SUIT_RANK.append((SUITS[s], r))
+        LABEL.append(f"{SUIT_SYMBOLS[SUITS[s]]}{r}")
+
+    ids = range(1, total + 1)
+    for f, row in enumerate(CAN_PLAY):
+        if f == 0:
+            row.extend([False] * len(new_ids))
+        else:
+            row.extend([SUIT[c] == SUIT[f] or RANK[c] == RANK[f] for c in new_ids])
+    for f in new_ids:
+        CAN_PLAY.append([False] + [SUIT[c] == SUIT[f] or RANK[c] == RANK[f] for c in ids])
+
+    masks = [0]
+    cards = [()]
+    for f in ids:
+        row = CAN_PLAY[f]
+        playable = tuple(c for c in ids if row[c])
+        m = 0
+        for c in playable:
+            m |= 1 << (c - 1)
+        masks.append(m)
+        cards.append(playable)
+    PLAYABLE_MASK[:] = masks
+    PLAYABLE_CARDS[:] = cards
+    _PLAYABLE_BY_DECKS[decks] = cards
+
+def playable_cards_for(decks: int) -> list[tuple[int, ...]]:
+    """decks 組の卓で使う PLAYABLE_CARDS（それより多い組数の番号は含まない）"""
+    table = _PLAYABLE_BY_DECKS.get(decks)
+    if table is None:
+        ensure_decks(decks)
+        limit = N_CARDS * decks
+        table = _PLAYABLE_BY_DECKS[decks] = [
+            tuple(c for c in PLAYABLE_CARDS[f] if c <= limit) for f in range(limit + 1)
+        ]
+    return table
+
+ensure_decks(1)
@@ -1,17 +1,24 @@
 # CPUの思考ロジック（レベル別）
 
+from collections import Counter
+from typing import Callable, Optional, Sequence
+
+from cardtable import RANK, SUIT
+from handstats import BitHand, SeenTracker
+from odds import any_dobon_probability_by_size, unseen_counts
+
 def rank_of(card_id: int) -> int:
-    return ((card_id - 1) % 13) + 1  # 1..13
+    return RANK[card_id]  # 1..13
 
 def suit_of(card_id: int) -> int:
-    return (card_id - 1) // 13  # 0..3
+    return SUIT[card_id]  # 0..3
 
 def total_rank(hand: list[int]) -> int:
-    return sum(rank_of(c) for c in hand)
+    return sum(RANK[c] for c in hand)
 
+# ---- リスト版（参照実装）：BitHand の結果はこれと一致させる ----
 def count_pairs_by_rank(hand: list[int]) -> int:
     """同じ数字のペア数（例：5が2枚なら1、5が3枚なら1扱いでもOK。ここは“2枚組”で数える）"""
-    from collections import Counter
     cnt = Counter(rank_of(c) for c in hand)
     return sum(v // 2 for v in cnt.values())
 
@@ -34,25 +41,80 @@ def choose_card_lv1(hand: list[int], field: int, can_play: Callable[[int, int],
     playable = [c for c in hand if can_play(c, field)]
     if not playable:
         return None
-    playable.sort(key=lambda c: rank_of(c), reverse=True)
+    playable.sort(key=lambda c: RANK[c], reverse=True)
     return playable[0]
 
-# ===== lv2 用 =====
-
-def count_pairs_by_rank(hand: list[int]) -> int:
-    from collections import Counter
-    cnt = Counter(rank_of(c) for c in hand)
-    return sum(v // 2 for v in cnt.values())
+# ===== 点数の重み =====
+# lv2 / lv3 の点数に使う係数。名前 → 既定値 の順番がそのまま重みベクトルの並びになる。
+# 関数には tuple（weights_vector() で作る）で渡し、関数の最初に1回だけローカル変数に展開する。
+# 符号は式の側に書いてあるので、値はどれも「効きの大きさ」（tune.py が探索する）。
+LV2_WEIGHTS: dict[str, float] = {
+    "zone_bonus": 5000,     # 合計がドボン圏（1..13）に入る
+    "zone_slope": 15,       # 圏内で合計が小さいほど
+    "out_penalty": 5000,    # 圏外
+    "out_slope": 50,        # 圏外で 13 を超えた分
+    "rank_discard": 30,     # 大きいカードを切る
+    "pair_make": 250,
+    "pair_break": 350,
+    "split_make": 120,
+    "split_break": 120,
+    "keep_field": 180,      # keep_field 版で同じ数字を出す
+    "total_drop": 8,        # 合計が減った分
+}
+
+# danger_score_for_target の重み（lv3 の重みベクトルの後ろに続く）
+DANGER_WEIGHTS: dict[str, float] = {
+    "you_le2": 900,         # 「あなた」の残り枚数
+    "you_le3": 500,
+    "you_le4": 250,
+    "other_le2": 600,       # 他の相手の残り枚数
+    "other_le3": 300,
+    "target_le5": 260,      # 場の数字が小さいほどドボンされやすい
+    "target_le8": 120,
+    "remain": 90,           # その数字がまだ見えていない枚数
+}
+
+LV3_WEIGHTS: dict[str, float] = {
+    "zone_bonus": 7000,
+    "zone_slope": 20,
+    "zone_le5": 2000,
+    "zone_le8": 800,
+    "out_penalty": 6000,
+    "out_slope": 60,
+    "has_pair": 280,        # 出した後にペアがある
+    "has_split": 180,       # 出した後に分割体制がある
+    "pair_make": 260,
+    "pair_break": 400,
+    "split_make": 150,
+    "split_break": 150,
+    "rank_discard": 28,
+    "total_drop": 10,
+    "danger_in_zone": 0.4,  # ドボン圏に入ったら危険度をこれだけに割り引く（少し攻める）
+    "danger_out": 1.0,
+    "keep_field": 90,
+    **{f"danger.{k}": v for k, v in DANGER_WEIGHTS.items()},
+}
+
+WEIGHT_NAMES: dict[str, tuple[str, ...]] = {
+    "lv2": tuple(LV2_WEIGHTS),
+    "lv3": tuple(LV3_WEIGHTS),
+}
+
+def weights_vector(level: str, profile: Optional[dict[str, float]] = None) -> tuple[float, ...]:
+    """{名前: 値}（足りない名前は既定値）→ choose_card_lv2 / lv3 に渡す tuple"""
+    defaults = LV2_WEIGHTS if level == "lv2" else LV3_WEIGHTS
+    profile = profile or {}
+    unknown = set(profile) - set(defaults)
+    if unknown:
+        raise ValueError(f"unknown {level} weights: {', '.join(sorted(unknown))}")
+    return tuple(profile.get(k, v) for k, v in defaults.items())
+
+LV2_DEFAULT = weights_vector("lv2")
+LV3_DEFAULT = weights_vector("lv3")
+DANGER_DEFAULT = tuple(DANGER_WEIGHTS.values())
+_LV3_MAIN = len(LV3_WEIGHTS) - len(DANGER_WEIGHTS)  # lv3 の重みのうち danger 以外の数
 
-def has_split_sum_structure(hand: list[int]) -> bool:
-    ranks = [rank_of(c) for c in hand]
-    s = set(ranks)
-    for t in range(2, 14):
-        for a in range(1, t):
-            b = t - a
-            if a in s and b in s:
-                return True
-    return False
+# ===== lv2 用 =====
 
 def choose_card_lv2(
     hand: list[int],
@@ -60,41 +122,44 @@ def choose_card_lv2(
     can_play: Callable[[int, int], bool],
     *,
     keep_field: bool = False,
+    stats: Optional[BitHand] = None,
+    weights: Optional[tuple[float, ...]] = None,
 ) -> Optional[int]:
     """
     lv2（中）: “ドボン圏(合計1..13)に寄せる” + “体制(ペア/分割)を崩しにくい” + “大きいカードを優先して捨てる”
     keep_field=True にすると「場を動かさない」寄り（同じ数字を出す）を強める
+    stats: hand の集計（GameState が持っているもの）。無ければここで作る
+    weights: weights_vector("lv2", ...) の重み。無ければ LV2_WEIGHTS の既定値
     """
     if field is None:
         return None
+    (
+        zone_bonus, zone_slope, out_penalty, out_slope, rank_discard,
+        pair_make, pair_break, split_make, split_break, keep_field_bonus, total_drop,
+    ) = weights or LV2_DEFAULT
 
     playable = [c for c in hand if can_play(c, field)]
     if not playable:
         return None
 
-    field_rank = rank_of(field)
+    field_rank = RANK[field]
 
     # 現在の“体制”を把握（これを減らしにくい手を好む）
-    base_pairs = count_pairs_by_rank(hand)
-    base_split = has_split_sum_structure(hand)
-    base_total = total_rank(hand)
+    bh = stats if stats is not None else BitHand(hand)
+    base_pairs = bh.pairs
+    base_split = bh.has_split()
+    base_total = bh.total
 
     best = None
     best_score = -10**18
 
     for c in playable:
-        new_hand = hand[:]         # shallow copy
-        new_hand.remove(c)
-
         # ルール上、残り1枚は出せない運用があるので、ここでも保険
-        if len(new_hand) == 0:
+        if bh.count <= 1:
             continue
 
-        new_total = total_rank(new_hand)
-
-        # “体制”変化
-        new_pairs = count_pairs_by_rank(new_hand)
-        new_split = has_split_sum_structure(new_hand)
+        # c を出した後の合計と“体制”変化（手札はコピーしない）
+        new_total, new_pairs, new_split = bh.without(c)
 
         # -------------------------
         # スコア設計（ここがlv2の肝）
@@ -103,56 +168,64 @@ def choose_card_lv2(
 
         # 1) 最重要：合計をドボン圏(1..13)に入れる
         if 1 <= new_total <= 13:
-            score += 5000
+            score += zone_bonus
             # 圏内でも、小さい方が次の調整が効くので少しだけ優遇
-            score += (13 - new_total) * 15
+            score += (13 - new_total) * zone_slope
         else:
             # 圏外は強烈に罰（大きいほどさらに罰）
-            score -= 5000
-            score -= (new_total - 13) * 50
+            score -= out_penalty
+            score -= (new_total - 13) * out_slope
 
         # 2) 大きいカードを切る（合計を下げるのに効く）
-        score += rank_of(c) * 30
+        score += RANK[c] * rank_discard
 
         # 3) “同ランクペア”を残す（体制維持）
         if new_pairs > base_pairs:
-            score += 250
+            score += pair_make
         elif new_pairs < base_pairs:
-            score -= 350  # ペアを壊すのは嫌
+            score -= pair_break  # ペアを壊すのは嫌
 
         # 4) “分割体制”を残す（軽いボーナス）
         if (not base_split) and new_split:
-            score += 120
+            score += split_make
         elif base_split and (not new_split):
-            score -= 120
+            score -= split_break
 
         # 5) 「場を動かさない」版（任意）
         # 同じ数字を出す＝次の人に“合わせやすい”面もあるので、強すぎない加点にしている
-        if keep_field and rank_of(c) == field_rank:
-            score += 180
+        if keep_field and RANK[c] == field_rank:
+            score += keep_field_bonus
 
         # 6) 追加：合計を下げる方向を好む（現状より合計が減るほど加点）
-        score += (base_total - new_total) * 8
+        score += (base_total - new_total) * total_drop
 
         # tie-break：同点なら「より大きいカードを出す」を優先
-        if (score > best_score) or (score == best_score and (best is None or rank_of(c) > rank_of(best))):
+        if (score > best_score) or (score == best_score and (best is None or RANK[c] > RANK[best])):
             best_score = score
             best = c
 
     return best
 
-def choose_card_lv2_keep_field(hand: list[int], field: int, can_play: Callable[[int, int], bool]) -> Optional[int]:
+def choose_card_lv2_keep_field(
+    hand: list[int],
+    field: int,
+    can_play: Callable[[int, int], bool],
+    *,
+    stats: Optional[BitHand] = None,
+    weights: Optional[tuple[float, ...]] = None,
+) -> Optional[int]:
     """lv2の『場を動かさない』寄り版"""
-    return choose_card_lv2(hand, field, can_play, keep_field=True)
+    return choose_card_lv2(hand, field, can_play, keep_field=True, stats=stats, weights=weights)
 
 # ===== lv3 用 =====
 
+# ---- 捨て札を毎回数える版（参照実装）：SeenTracker が無いときに使う ----
 def seen_rank_counts(discard: list[int], field: Optional[int]) -> dict[int, int]:
     counts = {r: 0 for r in range(1, 14)}
     for c in discard:
-        counts[rank_of(c)] += 1
+        counts[RANK[c]] += 1
     if field is not None:
-        counts[rank_of(field)] += 1
+        counts[RANK[field]] += 1
     return counts
 
 def remaining_rank_estimate(rank: int, discard: list[int], field: Optional[int]) -> int:
@@ -163,42 +236,62 @@ def remaining_rank_estimate(rank: int, discard: list[int], field: Optional[int])
 def danger_score_for_target(
     target_rank: int,
     you_hand_count: int,
-    other_counts: list[int],
+    other_counts: Sequence[int],
     discard: list[int],
     field: Optional[int],
+    seen: Optional[SeenTracker] = None,
+    other_size_counts: Optional[dict[int, int]] = None,
+    weights: Optional[tuple[float, ...]] = None,
 ) -> int:
     """
     場を target_rank にしたとき、相手にドボンされる危険度の概算
+    seen があれば残り枚数はそこから引く（discard は数え直さない）
+    other_size_counts: {枚数: 人数}。あれば other_counts の代わりに使う（人数が多い卓でも同じ手間）
+    weights: DANGER_WEIGHTS の並びの重み。無ければ既定値
     """
+    you_le2, you_le3, you_le4, other_le2, other_le3, target_le5, target_le8, remain_w = weights or DANGER_DEFAULT
     danger = 0
 
-    remain = remaining_rank_estimate(target_rank, discard, field)
+    if seen is not None:
+        remain = seen.unseen(target_rank)
+    else:
+        remain = remaining_rank_estimate(target_rank, discard, field)
 
     # 残り枚数が少ない相手ほど危険
     if you_hand_count <= 2:
-        danger += 900
+        danger += you_le2
     elif you_hand_count <= 3:
-        danger += 500
+        danger += you_le3
     elif you_hand_count <= 4:
-        danger += 250
-
-    for n in other_counts:
-        if n <= 2:
-            danger += 600
-        elif n <= 3:
-            danger += 300
+        danger += you_le4
+
+    if other_size_counts is not None:
+        for n, k in other_size_counts.items():
+            if n <= 2:
+                danger += other_le2 * k
+            elif n <= 3:
+                danger += other_le3 * k
+    else:
+        for n in other_counts:
+            if n <= 2:
+                danger += other_le2
+            elif n <= 3:
+                danger += other_le3
 
     # 小さい数字ほどドボンしやすい
     if target_rank <= 5:
-        danger += 260
+        danger += target_le5
     elif target_rank <= 8:
-        danger += 120
+        danger += target_le8
 
     # まだその数字が多く残っているほど危険
-    danger += remain * 90
+    danger += remain * remain_w
 
     return danger
 
+# 確率（0..1）を danger_score_for_target と同じ物差しの点数にする係数
+EXACT_DANGER_SCALE = 6000
+
 def choose_card_lv3(
     hand: list[int],
     field: int,
@@ -206,8 +299,13 @@ def choose_card_lv3(
     *,
     discard: list[int],
     you_hand_count: int,
-    other_counts: list[int],
+    other_counts: Sequence[int] = (),
     keep_field_bias: bool = True,
+    stats: Optional[BitHand] = None,
+    seen: Optional[SeenTracker] = None,
+    exact_danger: bool = False,
+    other_size_counts: Optional[dict[int, int]] = None,
+    weights: Optional[tuple[float, ...]] = None,
 ) -> Optional[int]:
     """
     lv3:
@@ -215,98 +313,125 @@ def choose_card_lv3(
     - 相手の危険度を下げる
     - 場に出たカード(discard + field)を利用して残り数字を推定
     - ただし、ドボン圏に入ったら「攻めモード」に切り替える
+    stats: hand の集計（lv2 と同じ。無ければここで作る）
+    seen: 見えているカードの記録。無ければ discard + field を数える
+    exact_danger: 危険度を概算の点数ではなく「誰かにドボンされる確率」× EXACT_DANGER_SCALE で見る（odds.py）
+    other_size_counts: 「あなた」以外の相手の {枚数: 人数}。あれば other_counts の代わりに使う
+    weights: weights_vector("lv3", ...) の重み（後ろの8個は danger_score_for_target の分）。無ければ既定値
     """
     if field is None:
         return None
+    w = weights or LV3_DEFAULT
+    (
+        zone_bonus, zone_slope, zone_le5, zone_le8, out_penalty, out_slope,
+        has_pair, has_split, pair_make, pair_break, split_make, split_break,
+        rank_discard, total_drop, danger_in_zone, danger_out, keep_field_bonus,
+    ) = w[:_LV3_MAIN]
+    danger_weights = w[_LV3_MAIN:] if weights is not None else None
 
     playable = [c for c in hand if can_play(c, field)]
     if not playable:
         return None
 
-    field_rank = rank_of(field)
-    base_pairs = count_pairs_by_rank(hand)
-    base_split = has_split_sum_structure(hand)
-    base_total = total_rank(hand)
+    field_rank = RANK[field]
+    bh = stats if stats is not None else BitHand(hand)
+    base_pairs = bh.pairs
+    base_split = bh.has_split()
+    base_total = bh.total
+
+    if exact_danger:
+        # 相手に配られうるカード = 見えていないカード - 自分の手札（この手番の間は変わらない）
+        seen_counts = seen.counts if seen is not None else seen_rank_counts(discard, field)
+        copies = seen.copies if seen is not None else 4
+        unseen = unseen_counts(seen_counts, [0] + [bh.rank_count(r) for r in range(1, 14)], copies)
+        if other_size_counts is not None:
+            size_counts = dict(other_size_counts)
+        else:
+            size_counts = {}
+            for n in other_counts:
+                size_counts[n] = size_counts.get(n, 0) + 1
+        size_counts[you_hand_count] = size_counts.get(you_hand_count, 0) + 1
 
     best = None
     best_score = -10**18
 
     for c in playable:
-        new_hand = hand[:]
-        new_hand.remove(c)
-
         # 残り0枚は通常の出し方では不可
-        if len(new_hand) == 0:
+        if bh.count <= 1:
             continue
 
-        new_total = total_rank(new_hand)
-        new_pairs = count_pairs_by_rank(new_hand)
-        new_split = has_split_sum_structure(new_hand)
+        new_total, new_pairs, new_split = bh.without(c)
 
         # このカードを出した後、場の数字は「出したカードの数字」になる
-        next_target = rank_of(c)
+        next_target = RANK[c]
 
         score = 0
 
         # ===== 1. 勝ち筋：ドボン圏へ =====
         if 1 <= new_total <= 13:
             # ドボン圏に入ったら大幅加点
-            score += 7000
-            score += (13 - new_total) * 20
+            score += zone_bonus
+            score += (13 - new_total) * zone_slope
 
             # 小さい数ほどドボンしやすいのでさらに加点
             if new_total <= 5:
-                score += 2000
+                score += zone_le5
             elif new_total <= 8:
-                score += 800
+                score += zone_le8
         else:
             # 圏外は強く減点
-            score -= 6000
-            score -= (new_total - 13) * 60
+            score -= out_penalty
+            score -= (new_total - 13) * out_slope
 
         # 次ターンでドボンしやすい形
         if new_pairs > 0:
-            score += 280
+            score += has_pair
         if new_split:
-            score += 180
+            score += has_split
 
         # ===== 2. 体制維持 =====
         if new_pairs > base_pairs:
-            score += 260
+            score += pair_make
         elif new_pairs < base_pairs:
-            score -= 400
+            score -= pair_break
 
         if (not base_split) and new_split:
-            score += 150
+            score += split_make
         elif base_split and (not new_split):
-            score -= 150
+            score -= split_break
 
         # ===== 3. 大きいカードを切って手札合計を下げる =====
-        score += rank_of(c) * 28
-        score += (base_total - new_total) * 10
+        score += RANK[c] * rank_discard
+        score += (base_total - new_total) * total_drop
 
         # ===== 4. 危険回避 =====
-        danger = danger_score_for_target(
-            next_target,
-            you_hand_count=you_hand_count,
-            other_counts=other_counts,
-            discard=discard,
-            field=field,
-        )
+        if exact_danger:
+            danger = any_dobon_probability_by_size(unseen, size_counts, next_target) * EXACT_DANGER_SCALE
+        else:
+            danger = danger_score_for_target(
+                next_target,
+                you_hand_count=you_hand_count,
+                other_counts=other_counts,
+                discard=discard,
+                field=field,
+                seen=seen,
+                other_size_counts=other_size_counts,
+                weights=danger_weights,
+            )
 
         # ドボン圏に入ったら少し攻める
         if 1 <= new_total <= 13:
-            score -= danger * 0.4
+            score -= danger * danger_in_zone
         else:
-            score -= danger
+            score -= danger * danger_out
 
         # ===== 5. 場を動かさない補正（弱め） =====
-        if keep_field_bias and rank_of(c) == field_rank:
-            score += 90
+        if keep_field_bias and RANK[c] == field_rank:
+            score += keep_field_bonus
 
         # tie-break
         if (score > best_score) or (
-            score == best_score and (best is None or rank_of(c) > rank_of(best))
+            score == best_score and (best is None or RANK[c] > RANK[best])
         ):
             best_score = score
             best = c
@@ -0,0 +1,11 @@
+# CPU の思考用 Web Worker（index.html の <script type="py" worker name="cpu-worker">）
+# main.py の WorkerDecider から呼ばれ、UI スレッドを止めずに考える
+
+import json
+
+from decider import decide_from_dict
+
+def decide(payload: str, player: str, level: str) -> int:
+    return decide_from_dict(json.loads(payload), player, level)
+
+__export__ = ["decide"]
@@ -0,0 +1,95 @@
+# CPU の思考を UI スレッドの外で行うための窓口
+#
+#   chosen = await decider.decide(state, player, level)   # カード or None（None なら山から引く）
+#   decider.cancel()                                       # 考え中の結果を捨てる（ドボン宣言時など）
+#
+# ・InlineDecider : その場で考える（今までと同じ。軽いレベル向け）
+# ・PoolDecider   : スレッド / プロセスプールで考える（ヘッドレス用）
+# ・WorkerDecider : Pyodide の Web Worker（cpu_worker.py）で考える（ブラウザ用）
+# どれも state の複製（to_dict）を渡して考えるので、考え中に本物の state は触らない。
+
+from __future__ import annotations
+
+import asyncio
+import json
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Optional
+
+from engine import DRAW, STRATEGIES, GameState, cpu_choose
+
+def decide_from_dict(data: dict, player: str, level: str) -> int:
+    """ワーカー側で実行する本体（プロセスに渡せるようにモジュール直下に置く）。引くなら DRAW"""
+    state = GameState.from_dict(data)
+    chosen = cpu_choose(state, player, STRATEGIES[level])
+    return DRAW if chosen is None else chosen
+
+
+class InlineDecider:
+    async def decide(self, state: GameState, player: str, level: str) -> Optional[int]:
+        return cpu_choose(state, player, STRATEGIES[level])
+
+    def cancel(self):
+        pass
+
+
+class _PendingDecider:
+    """考え中の future を覚えておき、cancel() でまとめて捨てる"""
+
+    def __init__(self):
+        self._pending: set[asyncio.Future] = set()
+
+    async def _wait(self, fut) -> Optional[int]:
+        fut = asyncio.ensure_future(fut)
+        self._pending.add(fut)
+        try:
+            chosen = await fut
+        finally:
+            self._pending.discard(fut)
+        return None if chosen == DRAW else chosen
+
+    def cancel(self):
+        for fut in list(self._pending):
+            fut.cancel()
+
+
+class PoolDecider(_PendingDecider):
+    """
+    ヘッドレス用。executor を渡さなければスレッド1本で考える。
+    ProcessPoolExecutor を渡せば重いレベルも GIL を気にせず並列に回せる。
+    executor は複数の PoolDecider で共有してよい（server.py は全テーブルで1つのプールを使う）。
+    pool_levels を渡すと、そのレベルだけプールに送り、他はその場で考える
+    （軽いレベルは to_dict とプロセス間の受け渡しの方が考えるより高くつくため）。
+    """
+
+    def __init__(self, executor: Optional[Executor] = None, pool_levels=None):
+        super().__init__()
+        self.executor = executor or ThreadPoolExecutor(max_workers=1)
+        self.pool_levels = None if pool_levels is None else frozenset(pool_levels)
+
+    async def decide(self, state: GameState, player: str, level: str) -> Optional[int]:
+        if self.pool_levels is not None and level not in self.pool_levels:
+            return cpu_choose(state, player, STRATEGIES[level])
+        loop = asyncio.get_running_loop()
+        return await self._wait(
+            loop.run_in_executor(self.executor, decide_from_dict, state.to_dict(), player, level)
+        )
+
+
+class WorkerDecider(_PendingDecider):
+    """
+    ブラウザ用。index.html の <script type="py" worker name="cpu-worker"> に考えさせる。
+    worker 側で計算自体は止められないが、cancel() 後の結果は使わない。
+    """
+
+    def __init__(self, worker):
+        super().__init__()
+        self.worker = worker
+
+    @classmethod
+    async def connect(cls, name: str = "cpu-worker") -> "WorkerDecider":
+        from pyscript import workers  # ブラウザでだけ使う
+        return cls(await workers[name])
+
+    async def decide(self, state: GameState, player: str, level: str) -> Optional[int]:
+        payload = json.dumps(state.to_dict())
+        return await self._wait(self.worker.decide(payload, player, level))
@@ -0,0 +1,295 @@
+# CPU の判断のキャッシュ（置換表）
+#
+# lv2 / lv3 の点数は「カードの数字」と「場札に出せるか」しか見ないので、
+# マークの違い（どのマークが場札と同じか）をならし、点数に効くところだけを残した形を鍵にする。
+# 違う局面でも鍵が同じなら、元の関数は必ず同じ数字を選ぶ。
+#   ・出せる   : 出せるカードの数字の集合（場札のマークのカードの数字 + 場札と同じ数字）
+#                → 場札のマークを1つに固定したのと同じ（マークの入れ替えで同じになる局面は同じ鍵）
+#   ・手札の形 : 合計（どれを出しても圏外なら差は数字だけで決まるので、そこで頭打ち）、出せる数字ごとの枚数の偶奇（ペアが減るか）、1..6 の枚数（2以上は同じ。分割体制）、
+#                ペア数（2以上は同じ。lv3 の「ペアが残るか」）
+#   ・場札     : 数字（「場を動かさない」補正を使い、その数字を持っているときだけ）
+#   ・lv3      : 「あなた」の枚数の段階・他の相手の枚数の段階ごとの人数・出せる数字の残り枚数
+#                （厳密版は相手に配られうる数字ごとの枚数すべてと、相手の枚数の分布）
+# 答えは「出す数字」で覚えておき、取り出すときに手札のうち出せるその数字の最初のカードに戻す
+# （同じ数字のカードは点数が同じで、同点なら大きい数字を選ぶので、元の関数も手札の順で最初のものを選ぶ）。
+#
+# 表は CLOCK（参照ビットで LRU を近似）で大きさを抑える。当たったときは参照ビットを立てるだけ。
+
+from __future__ import annotations
+
+from typing import Optional, Sequence
+
+from cardtable import CAN_PLAY, N_CARDS, RANK, SUIT
+from cpu import choose_card_lv2, choose_card_lv3
+from handstats import RANK_BITS, RANK_LANE, SPLIT_LANES, BitHand, SeenTracker
+
+DEFAULT_CAPACITY = 1 << 16  # 1つの表に覚える局面の数
+_MISS = object()
+
+# 1..6 をちょうど1枚だけ持っているときの hist & SPLIT_LANES
+_ONE_LOW = frozenset(1 << (RANK_BITS * i) for i in range(6))
+
+class ClockCache:
+    """大きさの決まった表。いっぱいになったら CLOCK で追い出す"""
+    __slots__ = ("capacity", "index", "keys", "values", "ref", "hand", "hits", "misses", "evictions")
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError(f"capacity must be >= 1: {capacity}")
+        self.capacity = capacity
+        self.clear()
+
+    def clear(self):
+        self.index: dict = {}   # 鍵 → スロット番号
+        self.keys: list = []
+        self.values: list = []
+        self.ref: list[int] = []  # 参照ビット（当たったら 1、針が通ったら 0）
+        self.hand = 0             # 時計の針
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def get(self, key):
+        i = self.index.get(key)
+        if i is None:
+            self.misses += 1
+            return _MISS
+        self.ref[i] = 1
+        self.hits += 1
+        return self.values[i]
+
+    def put(self, key, value):
+        if len(self.keys) < self.capacity:
+            self.index[key] = len(self.keys)
+            self.keys.append(key)
+            self.values.append(value)
+            self.ref.append(0)
+            return
+        ref = self.ref
+        h = self.hand
+        while ref[h]:
+            ref[h] = 0
+            h = (h + 1) % self.capacity
+        del self.index[self.keys[h]]
+        self.index[key] = h
+        self.keys[h] = key
+        self.values[h] = value
+        self.hand = (h + 1) % self.capacity
+        self.evictions += 1
+
+    def stats(self) -> dict:
+        n = self.hits + self.misses
+        return {
+            "size": len(self.keys),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / n if n else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+def _spread(ranks: int) -> int:
+    """数字の集合（r → bit r-1）を hist の各レーンの一番下のビット（r → bit 8*(r-1)）に広げる"""
+    out = 0
+    for i in range(13):
+        if ranks >> i & 1:
+            out |= 1 << (RANK_BITS * i)
+    return out
+
+_SPREAD = [_spread(m) for m in range(1 << 13)]
+
+def shape_key(bh: BitHand, field: int, keep: bool) -> tuple[int, int]:
+    """
+    (出せるカードの数字の集合（数字 r → bit r-1）, 点数に効く手札の形を1つの整数に詰めた鍵)
+    出せる数字 = 場札のマークのカードの数字 + 場札と同じ数字
+    鍵 = 出せる数字 | 場札の数字(keep のときだけ) | 1..6 の枚数(0/1/2+) | ペア数(0/1/2+) | 合計(頭打ち)
+         | 出せる数字のうち偶数枚持っているもの（それを出すとペアが1つ減る）
+    """
+    hist = bh.hist
+    m = bh.mask >> (13 * SUIT[field])
+    ranks = m & 0x1FFF
+    m >>= N_CARDS  # 2組目以降（同じマークは 52 ずつ先にある）
+    while m:
+        ranks |= m & 0x1FFF
+        m >>= N_CARDS
+    fr = RANK[field]
+    keep_rank = 0
+    if (hist >> (RANK_BITS * (fr - 1))) & RANK_LANE:
+        ranks |= 1 << (fr - 1)
+        if keep:
+            keep_rank = fr
+    if not ranks:
+        return 0, 0
+    # 1..6 が1枚だけなら、それを出すと分割体制が崩れる
+    low = hist & SPLIT_LANES
+    low = 0 if not low else (1 if low in _ONE_LOW else 2)
+    pairs = bh.pairs
+    if pairs > 2:
+        pairs = 2
+    # いちばん大きい数字を出しても 14 以上なら全部圏外。圏外の点数は合計について一次式なので、合計の違いは差に効かない
+    total = bh.total
+    top = ranks.bit_length()
+    if total > 13 + top:
+        total = 14 + top
+    even = ~hist & _SPREAD[ranks]
+    return ranks, ranks | keep_rank << 13 | low << 17 | pairs << 19 | total << 21 | even << 30
+
+def card_of_rank(hand: list[int], field: int, rank: int) -> Optional[int]:
+    """手札のうち、場札に出せる数字 rank の最初のカード"""
+    if not rank:
+        return None
+    row = CAN_PLAY[field]
+    for c in hand:
+        if RANK[c] == rank and row[c]:
+            return c
+    return None
+
+
+
+class DecisionCache:
+    """
+    choose_card_lv2 / choose_card_lv3 と同じ答えを、同じ形の局面では表から返す。
+    weights（重みベクトル）も鍵に入るので、重みの違う CPU が混ざっていてもよい。
+    enabled=False にすると表を使わずにそのまま考える（比べる用）。
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, enabled: bool = True):
+        self.enabled = enabled
+        self.lv2_table = ClockCache(capacity)
+        self.lv3_table = ClockCache(capacity)
+        self.forced = 0  # 出せる数字が1種類しかなく、考えずに決まった回数
+
+    def clear(self):
+        self.lv2_table.clear()
+        self.lv3_table.clear()
+        self.forced = 0
+
+    def stats(self) -> dict:
+        return {"lv2": self.lv2_table.stats(), "lv3": self.lv3_table.stats(), "forced": self.forced}
+
+    def lv2(
+        self,
+        hand: list[int],
+        field: int,
+        can_play,
+        *,
+        keep_field: bool = False,
+        stats: Optional[BitHand] = None,
+        weights=None,
+    ) -> Optional[int]:
+        if not self.enabled or field is None:
+            return choose_card_lv2(hand, field, can_play, keep_field=keep_field, stats=stats, weights=weights)
+        bh = stats if stats is not None else BitHand(hand)
+        ranks, shape = shape_key(bh, field, keep_field)
+        if not ranks or bh.count <= 1:
+            return None
+        if not ranks & (ranks - 1):
+            self.forced += 1
+            return card_of_rank(hand, field, ranks.bit_length())
+        # 鍵は整数1つにする（タプルを大量に持つと GC が表を毎回たどって遅くなる）
+        key = shape if weights is None else (shape, weights)
+        table = self.lv2_table
+        r = table.get(key)
+        if r is _MISS:
+            c = choose_card_lv2(hand, field, can_play, keep_field=keep_field, stats=bh, weights=weights)
+            table.put(key, RANK[c] if c is not None else 0)
+            return c
+        return card_of_rank(hand, field, r)
+
+    def lv3(
+        self,
+        hand: list[int],
+        field: int,
+        can_play,
+        *,
+        discard: list[int],
+        you_hand_count: int,
+        other_counts: Sequence[int] = (),
+        keep_field_bias: bool = True,
+        stats: Optional[BitHand] = None,
+        seen: Optional[SeenTracker] = None,
+        exact_danger: bool = False,
+        other_size_counts: Optional[dict[int, int]] = None,
+        weights=None,
+    ) -> Optional[int]:
+        if not self.enabled or field is None or seen is None:
+            # 見えている枚数を数え直す版は鍵を作るのも同じ手間なので、そのまま考える
+            return choose_card_lv3(
+                hand, field, can_play, discard=discard, you_hand_count=you_hand_count,
+                other_counts=other_counts, keep_field_bias=keep_field_bias, stats=stats, seen=seen,
+                exact_danger=exact_danger, other_size_counts=other_size_counts, weights=weights,
+            )
+        bh = stats if stats is not None else BitHand(hand)
+        ranks, shape = shape_key(bh, field, keep_field_bias)
+        if not ranks or bh.count <= 1:
+            return None
+        if not ranks & (ranks - 1):
+            self.forced += 1
+            return card_of_rank(hand, field, ranks.bit_length())
+
+        if other_size_counts is None:
+            sizes: dict[int, int] = {}
+            for n in other_counts:
+                sizes[n] = sizes.get(n, 0) + 1
+        else:
+            sizes = other_size_counts
+        counts = seen.counts
+        copies = seen.copies
+        if exact_danger:
+            # 厳密版：相手の枚数の分布（あなたも含む）と、相手に配られうる数字ごとの枚数で決まる
+            sizes = dict(sizes)
+            sizes[you_hand_count] = sizes.get(you_hand_count, 0) + 1
+            hist = bh.hist
+            unseen = 0
+            for r in range(1, 14):
+                unseen = unseen * 32 + max(0, copies - counts[r] - ((hist >> (RANK_BITS * (r - 1))) & RANK_LANE))
+            for n, k in sizes.items():
+                unseen |= k << (65 + 4 * n)  # 13 数字 × 5bit の後ろに {枚数: 人数} を 4bit ずつ
+            danger_key = unseen
+        else:
+            # 概算：枚数は段階（2以下 / 3 / 4）、見えている枚数は出せる数字の分だけ
+            # 枚数の分の危険度はどの候補でも同じなので、候補が全部圏内 / 全部圏外なら差に効かない
+            total = bh.total
+            lo = max(1, total - 13)
+            hi = min(13, total - 1)
+            in_zone = ranks & ((1 << hi) - (1 << (lo - 1))) if hi >= lo else 0
+            you = le2 = eq3 = 0
+            if in_zone and in_zone != ranks:
+                you = 2 if you_hand_count <= 2 else min(you_hand_count, 5)
+                for n, k in sizes.items():
+                    if n <= 2:
+                        le2 += k
+                    elif n == 3:
+                        eq3 += k
+            remain = 0
+            m = ranks
+            r = 1
+            while m:
+                if m & 1:
+                    remain = remain * 32 + max(0, copies - counts[r])
+                m >>= 1
+                r += 1
+            danger_key = you | le2 << 3 | eq3 << 7 | remain << 11
+
+        key = shape | danger_key << 128
+        if weights is not None:
+            key = (key, weights)
+        table = self.lv3_table
+        r = table.get(key)
+        if r is _MISS:
+            c = choose_card_lv3(
+                hand, field, can_play, discard=discard, you_hand_count=you_hand_count,
+                other_counts=other_counts, keep_field_bias=keep_field_bias, stats=bh, seen=seen,
+                exact_danger=exact_danger, other_size_counts=other_size_counts, weights=weights,
+            )
+            table.put(key, RANK[c] if c is not None else 0)
+            return c
+        return card_of_rank(hand, field, r)
+
+
+# engine の policy_lv2 / lv3 が使う表（プロセスに1つ）
+default_cache = DecisionCache()
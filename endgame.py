@@ -0,0 +1,327 @@
+# 終盤の先読み（手札が少なく、見えていないカードの配り方が少ないとき）
+#
+# 見えていないカード（相手の手札 + 山札）の配り方を全部並べ（belief.py の重みで重み付け）、
+# 配り方ごとに「全員の手札が見えているゲーム」を先読みして、出せる手の期待値を比べる（expectimax）。
+#   ・手番の人は自分の得点がいちばん高い手を選ぶ（max^n）。得点：勝ち +1 / ドボンされた -1 / それ以外 0
+#   ・山から引く1枚は、山に残っているカードから一様（確率の枝）。山が空なら捨て札を戻す（refill_deck_if_empty と同じ）
+#   ・局面は（各自の手札のビット列, 場札, 山札・捨て札のビット列, 手番, 直前に行動した人, 残りの深さ）に詰めてメモする
+# 先読みは浅い順に深くしていき（反復深化）、節点数か時間の上限に来たら、最後に読み切った深さの答えを使う。
+# 終わりまで読み切れた（深さの打ち切りが無かった）らそこで止める。
+# 配り方が max_worlds より多い / 1段も読めない / 読んでも手の間に差が無い ときは fallback（既定は lv3）に任せる。
+# 近似：配り方ごとに全部見えているとして解く（PIMC）。配り方の重みは各自の確率の積（山札の分は見ない）。
+
+from __future__ import annotations
+
+import time
+from math import comb
+from typing import Optional
+
+from cardtable import PLAYABLE_MASK, RANK
+from engine import GameState, Policy, policy_lv3
+
+WIN, LOSE = 1.0, -1.0
+
+class OutOfBudget(Exception):
+    """節点数 / 時間を使い切った（その深さの結果は捨てる）"""
+
+def count_worlds(pool_size: int, sizes) -> int:
+    """pool_size 枚を sizes の人数に配る配り方の数（残りは山札）"""
+    total = 1
+    for k in sizes:
+        total *= comb(pool_size, k)
+        pool_size -= k
+    return total
+
+def _mask(cards) -> int:
+    m = 0
+    for c in cards:
+        m |= 1 << (c - 1)
+    return m
+
+
+class EndgameSolver:
+    """
+    policy として呼べる（EndgameSolver()(state, player) -> カード or None）。
+    max_worlds : これより配り方が多ければ読まない
+    max_nodes / time_budget : 1回の判断で使う節点数 / 秒（どちらかに来たら打ち切り）
+    max_depth  : 先読みする手数の上限
+    interrupt_seats : いつでもドボンできる席（ブラウザの「あなた」）
+    """
+
+    def __init__(
+        self,
+        *,
+        max_worlds: int = 200,
+        max_nodes: int = 20000,
+        time_budget: float = 0.05,
+        max_depth: int = 16,
+        fallback: Policy = policy_lv3,
+        interrupt_seats=("you",),
+    ):
+        self.max_worlds = max_worlds
+        self.max_nodes = max_nodes
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.fallback = fallback
+        self.interrupt_seats = tuple(interrupt_seats)
+        # 直近の判断の記録（計測用）
+        self.last_worlds = 0
+        self.last_depth = 0
+        self.last_nodes = 0
+        self.last_exact = False
+        self.solved = 0
+        self.fallbacks = 0
+
+    def __call__(self, state: GameState, player: str) -> Optional[int]:
+        chosen = self.solve(state, player)
+        if chosen is None:
+            self.fallbacks += 1
+            return self.fallback(state, player)
+        self.solved += 1
+        return chosen
+
+    # ===== 配り方 =====
+    def worlds(self, state: GameState, me: str) -> Optional[list[tuple[float, tuple[int, ...], int]]]:
+        """
+        me から見て考えられる配り方 [(重み, 各席の手札のビット列, 山札のビット列), ...]（重みの合計は 1）。
+        max_worlds より多ければ None
+        """
+        order = state.turn_order
+        hand = state.hands[me]
+        known = set(hand)
+        known.update(state.discard)
+        known.add(state.field)
+        pool = [c for c in range(1, state.n_cards + 1) if c not in known]
+        others = [i for i, p in enumerate(order) if p != me]
+        sizes = [len(state.hands[order[i]]) for i in others]
+        n = count_worlds(len(pool), sizes)
+        self.last_worlds = n
+        if n > self.max_worlds:
+            return None
+
+        probs = [state.belief.probabilities(order[i], k, exclude=hand) for i, k in zip(others, sizes)]
+        base = [0] * len(order)
+        base[order.index(me)] = _mask(hand)
+        out = []
+
+        def rec(j: int, rest: list[int], w: float):
+            if j == len(others):
+                out.append((w, tuple(base), _mask(rest)))
+                return
+            k = sizes[j]
+            p = probs[j]
+            # rest から k 枚を選ぶ（index の組み合わせ）
+            idx = list(range(k))
+            m = len(rest)
+            while True:
+                chosen = [rest[i] for i in idx]
+                wj = w
+                for c in chosen:
+                    wj *= p[c]
+                base[others[j]] = _mask(chosen)
+                picked = set(idx)
+                rec(j + 1, [rest[i] for i in range(m) if i not in picked], wj)
+                # 次の組み合わせ
+                i = k - 1
+                while i >= 0 and idx[i] == i + m - k:
+                    i -= 1
+                if i < 0:
+                    break
+                idx[i] += 1
+                for t in range(i + 1, k):
+                    idx[t] = idx[t - 1] + 1
+
+        rec(0, pool, 1.0)
+        total = sum(w for w, _, _ in out)
+        if total <= 0:
+            # 重みが全部 0（推定が食い違った）なら一様
+            return [(1.0 / len(out), h, d) for _, h, d in out]
+        return [(w / total, h, d) for w, h, d in out if w > 0]
+
+    # ===== 探索 =====
+    def solve(self, state: GameState, player: str) -> Optional[int]:
+        """先読みで決まったカード。決まらなければ None（fallback に任せる）"""
+        self.last_worlds = 0
+        self.last_depth = 0
+        self.last_nodes = 0
+        self.last_exact = False
+        if state.field is None or len(state.hands[player]) <= 1:
+            return None
+        moves = state.playable_cards(player)
+        if not moves:
+            return None
+        # 配り方を並べる時間も持ち時間に入れる
+        self._deadline = time.perf_counter() + self.time_budget
+        worlds = self.worlds(state, player)
+        if not worlds:
+            return None
+
+        order = state.turn_order
+        n = len(order)
+        me = order.index(player)
+        self._n = n
+        self._seats = tuple(order.index(p) for p in self.interrupt_seats if p in state.hands)
+        self._memo: dict = {}
+        self._nodes = 0
+        self._terminal: dict = {}
+        self._zero = (0.0,) * n
+        discard = _mask(state.discard)
+        field = state.field
+
+        values = None
+        for depth in range(1, self.max_depth + 1):
+            self._cut = False
+            try:
+                ev = []
+                for c in moves:
+                    v = 0.0
+                    for w, hands, deck in worlds:
+                        totals = tuple(self._total(h) for h in hands)
+                        v += w * self._play(hands, totals, field, deck, discard, me, c, depth)[me]
+                    ev.append(v)
+            except OutOfBudget:
+                break
+            values = ev
+            self.last_depth = depth
+            if not self._cut:
+                self.last_exact = True
+                break
+        self.last_nodes = self._nodes
+        self._memo = {}
+        if values is None:
+            return None
+
+        best = max(values)
+        if best - min(values) < 1e-9:
+            return None  # どの手も同じ（読める範囲では決着しない）
+        return moves[values.index(best)]
+
+    @staticmethod
+    def _total(h: int) -> int:
+        t = 0
+        while h:
+            low = h & -h
+            t += RANK[low.bit_length()]
+            h ^= low
+        return t
+
+    def _end(self, winner: int, loser: Optional[int]) -> tuple[float, ...]:
+        key = (winner, loser)
+        v = self._terminal.get(key)
+        if v is None:
+            vec = [0.0] * self._n
+            vec[winner] = WIN
+            if loser is not None and loser != winner:
+                vec[loser] = LOSE
+            v = self._terminal[key] = tuple(vec)
+        return v
+
+    def _turn(self, hands, totals, field, deck, discard, cur, last, depth) -> tuple[float, ...]:
+        """cur の手番の最初（play_turn と同じ：まずドボン判定、次に行動）。depth >= 1（端は _after で見る）"""
+        key = (hands, field, deck, discard, cur, last, depth)
+        hit = self._memo.get(key)
+        if hit is not None:
+            if hit[1]:
+                self._cut = True
+            return hit[0]
+        self._nodes += 1
+        if self._nodes > self.max_nodes or ((self._nodes & 63) == 0 and time.perf_counter() > self._deadline):
+            raise OutOfBudget
+
+        # この局面の下で深さの打ち切りがあったか（メモから引いたときにも伝える）
+        outer = self._cut
+        self._cut = False
+        h = hands[cur]
+        if last != cur and h and totals[cur] == RANK[field]:
+            v = self._end(cur, last)
+        else:
+            playable = h & PLAYABLE_MASK[field] if h & (h - 1) else 0  # 残り1枚は出せない
+            if playable:
+                v = None
+                m = playable
+                while m:
+                    low = m & -m
+                    r = self._play(hands, totals, field, deck, discard, cur, low.bit_length(), depth)
+                    if v is None or r[cur] > v[cur]:
+                        v = r
+                    m ^= low
+            else:
+                v = self._draw(hands, totals, field, deck, discard, cur, last, depth)
+        cut = self._cut
+        self._cut = outer or cut
+        self._memo[key] = (v, cut)
+        return v
+
+    def _play(self, hands, totals, field, deck, discard, cur, c, depth) -> tuple[float, ...]:
+        hl = list(hands)
+        hl[cur] ^= 1 << (c - 1)
+        tl = list(totals)
+        tl[cur] -= RANK[c]
+        return self._after(tuple(hl), tuple(tl), c, deck, discard | 1 << (field - 1), cur, cur, depth)
+
+    def _draw(self, hands, totals, field, deck, discard, cur, last, depth) -> tuple[float, ...]:
+        if not deck:
+            if not discard:
+                # 山札も捨て札も無い：何もせずに次へ（engine の draw が None のとき）
+                return self._after(hands, totals, field, deck, discard, cur, last, depth)
+            deck, discard = discard, 0
+        n = self._n
+        if depth == 1:
+            # 最後の1手：次に見るのは他の人のドボンだけなので、何を引いても同じ
+            branches = [(1, deck & -deck)]
+        elif depth <= n:
+            # 引いたカードを自分が出せるのは読みの外（この先で誰かが引くカードも同じ）。
+            # 効くのは合計＝数字だけなので、数字ごとに1枚で代表させる
+            reps: dict[int, list[int]] = {}
+            m = deck
+            while m:
+                low = m & -m
+                r = RANK[low.bit_length()]
+                e = reps.get(r)
+                if e is None:
+                    reps[r] = [1, low]
+                else:
+                    e[0] += 1
+                m ^= low
+            branches = reps.values()
+        else:
+            branches = []
+            m = deck
+            while m:
+                low = m & -m
+                branches.append((1, low))
+                m ^= low
+        acc = [0.0] * n
+        k = 0
+        for weight, low in branches:
+            hl = list(hands)
+            hl[cur] |= low
+            tl = list(totals)
+            tl[cur] += RANK[low.bit_length()]
+            r = self._after(tuple(hl), tuple(tl), field, deck ^ low, discard, cur, cur, depth)
+            for i in range(n):
+                acc[i] += weight * r[i]
+            k += weight
+        return tuple(x / k for x in acc)
+
+    def _after(self, hands, totals, field, deck, discard, cur, last, depth) -> tuple[float, ...]:
+        """行動の直後：いつでもドボンできる席の割り込み（check_interrupt と同じ順）→ 次の人"""
+        target = RANK[field]
+        for s in self._seats:
+            if last != s and hands[s] and totals[s] == target:
+                return self._end(s, last)
+        nxt = (cur + 1) % self._n
+        if depth == 1:
+            # 読みの端：次の人の手番の最初のドボン判定だけ見る（メモしない）
+            if last != nxt and hands[nxt] and totals[nxt] == target:
+                return self._end(nxt, last)
+            self._cut = True
+            return self._zero
+        return self._turn(hands, totals, field, deck, discard, nxt, last, depth - 1)
+
+
+# engine.STRATEGIES["endgame"] から使う既定の探索器（持ち時間 50ms、読めなければ lv3）
+default_solver = EndgameSolver()
+
+def choose_card_endgame(state: GameState, player: str) -> Optional[int]:
+    return default_solver(state, player)
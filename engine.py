@@ -0,0 +1,692 @@
+# DOBON のゲーム進行（DOM を触らない純Python版）
+# ブラウザ側(main.py)はこの GameState を描画するだけ。
+# js / pyodide に依存しないので、普通の Linux でも大量に対戦させられる。
+
+from __future__ import annotations
+
+import functools
+import itertools
+import json
+import random
+import struct
+from typing import Callable, Optional
+
+from belief import HandBelief
+from cardtable import CAN_PLAY, LABEL, MAX_DECKS, N_CARDS, PLAYABLE_MASK, RANK, SUIT_RANK, deck_cards, ensure_decks
+from handstats import BitHand, SeenTracker
+
+TURN_ORDER = ["you", "cpuA", "cpuB", "cpuC"]
+CPU_PLAYERS = ("cpuA", "cpuB", "cpuC")
+HAND_SIZE = 5  # 最初に配る枚数
+MIN_SEATS = 2
+MAX_SEATS = 12  # gamelog の席番号は4bit（NO_SEAT=0x0F を除く）
+DRAW = 0       # history 上の「山から引いた」（引いたカードは他の人には見えない）
+
+# ---- カード番号→(スート,数字)の割り当て ----
+# c1..c52 の並びは「♣→♦→♥→♠（各A..K）」。中身は cardtable の早見表を引くだけ
+def card_to_suit_rank(i: int):
+    return SUIT_RANK[i]
+
+def can_play(card_id: int, field_id: int) -> bool:
+    return CAN_PLAY[field_id][card_id]
+
+def card_label(cid: int) -> str:
+    return LABEL[cid]
+
+def hand_sum(cards) -> int:
+    return sum(RANK[cid] for cid in cards)
+
+def seat_names(n: int) -> list[str]:
+    """n 人卓の席名（you, cpuA, cpuB, ...）。n=4 なら TURN_ORDER と同じ"""
+    return ["you"] + [f"cpu{chr(ord('A') + i)}" for i in range(n - 1)]
+
+# 配るたびに振るゲームの識別子（探索の木などを「同じゲームか」で見分ける用）。
+# プロセスごとに上位を乱数にして、別のプロセスで配ったゲームとも重ならないようにする（JSON でも崩れない 52bit に収める）
+_GAME_ID_BASE = random.SystemRandom().getrandbits(20) << 32
+_game_ids = itertools.count(1)
+
+def new_game_id() -> int:
+    return _GAME_ID_BASE | (next(_game_ids) & 0xFFFFFFFF)
+
+def game_rng(seed: int, game: int) -> random.Random:
+    """seed の g ゲーム目だけで決まる乱数（前のゲームで何回引いたかに左右されない）"""
+    return random.Random(seed * 1_000_003 + game)
+
+# ---- snapshot の形（固定長）----
+# [山札の枚数][捨て札の枚数][場札(0=無し)][各自の枚数 × 席数]
+# [手番][直前に行動した人][前回の勝者][game_over][勝者][負けた人][行動数 u32][ゲーム番号 u32]
+# のあとに 52 × 組数 バイト：山札 → 捨て札 → 各自の手札 の順にカード番号（余りは 0）
+NO_SEAT = 0xFF
+
+# GameState._belief_log に入れる行動の種類
+_B_RESET, _B_PLAY, _B_DRAW, _B_REFILL = range(4)
+_SNAP_HEADERS: dict[int, struct.Struct] = {}
+
+def _snap_header(n_seats: int) -> struct.Struct:
+    st = _SNAP_HEADERS.get(n_seats)
+    if st is None:
+        st = _SNAP_HEADERS[n_seats] = struct.Struct(f"<3B{n_seats}B6BII")
+    return st
+
+
+class GameState:
+    """
+    1ゲーム分の状態（山札・場札・捨て札・手札・手番・直前に行動した人）。
+    ルールの判定と状態の更新だけを行い、表示やメッセージは呼び出し側に任せる。
+    """
+
+    def __init__(
+        self,
+        turn_order: Optional[list[str]] = None,
+        rng: Optional[random.Random] = None,
+        seed: Optional[int] = None,
+        *,
+        decks: int = 1,
+    ):
+        self.turn_order = list(turn_order or TURN_ORDER)
+        n_seats = len(self.turn_order)
+        if not (MIN_SEATS <= n_seats <= MAX_SEATS):
+            raise ValueError(f"players must be {MIN_SEATS}..{MAX_SEATS}: {self.turn_order}")
+        if not (1 <= decks <= MAX_DECKS):
+            raise ValueError(f"decks must be 1..{MAX_DECKS}: {decks}")
+        if n_seats * HAND_SIZE + 1 > N_CARDS * decks:
+            raise ValueError(f"not enough cards for {n_seats} players: use more decks")
+        ensure_decks(decks)
+        self.decks = decks
+        self.n_cards = N_CARDS * decks
+        self.rng = rng if rng is not None else random.Random()
+        # seed を渡すと、deal のたびに game_rng(seed, ゲーム番号) に切り替える（1ゲームずつ再現できる）
+        self.seed = seed
+
+        self.deck: list[int] = []       # 山札（残り）
+        self.field: Optional[int] = None  # 場札（いちばん上1枚）
+        self.discard: list[int] = []    # 捨て札
+        self.hands: dict[str, list[int]] = {p: [] for p in self.turn_order}
+        # 手札ごとの集計（合計・数字ヒストグラム・ペア数・分割体制）
+        # play / draw / deal のたびに O(1) で更新するので、判定のたびに数え直さない
+        self.stats: dict[str, BitHand] = {p: BitHand() for p in self.turn_order}
+        # size_counts[n] = 手札が n 枚の席の数。CPU が相手の枚数を見るときに全員の手札を数え直さない
+        self.size_counts: dict[int, int] = {0: n_seats}
+        # 見えているカード（捨て札 + 場札）の数字別カウント。CPU全レベルで共有
+        self.seen = SeenTracker(copies=4 * decks)
+        # 各自の手札の推定（誰がどのカードを持っていそうか）。play / draw のたびには行動を _belief_log に
+        # ためておくだけで、belief を読んだときにまとめて反映する（lv1 / lv2 のように読まない CPU だけなら何もしない）
+        self._belief = HandBelief(self.turn_order, self.n_cards)
+        self._belief_log: list[tuple] = []
+        self._belief_shared = False  # 複製と同じ HandBelief を指している（書き換える前に複製する）
+
+        self.current_player_idx = 0
+        self.last_actor: Optional[str] = None   # 最後に行動したプレーヤー
+        self.last_winner: Optional[str] = None  # 前回の勝者（次のゲームの先行）
+        self.game_over = False
+        self.winner: Optional[str] = None
+        self.loser: Optional[str] = None
+        self.turns = 0  # 行動した回数（出す/引く）
+        self.games = 0  # deal した回数（ゲームの通し番号）
+        self.game_id = 0  # 配るたびに new_game_id()（複製・to_dict にも引き継ぐ）
+        # 全員に見えている行動の記録 [(player, 出したカード or DRAW), ...]
+        self.history: list[tuple[str, int]] = []
+        # 対戦ログ（gamelog.GameLog）。入れたときだけ記録する（複製には引き継がない）
+        self.log = None
+
+    def copy(self) -> "GameState":
+        """探索用の複製（乱数は共有するので、必要なら呼び出し側で差し替える）"""
+        g = GameState.__new__(GameState)
+        g.turn_order = self.turn_order
+        g.rng = self.rng
+        g.seed = self.seed
+        g.decks = self.decks
+        g.n_cards = self.n_cards
+        g.deck = self.deck[:]
+        g.field = self.field
+        g.discard = self.discard[:]
+        g.hands = {p: h[:] for p, h in self.hands.items()}
+        g.stats = {p: st.copy() for p, st in self.stats.items()}
+        g.size_counts = dict(self.size_counts)
+        g.seen = self.seen.copy()
+        # 推定は読まれるまで複製しない（どちらかが書き換えるときに複製する）
+        g._belief = self._belief
+        g._belief_log = self._belief_log[:]
+        g._belief_shared = self._belief_shared = True
+        g.current_player_idx = self.current_player_idx
+        g.last_actor = self.last_actor
+        g.last_winner = self.last_winner
+        g.game_over = self.game_over
+        g.winner = self.winner
+        g.loser = self.loser
+        g.turns = self.turns
+        g.games = self.games
+        g.game_id = self.game_id
+        g.history = self.history[:]
+        g.log = None
+        return g
+
+    # ===== 手札の推定 =====
+    @property
+    def belief(self) -> HandBelief:
+        """手札の推定。ためておいた行動をここで反映する"""
+        log = self._belief_log
+        if log:
+            b = self._belief
+            if self._belief_shared:
+                # 配り直しから始まるなら前の推定は要らない
+                b = HandBelief(self.turn_order, self.n_cards) if log[0][0] == _B_RESET else b.copy()
+                self._belief = b
+                self._belief_shared = False
+            for ev in log:
+                kind = ev[0]
+                if kind == _B_PLAY:
+                    b.play(ev[1])
+                elif kind == _B_DRAW:
+                    b.draw(ev[1], ev[2], ev[3])
+                elif kind == _B_REFILL:
+                    b.refill(ev[1])
+                else:
+                    b.reset(ev[1], ev[2])
+            self._belief_log = []
+        return self._belief
+
+    def _reset_belief(self, field: Optional[int], discard=()):
+        # それまでにためた行動は配り直しで要らなくなる
+        self._belief_log = [(_B_RESET, field, tuple(discard))]
+
+    def to_dict(self) -> dict:
+        """JSON にできる形（Web Worker やプロセスに渡す用）。乱数の状態は含めない"""
+        return {
+            "turn_order": self.turn_order,
+            "decks": self.decks,
+            "deck": self.deck,
+            "field": self.field,
+            "discard": self.discard,
+            "hands": self.hands,
+            "current_player_idx": self.current_player_idx,
+            "last_actor": self.last_actor,
+            "last_winner": self.last_winner,
+            "game_over": self.game_over,
+            "winner": self.winner,
+            "loser": self.loser,
+            "turns": self.turns,
+            "games": self.games,
+            "game_id": self.game_id,
+            "history": self.history,
+            "belief": self.belief.weights,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, rng: Optional[random.Random] = None) -> "GameState":
+        g = cls(data["turn_order"], rng=rng, decks=data.get("decks", 1))
+        g.deck = list(data["deck"])
+        g.field = data["field"]
+        g.discard = list(data["discard"])
+        g.hands = {p: list(h) for p, h in data["hands"].items()}
+        g.stats = {p: BitHand(h) for p, h in g.hands.items()}
+        g._count_sizes()
+        g.seen.reset(g.field, g.discard)
+        g._reset_belief(g.field, g.discard)
+        if "belief" in data:
+            g.belief.weights = {p: list(w) for p, w in data["belief"].items()}
+        g.current_player_idx = data["current_player_idx"]
+        g.last_actor = data["last_actor"]
+        g.last_winner = data["last_winner"]
+        g.game_over = data["game_over"]
+        g.winner = data["winner"]
+        g.loser = data["loser"]
+        g.turns = data["turns"]
+        g.games = data["games"]
+        g.game_id = data.get("game_id", 0)
+        g.history = [(p, m) for p, m in data["history"]]
+        return g
+
+    def snapshot(self) -> bytes:
+        """
+        ゲームの状態を固定長のバイト列にする（席4人・1組なら 73 バイト）。
+        山札・捨て札・手札の並びもそのまま残る。history / belief / log / 乱数は含めない
+        """
+        seat = {p: i for i, p in enumerate(self.turn_order)}
+        cards = bytearray(self.deck)
+        cards += bytes(self.discard)
+        for p in self.turn_order:
+            cards += bytes(self.hands[p])
+        cards += bytes(self.n_cards - len(cards))
+        return _snap_header(len(self.turn_order)).pack(
+            len(self.deck),
+            len(self.discard),
+            self.field or 0,
+            *[len(self.hands[p]) for p in self.turn_order],
+            self.current_player_idx,
+            seat.get(self.last_actor, NO_SEAT),
+            seat.get(self.last_winner, NO_SEAT),
+            self.game_over,
+            seat.get(self.winner, NO_SEAT),
+            seat.get(self.loser, NO_SEAT),
+            self.turns,
+            self.games,
+        ) + cards
+
+    def restore(self, snap: bytes):
+        """snapshot() の状態に戻す（同じ席順・組数の GameState で）。history は空、belief は一様に戻る"""
+        order = self.turn_order
+        n_seats = len(order)
+        head = _snap_header(n_seats)
+        v = head.unpack_from(snap)
+        n_deck, n_discard, field = v[0], v[1], v[2]
+        hand_lens = v[3:3 + n_seats]
+        cur, last_actor, last_winner, game_over, winner, loser, turns, games = v[3 + n_seats:]
+
+        cards = snap[head.size:]
+        i = n_deck + n_discard
+        self.deck = list(cards[:n_deck])
+        self.discard = list(cards[n_deck:i])
+        self.field = field or None
+        for p, n in zip(order, hand_lens):
+            hand = list(cards[i:i + n])
+            i += n
+            self.hands[p] = hand
+            self.stats[p] = BitHand(hand)
+        self._count_sizes()
+        self.seen.reset(self.field, self.discard)
+        self._reset_belief(self.field, self.discard)
+
+        def name(i):
+            return None if i == NO_SEAT else order[i]
+
+        self.current_player_idx = cur
+        self.last_actor = name(last_actor)
+        self.last_winner = name(last_winner)
+        self.game_over = bool(game_over)
+        self.winner = name(winner)
+        self.loser = name(loser)
+        self.turns = turns
+        self.games = games
+        self.game_id = new_game_id()  # history が無いので、前の続きとは別のゲームとして扱う
+        self.history = []
+
+    def _count_sizes(self):
+        """size_counts を手札から作り直す（deal / restore のときだけ）"""
+        counts: dict[int, int] = {}
+        for h in self.hands.values():
+            counts[len(h)] = counts.get(len(h), 0) + 1
+        self.size_counts = counts
+
+    def _resize(self, old: int, new: int):
+        """手札が old 枚 → new 枚になった席の分だけ size_counts を動かす"""
+        counts = self.size_counts
+        k = counts[old] - 1
+        if k:
+            counts[old] = k
+        else:
+            del counts[old]
+        counts[new] = counts.get(new, 0) + 1
+
+    # ===== 参照 =====
+    @property
+    def current_player(self) -> str:
+        return self.turn_order[self.current_player_idx]
+
+    def get_hand(self, player: str) -> list[int]:
+        return self.hands[player]
+
+    def has_playable(self, player: str) -> bool:
+        if self.field is None:
+            return False
+        hand = self.hands[player]
+        # ★残り1枚は「ドボン宣言」以外では出せない＝playable扱いにしない
+        if len(hand) == 1:
+            return False
+        return (self.stats[player].mask & PLAYABLE_MASK[self.field]) != 0
+
+    def playable_cards(self, player: str) -> list[int]:
+        if self.field is None:
+            return []
+        row = CAN_PLAY[self.field]
+        return [c for c in self.hands[player] if row[c]]
+
+    def can_dobon(self, player: str) -> bool:
+        """手札「すべて」の合計が場の数字と一致するか（ワンクッションは見ない）"""
+        st = self.stats[player]
+        if self.field is None or st.count == 0:
+            return False
+        return st.total == RANK[self.field]
+
+    def may_dobon(self, player: str) -> bool:
+        """ドボン宣言が通るか（自分の行動直後はワンクッションで不可）"""
+        return self.last_actor != player and self.can_dobon(player)
+
+    # ===== 進行 =====
+    def deal(self, start_player: Optional[str] = None, deck: Optional[list[int]] = None):
+        """
+        シャッフルして配り直す。先行は指定 > 前回の勝者 > 先頭
+        deck: シャッフル済みの並び（ログの再生用）。配るのは末尾から
+        """
+        if start_player is None:
+            start_player = self.last_winner if self.last_winner is not None else self.turn_order[0]
+
+        self.game_over = False
+        self.winner = None
+        self.loser = None
+        self.last_actor = None
+        self.turns = 0
+        self.games += 1
+        self.game_id = new_game_id()
+        self.history = []
+        if self.seed is not None:
+            self.rng = game_rng(self.seed, self.games)
+        self.current_player_idx = self.turn_order.index(start_player)
+
+        if deck is None:
+            deck = list(deck_cards(self.decks))
+            self.rng.shuffle(deck)
+        else:
+            deck = list(deck)
+        if self.log is not None:
+            self.log.deal(start_player, deck)
+        self.discard = []
+
+        # 5枚ずつ配る
+        for p in self.turn_order:
+            hand = [deck.pop() for _ in range(HAND_SIZE)]
+            self.hands[p] = hand
+            self.stats[p] = BitHand(hand)
+        self.size_counts = {HAND_SIZE: len(self.turn_order)}
+
+        # 場に1枚（表）
+        self.field = deck.pop()
+        self.deck = deck
+        self.seen.reset(self.field)
+        self._reset_belief(self.field)
+
+    def refill_deck_if_empty(self, order: Optional[list[int]] = None) -> bool:
+        """
+        山札が空なら、場の一番上(field)だけ残して discard をシャッフルして山に戻す
+        order: シャッフル後の並び（ログの再生用）
+        """
+        if len(self.deck) > 0:
+            return False
+
+        # discard が無ければ補充できない
+        if len(self.discard) == 0:
+            return False
+
+        self.seen.forget(self.discard)
+        self._belief_log.append((_B_REFILL, tuple(self.discard)))
+        if order is None:
+            self.rng.shuffle(self.discard)
+        else:
+            self.discard = list(order)
+        self.deck = self.discard   # 山札に戻す
+        self.discard = []          # 捨て札は空に
+        if self.log is not None:
+            self.log.refill(self.deck)
+        return True
+
+    def play(self, player: str, card_id: int) -> bool:
+        """
+        card_id を場に出す。出せない場合は何もせず False。
+        （手札に無い / 残り1枚 / マークも数字も違う）
+        """
+        hand = self.hands[player]
+        if self.field is None or card_id not in hand:
+            return False
+        # 残り1枚は “ドボン宣言以外で上がれない”
+        if len(hand) == 1:
+            return False
+        if not CAN_PLAY[self.field][card_id]:
+            return False
+
+        hand.remove(card_id)
+        self.stats[player].remove(card_id)
+        self._resize(len(hand) + 1, len(hand))
+        # いまの場札を捨て札へ
+        self.discard.append(self.field)
+        self.field = card_id
+        self.seen.see(card_id)
+        self._belief_log.append((_B_PLAY, card_id))
+        # ★直前に行動した人（次にドボンされたらこの人が負け）
+        self.last_actor = player
+        self.turns += 1
+        self.history.append((player, card_id))
+        if self.log is not None:
+            self.log.play(player, card_id)
+        return True
+
+    def draw(self, player: str) -> Optional[int]:
+        """山から1枚引く（必要なら補充）。山も捨て札も無ければ None"""
+        self.refill_deck_if_empty()
+        if len(self.deck) == 0:
+            return None
+
+        c = self.deck.pop()
+        # 引く前に出せるカードが無かったこと（手札2枚以上なら）を推定に入れる
+        self._belief_log.append((_B_DRAW, player, self.field, len(self.hands[player])))
+        hand = self.hands[player]
+        hand.append(c)
+        self.stats[player].add(c)
+        self._resize(len(hand) - 1, len(hand))
+        # ★引いたのも“行動”なので記録
+        self.last_actor = player
+        self.turns += 1
+        self.history.append((player, DRAW))
+        if self.log is not None:
+            self.log.draw(player)
+        return c
+
+    def next_player(self) -> str:
+        self.current_player_idx = (self.current_player_idx + 1) % len(self.turn_order)
+        return self.current_player
+
+    def end_game_by_dobon(self, winner: str, loser: Optional[str]):
+        self.game_over = True
+        self.winner = winner
+        self.loser = loser
+        self.last_winner = winner
+        if self.log is not None:
+            self.log.dobon(winner, loser)
+
+
+# ===== CPU の行動選択 =====
+# Policy: (state, player) -> 出すカード or None（None なら山から引く）
+Policy = Callable[[GameState, str], Optional[int]]
+
+# cpu.py（思考）は最初に CPU が考えるときに読み込む（ブラウザの起動を軽くするため）
+# 関数の中の import は毎回 µs 単位かかるので、読み込んだモジュールは _cpu に覚えておく
+# 厳密版の lv3（lv3_exact）だけ decision_cache の表を通して考える（同じ形の局面は表から答える）。
+# lv2 / 概算の lv3 は考える方が鍵を作って表を引くより安いので、表を通さない（bench.py の decision_cache_* と比べた結果）
+_cpu = None
+_decisions = None
+
+def _load_cpu():
+    global _cpu, _decisions
+    import cpu
+    import decision_cache
+    _cpu = cpu
+    _decisions = decision_cache.default_cache
+    return cpu
+
+def _load_decisions():
+    _load_cpu()
+    return _decisions
+
+def policy_lv1(state: GameState, player: str) -> Optional[int]:
+    return (_cpu or _load_cpu()).choose_card_lv1(state.hands[player], state.field, can_play)
+
+def policy_lv2(state: GameState, player: str, *, weights=None) -> Optional[int]:
+    return (_cpu or _load_cpu()).choose_card_lv2(
+        state.hands[player], state.field, can_play, stats=state.stats[player], weights=weights
+    )
+
+def policy_lv2_keep_field(state: GameState, player: str, *, weights=None) -> Optional[int]:
+    return (_cpu or _load_cpu()).choose_card_lv2_keep_field(
+        state.hands[player], state.field, can_play, stats=state.stats[player], weights=weights
+    )
+
+def policy_lv3(state: GameState, player: str, *, exact_danger: bool = False, weights=None) -> Optional[int]:
+    # 「あなた」の枚数は別枠で見る（自分が you のときは先頭の他の席を代わりに）
+    # 他の人の枚数は size_counts（枚数 → 人数）から自分と「あなた」の分を引いて作る（席数によらず一定）
+    hands = state.hands
+    if player != "you" and "you" in hands:
+        you = "you"
+    else:
+        order = state.turn_order
+        you = order[1] if order[0] == player else order[0]
+    you_hand_count = len(hands[you])
+    others = dict(state.size_counts)
+    for n in (len(hands[player]), you_hand_count):
+        if others[n] > 1:
+            others[n] -= 1
+        else:
+            del others[n]
+
+    if exact_danger:
+        choose = (_decisions or _load_decisions()).lv3
+    else:
+        choose = (_cpu or _load_cpu()).choose_card_lv3
+    return choose(
+        state.hands[player],
+        state.field,
+        can_play,
+        discard=state.discard,
+        you_hand_count=you_hand_count,
+        other_size_counts=others,
+        keep_field_bias=True,
+        stats=state.stats[player],
+        seen=state.seen,
+        exact_danger=exact_danger,
+        weights=weights,
+    )
+
+def policy_lv3_exact(state: GameState, player: str, *, weights=None) -> Optional[int]:
+    # 危険度を odds.py の厳密な確率で見る lv3
+    return policy_lv3(state, player, exact_danger=True, weights=weights)
+
+def policy_lv4(state: GameState, player: str) -> Optional[int]:
+    # 探索は重いので、使うときに初めて読み込む
+    from mcts import choose_card_lv4
+    return choose_card_lv4(state, player)
+
+def policy_endgame(state: GameState, player: str) -> Optional[int]:
+    # 終盤（見えていないカードの配り方が少ないとき）だけ先読みする lv3。使うときに初めて読み込む
+    from endgame import choose_card_endgame
+    return choose_card_endgame(state, player)
+
+# 名前 → policy（対戦ツールなどで名前から引く。新しいレベルはここに足す）
+STRATEGIES: dict[str, Policy] = {
+    "lv1": policy_lv1,
+    "lv2": policy_lv2,
+    "lv2_keep_field": policy_lv2_keep_field,
+    "lv3": policy_lv3,
+    "lv3_exact": policy_lv3_exact,
+    "lv4": policy_lv4,
+    "endgame": policy_endgame,
+}
+
+# ブラウザ版の CPU の既定レベル
+DEFAULT_LEVELS: dict[str, str] = {
+    "cpuA": "lv1",
+    "cpuB": "lv2_keep_field",
+    "cpuC": "lv3",
+}
+def make_policies(levels: dict[str, str]) -> dict[str, Policy]:
+    """席名 → strategy 名 から play_game に渡す policies を作る（席ごとに別のレベルを割り当てる）"""
+    for name in levels.values():
+        if name not in STRATEGIES:
+            raise ValueError(f"unknown strategy: {name} (choose from {', '.join(STRATEGIES)})")
+    return {p: STRATEGIES[name] for p, name in levels.items()}
+
+DEFAULT_POLICIES: dict[str, Policy] = make_policies(DEFAULT_LEVELS)
+
+# 重みを変えられるレベル（tune.py の出力 = プロファイルで使う）
+WEIGHTED_POLICIES: dict[str, Policy] = {
+    "lv2": policy_lv2,
+    "lv2_keep_field": policy_lv2_keep_field,
+    "lv3": policy_lv3,
+    "lv3_exact": policy_lv3_exact,
+}
+
+def policy_from_profile(profile: dict) -> Policy:
+    """
+    {"level": "lv3", "weights": {名前: 値, ...}} から policy を作る（書いていない重みは既定値）。
+    プロセスに渡せるように functools.partial で返す
+    """
+    level = profile["level"]
+    if level not in WEIGHTED_POLICIES:
+        raise ValueError(f"level must be one of {', '.join(WEIGHTED_POLICIES)}: {level}")
+    family = "lv2" if level.startswith("lv2") else "lv3"
+    weights = (_cpu or _load_cpu()).weights_vector(family, profile.get("weights"))
+    return functools.partial(WEIGHTED_POLICIES[level], weights=weights)
+
+def load_profile(path: str, name: Optional[str] = None) -> str:
+    """プロファイル（JSON）を読んで STRATEGIES に name（無ければファイルの "name"）で足す。名前を返す"""
+    with open(path, encoding="utf-8") as f:
+        profile = json.load(f)
+    name = name or profile.get("name") or "tuned"
+    STRATEGIES[name] = policy_from_profile(profile)
+    return name
+
+def cpu_choose(state: GameState, player: str, policy: Policy) -> Optional[int]:
+    """CPU共通の前処理をしてから policy に任せる"""
+    if state.field is None or len(state.hands[player]) == 1:
+        # ワンクッションルール（残り1枚は出せない）
+        return None
+
+    # --- この1手で「次ターンドボン体制」を作れるか？ ---
+    # 出した直後は自分はドボン不可（ワンクッション）なので
+    # 「次の自分の番でドボン可能形」になっているかを見る
+    total = state.stats[player].total
+    target = RANK[state.field]
+    for c in state.playable_cards(player):
+        if total - RANK[c] == target:
+            return c
+
+    return policy(state, player)
+
+
+# ===== ヘッドレス対戦 =====
+def check_interrupt(state: GameState, seats) -> bool:
+    """いつでもドボンできる席（ブラウザの「あなた」）の割り込みチェック"""
+    for p in seats:
+        if state.may_dobon(p):
+            state.end_game_by_dobon(p, state.last_actor)
+            return True
+    return False
+
+def play_turn(state: GameState, policy: Policy) -> None:
+    """現在の手番プレーヤーに1手させる（手番開始時のドボン判定込み）"""
+    player = state.current_player
+
+    # ===== 即ドボン判定（行動前） =====
+    if state.may_dobon(player):
+        state.end_game_by_dobon(player, state.last_actor)
+        return
+
+    chosen = cpu_choose(state, player, policy)
+    if chosen is None or not state.play(player, chosen):
+        state.draw(player)
+
+def play_game(
+    state: GameState,
+    policies: dict[str, Policy],
+    *,
+    interrupt_seats=("you",),
+    start_player: Optional[str] = None,
+    max_turns: int = 2000,
+) -> Optional[str]:
+    """
+    1ゲームを最後まで進めて勝者を返す（max_turns で決着しなければ None）。
+    ブラウザ版と同じく、interrupt_seats は他人の行動直後にもドボンでき、
+    それ以外の席は自分の手番の最初にだけドボン判定する。
+    """
+    state.deal(start_player)
+    seats = [p for p in interrupt_seats if p in state.hands]
+
+    if check_interrupt(state, seats):
+        return state.winner
+
+    for _ in range(max_turns):
+        play_turn(state, policies[state.current_player])
+        if state.game_over:
+            return state.winner
+        if check_interrupt(state, seats):
+            return state.winner
+        state.next_player()
+
+    return None
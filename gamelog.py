@@ -0,0 +1,201 @@
+# 対戦ログ（バイナリ）と再生
+#
+# GameState.log に GameLog を入れておくと、deal / play / draw / 山札補充 / ドボン が
+# 1ゲーム1レコードのバイト列として記録される。
+#
+# イベント（先頭1バイト = 種類 << 4 | 席番号）
+#   DEAL   : [b0][n lo][n hi][山札の並び n 枚]   （シャッフル直後。配るのは末尾から）
+#   PLAY   : [b0][card]
+#   DRAW   : [b0]                                 （引いたカードは山札の並びから決まる）
+#   REFILL : [b0][n lo][n hi][新しい山札の並び n 枚]
+#   DOBON  : [b0 勝者][負けた席 or NO_SEAT]
+#   END    : [b0]                                 （レコードの最後に必ず1つ。席番号の所は 1 = DOBON で決着 / 0 = 決着なし）
+# 1ゲームは DEAL で始まり、END で終わる（DOBON の直後、または決着しないまま次の DEAL / 保存のとき）。1ゲーム 100 バイト前後。
+#
+# ファイル：MAGIC + [席数][席名の長さ][席名 utf-8]... のあとに
+#           [レコード長 lo][hi][レコード] が並ぶ（1レコードは 65535 バイトまで）。
+# read_games() は長さだけ見て読み飛ばせるので、勝敗だけの集計なら中身を解かずに済む。
+
+from __future__ import annotations
+
+import io
+from typing import BinaryIO, Iterator, Optional, Union
+
+from cardtable import N_CARDS
+from engine import GameState
+
+MAGIC = b"DBN2"  # DBN1 は END が無く、末尾のバイトから勝敗を決められなかった
+MAX_RECORD = 0xFFFF
+
+DEAL, PLAY, DRAW, REFILL, DOBON, END = 1, 2, 3, 4, 5, 6
+NO_SEAT = 0x0F
+
+EVENT_NAMES = {DEAL: "deal", PLAY: "play", DRAW: "draw", REFILL: "refill", DOBON: "dobon", END: "end"}
+
+class GameLog:
+    """GameState から呼ばれて、イベントをためていく（席は turn_order の番号で持つ）"""
+
+    def __init__(self, turn_order):
+        self.turn_order = list(turn_order)
+        self._seat = {p: i for i, p in enumerate(self.turn_order)}
+        self.records: list[bytes] = []   # 終わったゲーム
+        self._cur = bytearray()          # 記録中のゲーム
+
+    # ---- GameState から呼ばれる ----
+    def deal(self, start_player: str, deck: list[int]):
+        self.close()
+        n = len(deck)
+        self._cur += bytes((DEAL << 4 | self._seat[start_player], n & 0xFF, n >> 8))
+        self._cur += bytes(deck)
+
+    def play(self, player: str, card: int):
+        cur = self._cur
+        cur.append(PLAY << 4 | self._seat[player])
+        cur.append(card)
+
+    def draw(self, player: str):
+        self._cur.append(DRAW << 4 | self._seat[player])
+
+    def refill(self, deck: list[int]):
+        n = len(deck)
+        self._cur += bytes((REFILL << 4, n & 0xFF, n >> 8))
+        self._cur += bytes(deck)
+
+    def dobon(self, winner: str, loser: Optional[str]):
+        loser_seat = NO_SEAT if loser is None else self._seat[loser]
+        self._cur += bytes((DOBON << 4 | self._seat[winner], loser_seat))
+        self.close(finished=True)
+
+    def close(self, finished: bool = False):
+        """記録中のゲームに END を付けて records に移す（決着していなくても）"""
+        if self._cur:
+            self._cur.append(END << 4 | finished)
+            self.records.append(bytes(self._cur))
+            self._cur = bytearray()
+
+    # ---- 保存 ----
+    def write(self, fp: BinaryIO):
+        self.close()
+        write_games(fp, self.turn_order, self.records)
+        self.records = []
+
+
+def write_header(fp: BinaryIO, turn_order) -> None:
+    head = bytearray(MAGIC)
+    head.append(len(turn_order))
+    for p in turn_order:
+        name = p.encode("utf-8")
+        head.append(len(name))
+        head += name
+    fp.write(head)
+
+def write_records(fp: BinaryIO, records) -> None:
+    """ヘッダのあとに続けて書く（何回に分けて書いてもよい）"""
+    for rec in records:
+        n = len(rec)
+        if n > MAX_RECORD:
+            raise ValueError(f"game record too long: {n} bytes (max {MAX_RECORD})")
+        fp.write(bytes((n & 0xFF, n >> 8)))
+        fp.write(rec)
+
+def write_games(fp: BinaryIO, turn_order, records) -> None:
+    """records（1ゲーム1バイト列）をファイルに書く"""
+    write_header(fp, turn_order)
+    write_records(fp, records)
+
+
+# ===== 読み出し =====
+def events(rec: bytes) -> Iterator[tuple[int, int, object]]:
+    """
+    1ゲーム分を (種類, 席, 引数) に分解する
+    引数：DEAL/REFILL は山札の並び(list)、PLAY は card、DOBON は負けた席（None あり）、DRAW / END は None
+    （END の席の所は決着したか：1 / 0）
+    """
+    i = 0
+    n = len(rec)
+    while i < n:
+        b0 = rec[i]
+        kind, seat = b0 >> 4, b0 & 0x0F
+        if kind == PLAY:
+            yield kind, seat, rec[i + 1]
+            i += 2
+        elif kind in (DRAW, END):
+            yield kind, seat, None
+            i += 1
+        elif kind == DOBON:
+            loser = rec[i + 1]
+            yield kind, seat, None if loser == NO_SEAT else loser
+            i += 2
+        elif kind in (DEAL, REFILL):
+            m = rec[i + 1] | rec[i + 2] << 8
+            yield kind, seat, list(rec[i + 3:i + 3 + m])
+            i += 3 + m
+        else:
+            raise ValueError(f"broken game log at byte {i}: {b0:#x}")
+
+def result(rec: bytes) -> tuple[Optional[int], Optional[int]]:
+    """(勝った席, 負けた席)。決着していなければ (None, None)。末尾の END（と、決着したならその前の DOBON）だけ見る"""
+    if not rec or rec[-1] >> 4 != END:
+        raise ValueError("broken game log: record does not end with END")
+    if not rec[-1] & 1:
+        return None, None
+    if len(rec) < 3 or rec[-3] >> 4 != DOBON:
+        raise ValueError("broken game log: END marks a finished game without DOBON")
+    loser = rec[-2]
+    return rec[-3] & 0x0F, None if loser == NO_SEAT else loser
+
+def replay(rec: bytes, turn_order, upto: Optional[int] = None, *, rng=None):
+    """
+    ログから GameState を作り直す。upto を渡すと最初の upto イベントまで（DEAL を含む）。
+    手番・ワンクッション・見えているカード・推定も本物と同じ手順で更新される。
+    （手番は「最後に行動した人の次」に進めておく）
+    組数は DEAL の山札の枚数から決まる。
+    """
+    decks = 1
+    if rec and rec[0] >> 4 == DEAL:
+        decks = (rec[1] | rec[2] << 8) // N_CARDS
+    state = GameState(turn_order, rng=rng, decks=decks)
+    order = state.turn_order
+    for k, (kind, seat, arg) in enumerate(events(rec)):
+        if upto is not None and k >= upto:
+            break
+        if kind == DEAL:
+            state.deal(order[seat], deck=arg)
+        elif kind == PLAY:
+            state.current_player_idx = seat
+            state.play(order[seat], arg)
+        elif kind == DRAW:
+            state.current_player_idx = seat
+            state.draw(order[seat])
+        elif kind == REFILL:
+            state.refill_deck_if_empty(order=arg)
+        elif kind == DOBON:
+            state.end_game_by_dobon(order[seat], None if arg is None else order[arg])
+        if kind in (PLAY, DRAW):
+            state.next_player()
+    return state
+
+def read_games(src: Union[bytes, BinaryIO]) -> tuple[list[str], Iterator[bytes]]:
+    """
+    (席名, ゲームごとのバイト列の iterator) を返す。
+    src はファイル（バイナリ）かバイト列。大きなファイルも1ゲームずつ読む。
+    """
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        src = io.BytesIO(src)
+    if src.read(4) != MAGIC:
+        raise ValueError("not a DOBON game log")
+    n_seats = src.read(1)[0]
+    turn_order = []
+    for _ in range(n_seats):
+        m = src.read(1)[0]
+        turn_order.append(src.read(m).decode("utf-8"))
+
+    def games() -> Iterator[bytes]:
+        while True:
+            head = src.read(2)
+            if len(head) < 2:
+                return
+            n = head[0] | head[1] << 8
+            yield src.read(n)
+
+    return turn_order, games()
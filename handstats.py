@@ -0,0 +1,126 @@
+# 手札と「見えているカード」の集計（GameState が持ち、CPU の各レベルが読む）
+# engine はこれだけ使うので、cpu.py（思考）は最初に CPU が考えるときまで読み込まなくてよい
+
+from typing import Optional
+
+from cardtable import RANK
+
+# ===== ビットマスク版の手札（CPUレベルが使う高速パス） =====
+# mask : カード c → bit (c-1)
+# hist : 数字 r の枚数を 8bit ずつ詰めたもの（r → bit 8*(r-1)）
+RANK_BITS = 8
+RANK_LANE = (1 << RANK_BITS) - 1
+# 分割体制：a+b<=13 となる a,b（a==b も可）が手札の数字にある
+#   ⇔ いちばん小さい数字が 6 以下 ⇔ 1..6 のどれかを持っている
+SPLIT_LANES = (1 << (RANK_BITS * 6)) - 1
+
+class BitHand:
+    """
+    手札を整数で持つ版。合計・ペア数は出し入れのたびに O(1) で更新し、
+    分割体制は hist の下位レーン（数字1..6）を見るだけで判定する。
+    """
+    __slots__ = ("mask", "hist", "total", "pairs", "count")
+
+    def __init__(self, cards=()):
+        # add() を1枚ずつ呼ぶのと同じ結果をローカル変数だけで作る（restore などで大量に作るため）
+        mask = hist = total = pairs = count = 0
+        for c in cards:
+            r = RANK[c]
+            shift = RANK_BITS * (r - 1)
+            pairs += (hist >> shift) & 1
+            hist += 1 << shift
+            mask |= 1 << (c - 1)
+            total += r
+            count += 1
+        self.mask = mask
+        self.hist = hist
+        self.total = total
+        self.pairs = pairs
+        self.count = count
+
+    def copy(self) -> "BitHand":
+        h = BitHand.__new__(BitHand)
+        h.mask = self.mask
+        h.hist = self.hist
+        h.total = self.total
+        h.pairs = self.pairs
+        h.count = self.count
+        return h
+
+    def rank_count(self, rank: int) -> int:
+        return (self.hist >> (RANK_BITS * (rank - 1))) & RANK_LANE
+
+    def add(self, c: int):
+        r = RANK[c]
+        shift = RANK_BITS * (r - 1)
+        v = (self.hist >> shift) & RANK_LANE
+        self.pairs += v & 1   # 奇数枚→偶数枚になるとペアが1つ増える
+        self.hist += 1 << shift
+        self.mask |= 1 << (c - 1)
+        self.total += r
+        self.count += 1
+
+    def remove(self, c: int):
+        r = RANK[c]
+        shift = RANK_BITS * (r - 1)
+        v = (self.hist >> shift) & RANK_LANE
+        self.pairs -= (v + 1) & 1  # 偶数枚→奇数枚になるとペアが1つ減る
+        self.hist -= 1 << shift
+        self.mask &= ~(1 << (c - 1))
+        self.total -= r
+        self.count -= 1
+
+    def has_split(self) -> bool:
+        return (self.hist & SPLIT_LANES) != 0
+
+    def without(self, c: int) -> tuple[int, int, bool]:
+        """c を1枚抜いたときの (合計, ペア数, 分割体制)。手札は変えない"""
+        r = RANK[c]
+        shift = RANK_BITS * (r - 1)
+        v = (self.hist >> shift) & RANK_LANE
+        new_hist = self.hist - (1 << shift)
+        return self.total - r, self.pairs - ((v + 1) & 1), (new_hist & SPLIT_LANES) != 0
+
+# ===== 場に出たカードの記録（カードカウンティング） =====
+
+class SeenTracker:
+    """
+    見えているカード（捨て札 + 場札）を数字ごとに数えておく。
+    場札が変わる / 山札を再構築する たびに更新するので、
+    「数字 r はあと何枚見えていないか」が O(1) で分かる。
+    seen_rank_counts(discard, field) と同じ値を保つ。
+    """
+    __slots__ = ("counts", "copies")
+
+    def __init__(self, copies: int = 4):
+        self.copies = copies            # 各数字の枚数（1デッキなら4枚）
+        self.counts = [0] * 14          # counts[r] = 見えている r の枚数（index 0 は未使用）
+
+    def reset(self, field: Optional[int] = None, discard=()):
+        counts = [0] * 14
+        for c in discard:
+            counts[RANK[c]] += 1
+        if field is not None:
+            counts[RANK[field]] += 1
+        self.counts = counts
+
+    def copy(self) -> "SeenTracker":
+        t = SeenTracker(self.copies)
+        t.counts = self.counts[:]
+        return t
+
+    def see(self, c: int):
+        """新しい場札 c が出た（前の場札は捨て札に移るだけなので数は変わらない）"""
+        self.counts[RANK[c]] += 1
+
+    def forget(self, cards):
+        """捨て札が山札に戻った（再構築）。もう見えていない扱いに戻す"""
+        counts = self.counts
+        for c in cards:
+            counts[RANK[c]] -= 1
+
+    def seen(self, rank: int) -> int:
+        return self.counts[rank]
+
+    def unseen(self, rank: int) -> int:
+        return max(0, self.copies - self.counts[rank])
@@ -0,0 +1,122 @@
+# 計測（どこで時間を使っているか）
+#
+# ブラウザ版の「1手が遅い」のが CPU の思考 / 描画 / 画像の読み込み / 演出の待ち のどれなのかを見る。
+#   inst = Instruments(enabled=True)
+#   @inst.timed("render")          # enabled=False なら関数をそのまま返す（呼び出しの上乗せ無し）
+#   def render_panels(...): ...
+#   if inst.enabled:
+#       inst.add("decide", ms)      # 手で測るところは enabled を見てから
+#   inst.turn("cpuA")               # 手番の区切り（前の手番の内訳が turns に残る）
+#   inst.to_json()                  # 書き出し
+# js / pyodide に依存しないので、ヘッドレスでも使える。
+
+from __future__ import annotations
+
+import functools
+import inspect
+import json
+import time
+from typing import Optional
+
+def now_ms() -> float:
+    return time.perf_counter() * 1000.0
+
+class Instruments:
+    def __init__(self, enabled: bool = False, max_turns: int = 500):
+        self.enabled = enabled
+        self.max_turns = max_turns  # turns に残す手番の数（古いものから捨てる）
+        # name -> [回数, 合計ms, 最大ms]
+        self.timers: dict[str, list[float]] = {}
+        self.counters: dict[str, int] = {}
+        # 手番ごとの内訳 [{"player", "ms", <timer>_ms..., <counter>...}, ...]
+        self.turns: list[dict] = []
+        self._turn_player: Optional[str] = None
+        self._turn_start = 0.0
+        self._turn_timers: dict[str, float] = {}
+        self._turn_counters: dict[str, int] = {}
+
+    # ===== 記録 =====
+    def add(self, name: str, ms: float):
+        t = self.timers.get(name)
+        if t is None:
+            t = self.timers[name] = [0, 0.0, 0.0]
+        t[0] += 1
+        t[1] += ms
+        if ms > t[2]:
+            t[2] = ms
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def timed(self, name: str):
+        """関数（async も可）の実行時間を name に足すデコレータ。無効なら何もしない"""
+        def deco(fn):
+            if not self.enabled:
+                return fn
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def awrapper(*args, **kwargs):
+                    t0 = now_ms()
+                    try:
+                        return await fn(*args, **kwargs)
+                    finally:
+                        self.add(name, now_ms() - t0)
+                return awrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                t0 = now_ms()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.add(name, now_ms() - t0)
+            return wrapper
+        return deco
+
+    def turn(self, player: Optional[str]):
+        """手番が player に移った。前の手番の内訳（合計の差分）を turns に残す"""
+        t = now_ms()
+        if self._turn_player is not None:
+            rec = {"player": self._turn_player, "ms": round(t - self._turn_start, 2)}
+            for name, v in self.timers.items():
+                d = v[1] - self._turn_timers.get(name, 0.0)
+                if d:
+                    rec[f"{name}_ms"] = round(d, 2)
+            for name, v in self.counters.items():
+                d = v - self._turn_counters.get(name, 0)
+                if d:
+                    rec[name] = d
+            self.turns.append(rec)
+            if len(self.turns) > self.max_turns:
+                del self.turns[0]
+        self._turn_player = player
+        self._turn_start = t
+        self._turn_timers = {name: v[1] for name, v in self.timers.items()}
+        self._turn_counters = dict(self.counters)
+
+    # ===== 書き出し =====
+    def summary(self) -> dict:
+        return {
+            "timers": {
+                name: {"count": int(c), "total_ms": round(s, 2), "avg_ms": round(s / c, 3) if c else 0.0,
+                       "max_ms": round(m, 2)}
+                for name, (c, s, m) in self.timers.items()
+            },
+            "counters": dict(self.counters),
+            "turns": list(self.turns),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.summary(), ensure_ascii=False)
+
+    def format_overlay(self, last: int = 8) -> str:
+        """デバッグ表示用のテキスト（合計と直近の手番）"""
+        lines = ["timer        n   avg ms   max ms"]
+        for name, (c, s, m) in sorted(self.timers.items()):
+            lines.append(f"{name:<10} {int(c):>4} {s / c if c else 0:>8.1f} {m:>8.1f}")
+        if self.counters:
+            lines.append(" ".join(f"{k}={v}" for k, v in sorted(self.counters.items())))
+        for rec in self.turns[-last:]:
+            parts = [f"{k}={v}" for k, v in rec.items() if k not in ("player", "ms")]
+            lines.append(f"{rec['player']:<5} {rec['ms']:>7.1f}ms " + " ".join(parts))
+        return "\n".join(lines)
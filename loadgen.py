@@ -0,0 +1,238 @@
+# server.py の負荷試験（クライアントの代わりに「あなた」の席を打つボットを大量につなぐ）
+#
+#   python loadgen.py --tables 2000 --concurrency 500             # サーバーを同じプロセスで立てて WebSocket でつなぐ
+#   python loadgen.py --connect 127.0.0.1:8765 --tables 2000      # 別に立てたサーバーにつなぐ
+#   python loadgen.py --local --tables 2000                       # ソケットを通さない（LocalClient）
+#   python loadgen.py --workers 4 --pool-levels all               # CPU 席の思考を4プロセスのプールで
+#
+# ボットは lv1 と同じ打ち方（出せる最初のカード、無ければ引く）で、ドボンできると分かったらすぐ宣言する。
+# 行動を送ってから、その結果（ack 付きの diff / error）が届くまでを「行動の待ち時間」として集める。
+# 結果：終わったテーブル数 / 秒、ゲーム数 / 秒、待ち時間の p50 / p99。
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from cardtable import CAN_PLAY, RANK
+from server import POOL_LEVELS, GameServer, LocalClient
+from wsock import connect
+
+class BotPlayer:
+    """diff から自分の手札・場札・直前に行動した人を追いかけて、「あなた」として打つ"""
+
+    def __init__(self, conn, latencies: list[float]):
+        self.conn = conn
+        self.latencies = latencies
+        self.me: Optional[str] = None
+        self.hand: list[int] = []
+        self.field: Optional[int] = None
+        self.last_actor: Optional[str] = None
+        self.turn: Optional[str] = None
+        self.over = False
+        self.games = 0
+        self.errors = 0
+        self._next_id = 0
+        self._pending: Optional[tuple[int, float]] = None  # (id, 送った時刻)
+
+    async def play(self, req: dict) -> Optional[dict]:
+        """1テーブル分。最後の end メッセージを返す（途中で切れたら None）"""
+        await self.conn.send_json(req)
+        while True:
+            msg = await self.conn.recv_json()
+            if msg is None:
+                return None
+            kind = msg.get("type")
+            if kind == "table":
+                self.me = msg["you"]
+                continue
+            if kind == "end":
+                return msg
+            if "ack" in msg and self._pending is not None and msg["ack"] == self._pending[0]:
+                self.latencies.append(time.perf_counter() - self._pending[1])
+                self._pending = None
+            if kind == "error":
+                if self.me is None:
+                    return None  # テーブルを作れなかった
+                self.errors += 1
+            elif kind == "diff":
+                self.update(msg)
+            if self.me is not None and self._pending is None:
+                await self.act()
+
+    def update(self, msg: dict):
+        for ev in msg["events"]:
+            op = ev[0]
+            if op == "deal":
+                self.over = False
+                self.last_actor = None
+            elif op in ("play", "draw"):
+                self.last_actor = ev[1]
+            elif op in ("dobon", "abort"):
+                self.over = True
+                self.games += 1
+        if "hand" in msg:
+            self.hand = msg["hand"]
+        self.field = msg["field"]
+        self.turn = msg["turn"]
+
+    async def act(self):
+        if self.over or self.field is None:
+            return
+        if self.hand and self.last_actor != self.me and sum(RANK[c] for c in self.hand) == RANK[self.field]:
+            await self.send({"op": "dobon"})
+        elif self.turn == self.me:
+            row = CAN_PLAY[self.field]
+            card = next((c for c in self.hand if row[c]), None) if len(self.hand) > 1 else None
+            await self.send({"op": "draw"} if card is None else {"op": "play", "card": card})
+
+    async def send(self, msg: dict):
+        self._next_id += 1
+        msg["id"] = self._next_id
+        self._pending = (self._next_id, time.perf_counter())
+        await self.conn.send_json(msg)
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+async def run_load(
+    *,
+    tables: int,
+    concurrency: int,
+    games: int = 1,
+    players: int = 4,
+    decks: int = 1,
+    levels: Optional[dict[str, str]] = None,
+    seed: int = 0,
+    connect_to: Optional[tuple[str, int]] = None,
+    local: bool = False,
+    server: Optional[GameServer] = None,
+) -> dict:
+    """
+    tables 個のテーブルを、同時に concurrency 個までつないで最後まで遊ぶ。
+    connect_to が無ければ server（無ければ新しく作る）を同じイベントループで立てる。
+    """
+    srv = None
+    if connect_to is None:
+        server = server or GameServer(max_tables=max(concurrency, 1))
+        if not local:
+            srv = await server.start("127.0.0.1", 0)
+            connect_to = srv.sockets[0].getsockname()[:2]
+
+    latencies: list[float] = []
+    done = 0
+    failed = 0
+    played = 0
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(tables):
+        queue.put_nowait(i)
+
+    async def one(i: int):
+        nonlocal done, failed, played, errors
+        req = {"op": "new", "players": players, "decks": decks, "games": games, "seed": seed * 1_000_003 + i}
+        if levels:
+            req["levels"] = levels
+        conn = LocalClient(server) if local else await connect(*connect_to)
+        bot = BotPlayer(conn, latencies)
+        try:
+            end = await bot.play(req)
+        finally:
+            await conn.close()
+        errors += bot.errors
+        if end is None:
+            failed += 1
+        else:
+            done += 1
+            played += end["games"]
+
+    async def client():
+        while not queue.empty():
+            await one(queue.get_nowait())
+
+    t0 = time.perf_counter()
+    try:
+        await asyncio.gather(*[client() for _ in range(min(concurrency, tables))])
+    finally:
+        if srv is not None:
+            srv.close()
+            await srv.wait_closed()
+    elapsed = time.perf_counter() - t0
+
+    return {
+        "tables": done,
+        "failed": failed,
+        "games": played,
+        "concurrency": concurrency,
+        "transport": "local" if local else "websocket",
+        "elapsed": elapsed,
+        "tables_per_sec": done / elapsed if elapsed > 0 else 0.0,
+        "games_per_sec": played / elapsed if elapsed > 0 else 0.0,
+        "actions": len(latencies),
+        "rejected": errors,
+        "latency_p50_ms": percentile(latencies, 0.50) * 1000,
+        "latency_p99_ms": percentile(latencies, 0.99) * 1000,
+        "latency_max_ms": max(latencies, default=0.0) * 1000,
+    }
+
+def format_report(res: dict) -> str:
+    return "\n".join([
+        f"{res['tables']} tables ({res['games']} games) / {res['elapsed']:.2f}s"
+        f"  [{res['transport']}, concurrency={res['concurrency']}]",
+        f"  {res['tables_per_sec']:.1f} tables/sec  {res['games_per_sec']:.1f} games/sec",
+        f"  action latency: p50 {res['latency_p50_ms']:.2f} ms  p99 {res['latency_p99_ms']:.2f} ms"
+        f"  max {res['latency_max_ms']:.2f} ms  ({res['actions']} actions, {res['rejected']} rejected)",
+        f"  failed: {res['failed']}",
+    ])
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="load generator for server.py")
+    ap.add_argument("--tables", type=int, default=1000, help="遊ぶテーブルの数")
+    ap.add_argument("--concurrency", type=int, default=200, help="同時につなぐ数")
+    ap.add_argument("--games", type=int, default=1, help="1テーブルのゲーム数")
+    ap.add_argument("--players", type=int, default=4)
+    ap.add_argument("--decks", type=int, default=1)
+    ap.add_argument("--levels", default=None, help='CPU 席のレベル（JSON。例 {"cpuA": "lv3"}）')
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--connect", default=None, help="host:port（無ければ同じプロセスでサーバーを立てる）")
+    ap.add_argument("--local", action="store_true", help="ソケットを通さずに LocalClient でつなぐ")
+    ap.add_argument("--workers", type=int, default=0, help="同じプロセスで立てるサーバーの思考用プロセス数")
+    ap.add_argument("--pool-levels", default=",".join(POOL_LEVELS), help="プールに送るレベル（'all' なら全部）")
+    ap.add_argument("--json", action="store_true", help="結果を JSON で出力")
+    args = ap.parse_args(argv)
+
+    connect_to = None
+    if args.connect:
+        host, port = args.connect.rsplit(":", 1)
+        connect_to = (host, int(port))
+    executor = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 0 else None
+    pool_levels = None if args.pool_levels == "all" else [x for x in args.pool_levels.split(",") if x]
+    server = GameServer(executor=executor, pool_levels=pool_levels, max_tables=max(args.concurrency, 1))
+    try:
+        res = asyncio.run(run_load(
+            tables=args.tables,
+            concurrency=args.concurrency,
+            games=args.games,
+            players=args.players,
+            decks=args.decks,
+            levels=json.loads(args.levels) if args.levels else None,
+            seed=args.seed,
+            connect_to=connect_to,
+            local=args.local,
+            server=server,
+        ))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    print(json.dumps(res, ensure_ascii=False) if args.json else format_report(res))
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,63 @@
 from __future__ import annotations
-from js import document, window
-import random
+from js import document, window, Object
 import asyncio
-from pyodide.ffi import create_proxy
+import base64
+import importlib
+import io
+import os
+import random
+from pyodide.ffi import create_proxy, to_js
 from typing import Callable, Optional
 
-event_proxies = []
+from engine import (
+    GameState,
+    TURN_ORDER,
+    CPU_PLAYERS,
+    DEFAULT_LEVELS,
+    STRATEGIES,
+    can_play,
+    card_label,
+)
+from decider import InlineDecider, WorkerDecider
+from gamelog import GameLog, write_games
+from cardtable import CAN_PLAY, RANK
+from instrument import Instruments, now_ms
+from scheduler import DEFAULT_SPEED, SPEEDS, TurnScheduler
+
+# main.py が動き始めた時刻（ページを開いてからの ms）。起動時間の内訳に使う
+PY_START_MS = window.performance.now()
+
+# ===== 計測（?debug=1 のときだけ） =====
+# 思考 / 描画 / 画像の読み込み / 演出の待ち の時間を測り、手番ごとの内訳を残す。
+# 「D」キーで表示の ON/OFF、「E」キーで JSON を保存（window.dobonPerf() でも取れる）。
+# 無効のときは @inst.timed が関数をそのまま返し、手で測るところも inst.enabled を見るだけ。
+def debug_from_url() -> bool:
+    params = window.URLSearchParams.new(window.location.search)
+    return params.get("debug") in ("1", "true")
+
+inst = Instruments(enabled=debug_from_url())
+
+# ===== JS へ渡す proxy =====
+# 作った数 / 生きている数を数えておく（window.dobonCounters で見られる）
+# renders: 描画した回数 / dom_nodes_created: 作った <img> の数
+counters = {"proxies_created": 0, "proxies_live": 0, "renders": 0, "dom_nodes_created": 0}
+if inst.enabled:
+    inst.counters = counters  # 手番ごとの差分もこの数で取る
+
+def new_proxy(fn):
+    counters["proxies_created"] += 1
+    counters["proxies_live"] += 1
+    return create_proxy(fn)
+
+def destroy_proxy(p):
+    try:
+        p.destroy()
+    except Exception:
+        return
+    counters["proxies_live"] -= 1
+
+def publish_counters():
+    window.dobonCounters = to_js(counters, dict_converter=Object.fromEntries)
 
 # ===== DOM =====
 cpuA_title = document.getElementById("cpuA-title")
@@ -27,27 +79,131 @@ dobon_btn = document.getElementById("dobon-btn")
 # ===== cards.js bridge =====
 _cards = None
 
+@inst.timed("assets")
 async def ensure_cards():
     global _cards
     if _cards is not None:
         return _cards
-    while not hasattr(window, "cards"):
-        await asyncio.sleep(0)
+    if not hasattr(window, "cards"):
+        # cards.js が読み込まれたら "cards:bridge" が来る（確認と登録は同じ JS の手番なので取りこぼさない）
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+
+        def on_bridge(evt=None):
+            if not fut.done():
+                fut.set_result(None)
+
+        proxy = new_proxy(on_bridge)
+        window.addEventListener("cards:bridge", proxy, to_js({"once": True}, dict_converter=Object.fromEntries))
+        try:
+            await fut
+        finally:
+            destroy_proxy(proxy)
     _cards = window.cards
     return _cards
 
+@inst.timed("assets")
+async def wait_cards_shown(ids):
+    # 画面に出すカード（裏面 + ids）の読み込み・デコードだけ待つ。残りは cards.js が裏で読み続ける
+    await _cards.whenLoaded(to_js([0, *ids]))
+
+@inst.timed("wait")
+async def pause(seconds: float):
+    """演出のための待ち（計測では wait に入る）"""
+    await asyncio.sleep(seconds)
+
 # ===== Game State =====
-deck = []       # 山札（残り）
-field = None    # 場札（いちばん上1枚）
-you = []        # あなたの手札（表で見える）
-cpuA = []
-cpuB = []
-cpuC = []
-discard=[]       # 捨て札
-
-TURN_ORDER = ["you", "cpuA", "cpuB", "cpuC"]
-current_player_idx = 0
-current_player = "you"
+# 山札・場札・手札・手番などは engine.GameState が持つ（ここは表示とUIの状態だけ）
+
+def seed_from_url() -> int:
+    """?seed=123 で配り方を再現できる（無ければ毎回ちがう seed。window.dobonSeed に出す）"""
+    params = window.URLSearchParams.new(window.location.search)
+    value = params.get("seed")
+    try:
+        seed = int(value)
+    except (TypeError, ValueError):
+        seed = random.SystemRandom().randrange(1 << 31)
+    window.dobonSeed = seed
+    return seed
+
+# n ゲーム目の配りと山札補充は game_rng(seed, n) だけで決まる
+state = GameState(TURN_ORDER, seed=seed_from_url())
+# 対戦ログ（終わったゲームは window.dobonLog に base64 で置く。gamelog.read_games で読める）
+state.log = GameLog(state.turn_order)
+
+def publish_log():
+    buf = io.BytesIO()
+    write_games(buf, state.log.turn_order, state.log.records)
+    window.dobonLog = base64.b64encode(buf.getvalue()).decode("ascii")
+
+def cpu_levels_from_url():
+    """?cpuC=lv4 のように、URL で CPU ごとのレベルを差し替えられる"""
+    params = window.URLSearchParams.new(window.location.search)
+    levels = dict(DEFAULT_LEVELS)
+    for p in CPU_PLAYERS:
+        name = params.get(p)
+        if name in STRATEGIES:
+            levels[p] = name
+    return levels
+
+cpu_levels = cpu_levels_from_url()
+
+# ===== CPU の手番の速さ =====
+def speed_from_url() -> str:
+    """?speed=fast / instant で CPU の手番の待ちを短く / 無くせる（animated が今までどおり）"""
+    params = window.URLSearchParams.new(window.location.search)
+    name = params.get("speed")
+    return name if name in SPEEDS else DEFAULT_SPEED
+
+scheduler = TurnScheduler(speed_from_url(), sleep=pause)
+
+def set_speed(name=None) -> str:
+    """window.dobonSpeed("instant") で途中から変える（引数なしなら今の速さを返すだけ）"""
+    if name is not None:
+        scheduler.set_speed(str(name))
+    return scheduler.speed
+
+window.dobonSpeed = new_proxy(set_speed)
+
+# ===== CPU の思考（UIスレッドの外） =====
+# worker の準備ができるまではその場で考え、できたら worker に切り替える
+decider = InlineDecider()
+
+# UI スレッドで考えるとき（worker の準備前）に使う思考モジュール。起動時には取りに行かない
+LAZY_FILES = {"cpu": ("odds.py", "cpu.py", "decision_cache.py"), "mcts": ("mcts.py",), "endgame": ("endgame.py",)}
+# レベル → cpu のほかに要るもの
+LEVEL_FILES = {"lv4": "mcts", "endgame": "endgame"}
+_fetched: set[str] = set()
+
+async def ensure_cpu_modules(level: str):
+    """cpu.py / odds.py / decision_cache.py（lv4 なら mcts.py、endgame なら endgame.py も）が無ければ取ってきて import できるようにする"""
+    from pyodide.http import pyfetch
+
+    names = ["cpu", LEVEL_FILES[level]] if level in LEVEL_FILES else ["cpu"]
+    files = [f for n in names for f in LAZY_FILES[n] if f not in _fetched]
+    if not files:
+        return
+    t0 = now_ms()
+    for fname in files:
+        if not os.path.exists(fname):
+            resp = await pyfetch(f"./{fname}?v=1.1a")
+            if not resp.ok:
+                # 404 のページなどを .py として書くと import で分かりにくい失敗になるので、ここで止める
+                raise RuntimeError(f"failed to fetch {fname}: HTTP {resp.status}")
+            with open(fname, "wb") as f:
+                f.write(await resp.bytes())
+        _fetched.add(fname)
+    importlib.invalidate_caches()
+    if inst.enabled:
+        inst.add("assets", now_ms() - t0)
+
+async def connect_cpu_worker():
+    global decider
+    try:
+        decider = await WorkerDecider.connect("cpu-worker")
+    except Exception as e:
+        window.console.warn(f"cpu-worker が使えないので UI スレッドで考えます: {e}")
+
 dobon_waiting = False
 win_stats = {
     "you":  {"win": 0, "total": 0},
@@ -56,15 +212,11 @@ win_stats = {
     "cpuC": {"win": 0, "total": 0},
 }
 
-game_over = False  # 勝敗がついたら True
-
 selected = None  # iPad向け：選択中カードid（1回目タップで選択）
 
 busy = False
 cpu_running = False  # CPUが行動中はTrue（あなたの操作を一時的に無効化）
 reveal_cpu = None   # "cpuA" / "cpuB" / "cpuC" / None
-last_actor = None  # 最後に行動したプレーヤー
-last_winner = None   # "you", "cpuA", "cpuB", "cpuC"
 
 def win_rate_str(player: str) -> str:
     w = win_stats[player]["win"]
@@ -77,14 +229,6 @@ def render_cpu(panel_title_el, panel_cards_el, name: str, cards_list, pid: str):
     stats = win_rate_str(pid)
     panel_title_el.innerText = f"{name}（{n}枚） {stats}"
 
-# ---- カード番号→(スート,数字)の割り当て ----
-# c1..c52 の並びは「♣→♦→♥→♠（各A..K）」
-def card_to_suit_rank(i: int):
-    suit_index = (i - 1) // 13  # 0..3
-    rank = (i - 1) % 13 + 1     # 1..13
-    suits = ["C", "D", "H", "S"]  # ♣ ♦ ♥ ♠ 
-    return suits[suit_index], rank
-
 def dobon_possible():
     """
     ルール：手札「すべて」の合計が、場の数字と一致したらドボン可能
@@ -92,30 +236,12 @@ def dobon_possible():
       ok: bool
       used: list（将来拡張用。今は手札全部を返す）
     """
-    if field is None or len(you) == 0:
-        return False, []
-
-    target = card_to_suit_rank(field)[1]
-    total = sum(card_to_suit_rank(cid)[1] for cid in you)
-
-    ok = (total == target)
-    used = you[:] if ok else []
+    ok = state.can_dobon("you")
+    used = state.get_hand("you")[:] if ok else []
     return ok, used
 
-
-def can_play(card_id: int, field_id: int) -> bool:
-    s1, r1 = card_to_suit_rank(card_id)
-    s2, r2 = card_to_suit_rank(field_id)
-    return (s1 == s2) or (r1 == r2)
-
 def has_playable():
-    if field is None:
-        return False
-    # ★残り1枚は「ドボン宣言」以外では出せない＝playable扱いにしない
-    if len(you) == 1:
-        return False
-
-    return any(can_play(cid, field) for cid in you)
+    return state.has_playable("you")
 
 
 def set_msg(text: str, ok=False, ng=False):
@@ -149,6 +275,7 @@ def show_loading_cards():
 
     for i, left in enumerate(positions):
         im = document.createElement("img")
+        counters["dom_nodes_created"] += 1
         im.src = back_url
         im.className = "loading-card"
         im.style.left = f"{left}px"
@@ -168,33 +295,117 @@ def hide_loading_cards():
     if overlay:
         overlay.classList.add("hidden")
 
+# ===== 差分描画 =====
+# 毎回作り直さず、変わったところだけ DOM に書く（iPad でのカクつき対策）
+_last_written: dict[tuple[str, str], str] = {}
+
+def set_prop(el, prop: str, value: str):
+    """el.prop（"style.xxx" なら style）に、前回と違うときだけ書く。el には id が必要"""
+    key = (el.id, prop)
+    if _last_written.get(key) == value:
+        return
+    _last_written[key] = value
+    if prop.startswith("style."):
+        setattr(el.style, prop[6:], value)
+    else:
+        setattr(el, prop, value)
+
+class KeyedCards:
+    """
+    1つのパネル内の <img> をカードidごとに1つだけ持って使い回す。
+    sync() に「こう見えてほしい」一覧を渡すと、増えた/減ったカードの追加・削除、
+    並び替え、class / 画像 / 位置の変わったところだけを DOM に反映する。
+    """
+
+    def __init__(self, container, on_create=None, on_remove=None):
+        self.container = container
+        self.on_create = on_create
+        self.on_remove = on_remove
+        self.nodes = {}    # cid -> <img>
+        self.applied = {}  # cid -> 前回書いた spec
+        self.order = []    # いまの DOM 上の並び
+
+    def sync(self, specs):
+        """
+        specs: [(cid, url, className, left, top, zIndex, position), ...]（表示順）
+        left/top/zIndex/position は使わないとき ""（前の値は消える）
+        """
+        keys = [sp[0] for sp in specs]
+        alive = set(keys)
+
+        for cid in [k for k in self.nodes if k not in alive]:
+            im = self.nodes.pop(cid)
+            self.applied.pop(cid, None)
+            if self.on_remove:
+                self.on_remove(cid, im)
+            self.container.removeChild(im)
+
+        for sp in specs:
+            cid, url, cls, left, top, z, position = sp
+            im = self.nodes.get(cid)
+            if im is None:
+                im = document.createElement("img")
+                counters["dom_nodes_created"] += 1
+                self.nodes[cid] = im
+                if self.on_create:
+                    self.on_create(cid, im)
+            prev = self.applied.get(cid)
+            if prev == sp:
+                continue
+            if prev is None or prev[1] != url:
+                im.src = url
+            if prev is None or prev[2] != cls:
+                im.className = cls
+            if prev is None or prev[3] != left:
+                im.style.left = left
+            if prev is None or prev[4] != top:
+                im.style.top = top
+            if prev is None or prev[5] != z:
+                im.style.zIndex = z
+            if prev is None or prev[6] != position:
+                im.style.position = position
+            self.applied[cid] = sp
+
+        # 並びが変わったときだけ差し込み直す（appendChild は移動になる）
+        if keys != self.order:
+            for cid in keys:
+                self.container.appendChild(self.nodes[cid])
+            self.order = keys
+
 def set_img_src_initial(img, url: str):
     # 初回表示用：読み込み完了まで隠す
     img.classList.remove("ready")
     img.src = url
+    _last_written[(img.id, "src")] = url
 
 def set_img_src_smooth(img, url: str):
-    # 通常更新用：隠さず、そのまま差し替える
-    img.src = url
+    # 通常更新用：隠さず、そのまま差し替える（同じ画像なら書かない）
+    set_prop(img, "src", url)
     img.classList.add("ready")
 
-def render_cpu(panel_title_el, panel_cards_el, name: str, cards_list, pid: str):
+def measure_widths(panels=("cpuA", "cpuB", "cpuC", "you")) -> dict[str, int]:
+    """レイアウトの読み取り（clientWidth）は書き込みの前にまとめて1回で済ませる"""
+    els = {"cpuA": cpuA_cards, "cpuB": cpuB_cards, "cpuC": cpuC_cards, "you": your_hand}
+    return {p: int(els[p].clientWidth or 0) for p in panels if p in els}
+
+def render_cpu(panel_title_el, panel_cards_el, name: str, cards_list, pid: str, width: Optional[int] = None):
     global reveal_cpu
 
     n = len(cards_list)
-    panel_title_el.innerText = f"{name}（{n}枚） {win_rate_str(pid)}"
-
-    clear_node(panel_cards_el)
+    set_prop(panel_title_el, "innerText", f"{name}（{n}枚） {win_rate_str(pid)}")
 
     if n <= 0:
-        panel_cards_el.style.minHeight = "70px"
+        cpu_rows[pid].sync([])
+        set_prop(panel_cards_el, "style.minHeight", "70px")
         return
 
     # ★このCPUだけ表を見せる
     reveal = (reveal_cpu == pid)
 
     # 幅計算などは今まで通り（省略せずそのまま残す）
-    w = int(panel_cards_el.clientWidth) if panel_cards_el.clientWidth else 260
+    if width is None:
+        width = int(panel_cards_el.clientWidth or 0)
+    w = width if width else 260
     avail = max(120, w - 8)
     card_w = 56 if w < 240 else 52
     gap = 10
@@ -212,58 +423,60 @@ def render_cpu(panel_title_el, panel_cards_el, name: str, cards_list, pid: str):
     else:
         step_x = card_w + gap
 
-    panel_cards_el.style.minHeight = "78px" if use_stack else "70px"
+    set_prop(panel_cards_el, "style.minHeight", "78px" if use_stack else "70px")
 
+    back_url = _cards.getUrl(0)
+    specs = []
     for idx in range(n):
+        cid = cards_list[idx]
         # ★表or裏のURLを切り替える
-        url = _cards.getUrl(cards_list[idx]) if reveal else _cards.getUrl(0)
-        im = img_el(url, "cpu-card")
+        url = _cards.getUrl(cid) if reveal else back_url
 
         if use_stack:
-            im.classList.add("stack")
-            im.style.left = f"{idx * step_x}px"
-            im.style.top = f"{base_top}px"
-            im.style.zIndex = str(idx)
+            specs.append((cid, url, "cpu-card stack", f"{idx * step_x}px", f"{base_top}px", str(idx), ""))
+        else:
+            specs.append((cid, url, "cpu-card", "", "", "", ""))
 
-        panel_cards_el.appendChild(im)
+    cpu_rows[pid].sync(specs)
 
 def render_you_title():
-    n = len(you)
+    n = len(state.get_hand("you"))
     stats = win_rate_str("you")
-    you_title.innerText = f"あなた（{n}枚） {stats}"
+    set_prop(you_title, "innerText", f"あなた（{n}枚） {stats}")
 
 def render_deck():
-    deck_title.innerText = f"山のカード（{len(deck)}枚）"
+    set_prop(deck_title, "innerText", f"山のカード（{len(state.deck)}枚）")
     set_img_src_smooth(deck_img, _cards.getUrl(0))
 
-    if len(deck) == 0 or has_playable():
+    if len(state.deck) == 0 or has_playable():
         deck_img.classList.add("disabled")
     else:
         deck_img.classList.remove("disabled")
 
 def render_field():
-    if field is None:
+    if state.field is None:
         set_img_src_smooth(field_img, _cards.getUrl(0))
     else:
-        set_img_src_smooth(field_img, _cards.getUrl(field))
-
-def render_hand():
-    global event_proxies
+        set_img_src_smooth(field_img, _cards.getUrl(state.field))
 
-    # 古い proxy を破棄（クリックが増殖しないように）
-    for p in event_proxies:
-        try:
-            p.destroy()
-        except Exception:
-            pass
-    event_proxies = []
+# 手札のクリックは #your-hand に1つだけ付けた handler で受ける（カードごとに proxy を作らない）
+def _hand_card_created(cid, im):
+    im.dataset.cardId = str(cid)
 
-    clear_node(your_hand)
+cpu_rows = {
+    "cpuA": KeyedCards(cpuA_cards),
+    "cpuB": KeyedCards(cpuB_cards),
+    "cpuC": KeyedCards(cpuC_cards),
+}
+hand_row = KeyedCards(your_hand, _hand_card_created)
 
+def render_hand(width: Optional[int] = None):
+    you = state.get_hand("you")
+    field = state.field
     card_ids = list(you)
 
     # コンテナ幅
-    w = int(your_hand.clientWidth)
+    w = width if width is not None else int(your_hand.clientWidth)
     pad = 28
     avail = max(200, w - pad)
 
@@ -275,7 +488,7 @@ def render_hand():
     use_stack = total_normal > avail
 
     # ★上余白：通常/重ねで切替（ホバーで上がっても切れない）
-    your_hand.style.paddingTop = "70px" if use_stack else "38px"
+    set_prop(your_hand, "style.paddingTop", "70px" if use_stack else "38px")
 
     # 重ね表示のパラメータ
     step_x = 34
@@ -297,36 +510,23 @@ def render_hand():
 
     # 高さ確保
     if use_stack:
-        your_hand.style.minHeight = f"{260 + (rows - 1) * step_y}px"
+        set_prop(your_hand, "style.minHeight", f"{260 + (rows - 1) * step_y}px")
     else:
-        your_hand.style.minHeight = "240px"
+        set_prop(your_hand, "style.minHeight", "240px")
 
     # 出せる/出せない（表示用）
     playable = set()
     if field is not None:
-        for c in you:
-            if can_play(c, field):
-                playable.add(c)
+        row = CAN_PLAY[field]
+        playable = {c for c in you if row[c]}
 
+    specs = []
     for idx, cid in enumerate(card_ids):
-        im = img_el(_cards.getUrl(cid), "hand-card")
-        im.dataset.cardId = str(cid)
-
+        cls = "hand-card"
         if selected == cid:
-            im.classList.add("selected")
-
+            cls += " selected"
         if field is not None and cid not in playable:
-            im.classList.add("disabled")
-
-        # クリック handler（proxyで保持）
-        def make_onclick(card_id):
-            def _onclick(evt):
-                asyncio.create_task(play_card(card_id))
-            return _onclick
-
-        handler = create_proxy(make_onclick(cid))
-        event_proxies.append(handler)
-        im.addEventListener("click", handler)
+            cls += " disabled"
 
         # ★★★ ここが超安全：r/cidx を必ず定義してから使う ★★★
         r = 0
@@ -341,37 +541,148 @@ def render_hand():
             left = cidx * step_x
             top = base_top + r * step_y
 
-            im.classList.add("stack")
-            im.style.left = f"{left}px"
-            im.style.top = f"{top}px"
-            im.style.zIndex = str(idx)
+            specs.append((cid, _cards.getUrl(cid), cls + " stack", f"{left}px", f"{top}px", str(idx), ""))
         else:
-            im.style.position = "static"
-
-        your_hand.appendChild(im)
-
+            specs.append((cid, _cards.getUrl(cid), cls, "", "", "", "static"))
+
+    hand_row.sync(specs)
+
+
+@inst.timed("render")
+def render_panels(panels):
+    counters["renders"] += 1
+    # 先に幅をまとめて読んでから書く（読み書きを交互にしてレイアウトを何度も走らせない）
+    widths = measure_widths(panels)
+    if "cpuA" in panels:
+        render_cpu(cpuA_title, cpuA_cards, "プレーヤーA", state.get_hand("cpuA"), "cpuA", widths["cpuA"])
+    if "cpuB" in panels:
+        render_cpu(cpuB_title, cpuB_cards, "プレーヤーB", state.get_hand("cpuB"), "cpuB", widths["cpuB"])
+    if "cpuC" in panels:
+        render_cpu(cpuC_title, cpuC_cards, "プレーヤーC", state.get_hand("cpuC"), "cpuC", widths["cpuC"])
+    if "you" in panels:
+        render_you_title()
+        render_hand(widths["you"])
+    if "field" in panels:
+        render_field()
+    if "deck" in panels:
+        render_deck()
+    if "dobon" in panels:
+        dobon_btn = document.getElementById("dobon-btn")
+        if can_dobon():   # 判定関数
+            dobon_btn.classList.add("ready")
+        else:
+            dobon_btn.classList.remove("ready") 
+    publish_counters()
 
 def render_all():
-    render_cpu(cpuA_title, cpuA_cards, "プレーヤーA", cpuA, "cpuA")
-    render_cpu(cpuB_title, cpuB_cards, "プレーヤーB", cpuB, "cpuB")
-    render_cpu(cpuC_title, cpuC_cards, "プレーヤーC", cpuC, "cpuC")
-    render_you_title()
-    render_field()
-    render_deck()
-    render_hand()
-    dobon_btn = document.getElementById("dobon-btn")
-    if can_dobon():   # 判定関数
-        dobon_btn.classList.add("ready")
-    else:
-        dobon_btn.classList.remove("ready") 
+    """全部いますぐ描く（予約済みの分もここで済む）"""
+    _dirty.clear()
+    render_panels(ALL_PANELS)
+    update_debug_overlay()
+
+# ===== 描画の予約 =====
+# 状態を変えたら invalidate() で「描き直しが要るパネル」に印を付けるだけにして、
+# requestAnimationFrame で 1フレームに1回、印の付いたパネルだけ描く
+ALL_PANELS = ("cpuA", "cpuB", "cpuC", "you", "field", "deck", "dobon")
+# hold_render() の間は印を付けるだけで描かず、release_render() でまとめて描く（instant の速さ）
+_dirty: set[str] = set()
+_frame_requested = False
+_frame_proxy = None
+_render_held = False
+
+def invalidate(*panels):
+    """panels を省略すると全部"""
+    global _frame_requested, _frame_proxy
+    _dirty.update(panels or ALL_PANELS)
+    if _frame_requested or _render_held:
+        return
+    if _frame_proxy is None:
+        _frame_proxy = new_proxy(_on_frame)
+    _frame_requested = True
+    window.requestAnimationFrame(_frame_proxy)
+
+def _on_frame(timestamp=None):
+    global _frame_requested
+    _frame_requested = False
+    flush_render()
+
+def flush_render():
+    if _render_held or not _dirty:
+        return
+    panels = set(_dirty)
+    _dirty.clear()
+    render_panels(panels)
+    update_debug_overlay()
+
+def hold_render():
+    global _render_held
+    _render_held = True
+
+def release_render():
+    global _render_held
+    _render_held = False
+    flush_render()
+
+# ===== 計測の表示 =====
+_debug_overlay = None
+
+def setup_debug_overlay():
+    global _debug_overlay
+    if not inst.enabled:
+        return
+    _debug_overlay = document.createElement("pre")
+    _debug_overlay.id = "debug-overlay"
+    document.body.appendChild(_debug_overlay)
+    window.dobonPerf = new_proxy(lambda: inst.to_json())
+    document.addEventListener("keydown", new_proxy(on_debug_key))
+    update_debug_overlay()
+
+def update_debug_overlay():
+    if _debug_overlay is None or _debug_overlay.classList.contains("hidden"):
+        return
+    _debug_overlay.textContent = inst.format_overlay()
+
+def export_perf_json():
+    blob = window.Blob.new(to_js([inst.to_json()]), to_js({"type": "application/json"}, dict_converter=Object.fromEntries))
+    url = window.URL.createObjectURL(blob)
+    a = document.createElement("a")
+    a.href = url
+    a.download = "dobon-perf.json"
+    a.click()
+    window.URL.revokeObjectURL(url)
+
+def on_debug_key(evt):
+    key = (evt.key or "").lower()
+    if key == "d":
+        _debug_overlay.classList.toggle("hidden")
+        update_debug_overlay()
+    elif key == "e":
+        export_perf_json()
+
+# ===== 起動時間 =====
+_first_interactive_ms = None
+
+def report_first_interactive():
+    """最初に手札を触れるようになった時刻（ページを開いてからの ms）を1回だけ記録する"""
+    global _first_interactive_ms
+    if _first_interactive_ms is not None:
+        return
+    _first_interactive_ms = window.performance.now()
+    window.dobonStartup = to_js(
+        {"python_start_ms": PY_START_MS, "first_interactive_ms": _first_interactive_ms},
+        dict_converter=Object.fromEntries,
+    )
+    window.console.info(
+        f"DOBON: python {PY_START_MS:.0f}ms / first interactive {_first_interactive_ms:.0f}ms"
+    )
+    if inst.enabled:
+        inst.add("python_start", PY_START_MS)
+        inst.add("first_interactive", _first_interactive_ms)
 
 # ===== Actions =====
 async def reset_async():
-    global deck, field, discard
-    global you, cpuA, cpuB, cpuC
-    global busy, game_over, dobon_waiting
-    global current_player_idx, current_player
-    global selected, last_actor, last_winner
+    global busy, dobon_waiting
+    global selected
     global reveal_cpu
     
     # ブリンク解除
@@ -389,44 +700,25 @@ async def reset_async():
         show_loading_cards()
 
         # ===== 全フラグ完全リセット =====
-        game_over = False
         dobon_waiting = False
         selected = None
-        last_actor = None
         reveal_cpu = None        
 
-        # ===== 先行プレイヤー決定 =====
-        if last_winner is None:
-        # 初回は you
-            start_player = "you"
-        else:
-            # 前回の勝者
-            start_player = last_winner
-
-        current_player_idx = TURN_ORDER.index(start_player)
-        current_player = TURN_ORDER[current_player_idx]
-
-
         set_dobon_alert(False)
         dobon_btn.disabled = False
         
-        # シャッフル
-        deck = list(range(1, 53))
-        random.shuffle(deck)
-        # ★ここで discard をクリア
-        discard = []
-
-        # 5枚ずつ配る
-        you = [deck.pop() for _ in range(5)]
-        cpuA = [deck.pop() for _ in range(5)]
-        cpuB = [deck.pop() for _ in range(5)]
-        cpuC = [deck.pop() for _ in range(5)]
+        # ===== シャッフルして配る =====
+        # 先行は前回の勝者（初回は you）。last_actor / game_over もここで戻る
+        state.deal()
+        current_player = state.current_player
+        if inst.enabled:
+            inst.turn(current_player)
 
-        # 場に1枚（表）
-        field = deck.pop()
+        # 全カードは待たず、いま表に見える場札とあなたの手札（と裏面）だけ待つ
+        await wait_cards_shown([state.field, *state.hands["you"]])
 
         # 画像初期化（リンク切れ防止）
-        set_img_src_initial(field_img, _cards.getUrl(field))
+        set_img_src_initial(field_img, _cards.getUrl(state.field))
         set_img_src_initial(deck_img, _cards.getUrl(0))
         # UI初期化
         deck_img.classList.remove("disabled")
@@ -442,19 +734,13 @@ async def reset_async():
             "同じ（マークか数字）／ない→山から取る",
             ok=True
         )
-        await asyncio.sleep(0.5)
+        await scheduler.dealt()
         hide_loading_cards() 
+        report_first_interactive()
         
-        if current_player in ("cpuA", "cpuB", "cpuC"):
-            await asyncio.sleep(0.5)
+        if current_player in CPU_PLAYERS:
+            await scheduler.dealt()
             asyncio.create_task(run_cpu_turns_until_you())
-                
-        # 山札クリック
-        def on_deck_click(evt):
-            asyncio.create_task(draw_from_deck())
-
-        # 二重登録防止のため、毎回入れ替え
-        deck_img.onclick = on_deck_click
 
     finally:
         busy = False
@@ -466,17 +752,17 @@ async def tap_card(card_id: int):
     # 1回目：選択
     if selected != card_id:
         selected = card_id
-        render_hand()  # 選択表示だけ更新（全体render_allでもOK）
+        invalidate("you")  # 選択表示だけ更新
         return
 
     # 2回目：同じカード→出す試行
     await play_card(card_id)
 
 async def play_card(card_id: int):
-    global field, busy, selected, last_actor, cpu_running
+    global busy, selected, cpu_running
 
     # ★CPUが動いている間は you は出せない（ドボンボタンだけ許す）
-    if cpu_running or current_player != "you":
+    if cpu_running or state.current_player != "you":
         set_msg("CPUの手番中です。ドボン以外はできません。", ng=True)
         return
 
@@ -484,6 +770,8 @@ async def play_card(card_id: int):
         return
     busy = True
     try:
+        field = state.field
+        you = state.get_hand("you")
         if field is None:
             return
 
@@ -493,8 +781,8 @@ async def play_card(card_id: int):
         
         # ★手札が1枚のときは「ドボン宣言」以外では上がれないので出せない
         if len(you) == 1:
-            target = card_to_suit_rank(field)[1]
-            total = card_to_suit_rank(you[0])[1]
+            target = RANK[field]
+            total = RANK[you[0]]
             if total == target:
                 set_msg("手札が1枚です。カードは出さずに「ドボン！」を押してください。", ok=True)
             else:
@@ -505,21 +793,12 @@ async def play_card(card_id: int):
             set_msg("そのカードは場に出せません。\n（同じマーク か 同じ数字）", ng=True)
             return
 
-        # 場に出す
-        you.remove(card_id)
-
-        # いまの場札を捨て札へ
-        if field is not None:
-            discard.append(field)
-        # 新しい場札へ
-        field = card_id
+        # 場に出す（いまの場札は捨て札へ・last_actor も engine 側で記録）
+        state.play("you", card_id)
         selected = None
 
-        # ★追加：この手番で“行動した人”を記録
-        last_actor = "you"   # 将来CPU実装したら current_player で入れる
-
         set_msg("場に出しました。\n", ok=True)
-        render_all()
+        invalidate("you", "field", "deck", "dobon")
         # you が行動したので次へ
         next_player()
         asyncio.create_task(run_cpu_turns_until_you())
@@ -529,10 +808,10 @@ async def play_card(card_id: int):
 
 
 async def draw_from_deck():
-    global busy, selected, last_actor
+    global busy, selected
 
     # ★CPUが動いている間は you は引けない（ドボンボタンだけ許す）
-    if cpu_running or current_player != "you":  
+    if cpu_running or state.current_player != "you":  
         set_msg("CPUの番です。ドボン以外ＮＧ。", ng=True)
         return
 
@@ -542,9 +821,9 @@ async def draw_from_deck():
     busy = True
     try:
         # ===== 山札補充チェック =====
-        refilled = refill_deck_if_empty()
+        refilled = state.refill_deck_if_empty()
 
-        if len(deck) == 0:
+        if len(state.deck) == 0:
             set_msg("山札も捨て札もありません。\n", ng=True)
             return
 
@@ -554,36 +833,25 @@ async def draw_from_deck():
             return
 
         # ===== 山札から引く =====
-        c = deck.pop()
-        you.append(c)
+        # 引いたのも“行動”なので last_actor に記録される（次にドボンされたらこの人が負け）
+        state.draw("you")
         selected = None
 
-        # ★追加：引いたのも“行動”なので記録（次にドボンされたらこの人が負け）
-        last_actor = "you"  # 将来CPU実装したら current_player で入れる
-
         # ===== メッセージ制御 =====
         if refilled:
             set_msg("山札を再構築しました。\n山札から1枚取りました。\n", ok=True)
         else:
             set_msg("山札から1枚取りました。\n", ok=True)
 
-        render_all()
+        invalidate("you", "deck", "dobon")
         next_player()
         asyncio.create_task(run_cpu_turns_until_you())
 
     finally:
         busy = False
 
-def card_label(cid: int) -> str:
-    s, r = card_to_suit_rank(cid)
-    suit_symbol = {"C":"♣","D":"♦","H":"♥","S":"♠"}.get(s, s)
-    return f"{suit_symbol}{r}"
-
-def hand_sum(cards):
-    return sum(card_to_suit_rank(cid)[1] for cid in cards)
-
 async def try_dobon_async():
-    global busy, dobon_waiting, last_actor
+    global busy, dobon_waiting
 
     if busy:
         return
@@ -591,9 +859,10 @@ async def try_dobon_async():
     busy = True
     try:
         ok, used = dobon_possible()
+        last_actor = state.last_actor
 
-        target = card_to_suit_rank(field)[1]
-        total = sum(card_to_suit_rank(cid)[1] for cid in you)
+        target = RANK[state.field]
+        total = state.stats["you"].total
 
         # ===== ワンクッション =====
         if ok and last_actor == "you":
@@ -640,22 +909,6 @@ def can_dobon():
     ok, _ = dobon_possible()
     return ok
 
-def refill_deck_if_empty():
-    """山札が空なら、場の一番上(field)だけ残して discard をシャッフルして山に戻す"""
-    global deck, discard, field
-
-    if len(deck) > 0:
-        return False
-
-    # discard が無ければ補充できない
-    if len(discard) == 0:
-        return False
-
-    random.shuffle(discard)
-    deck = discard[:]   # 山札に戻す
-    discard = []        # 捨て札は空に
-    return True
-
 def set_turn_ui(player: str):
     # いったん全部OFF
     for pid in ["you-box", "cpuA-box", "cpuB-box", "cpuC-box"]:
@@ -679,137 +932,78 @@ def name_ja(player: str) -> str:
     }[player]
 
 def next_player():
-    global current_player_idx, current_player
-    current_player_idx = (current_player_idx + 1) % len(TURN_ORDER)
-    current_player = TURN_ORDER[current_player_idx]
-    set_turn_ui(current_player)
-
-def get_hand(player: str) -> list[int]:
-    if player == "cpuA": return cpuA
-    if player == "cpuB": return cpuB
-    if player == "cpuC": return cpuC
-    raise ValueError("player must be cpuA/cpuB/cpuC")
+    player = state.next_player()
+    if inst.enabled:
+        inst.turn(player)
+    set_turn_ui(player)
 
 async def cpu_play(player: str, card_id: int):
-    global field, selected, last_actor
-
-    hand = get_hand(player)
-    # タイミング差
-    if card_id not in hand:
-        await cpu_draw(player)
-        return
-
-    # 残り1枚は “ドボン宣言以外で上がれない” ルール（CPUにも同様に適用）
-    if len(hand) == 1:
-        await cpu_draw(player)
-        return
-
-    if not can_play(card_id, field):
+    # 手札に無い（タイミング差）/ 残り1枚 / 出せない → engine が弾くので山から引く
+    # ★直前に行動した人（last_actor）も engine 側で記録
+    if not state.play(player, card_id):
         await cpu_draw(player)
         return
 
-    # 捨て札へ
-    if field is not None:
-        discard.append(field)
-
-    hand.remove(card_id)
-    field = card_id
-
-    # ★直前に行動した人（重要！）
-    last_actor = player
-
     set_msg(f"{name_ja(player)} が場に出しました。\n", ok=True)
-    render_all()
+    # 場札が変わると、あなたの手札の「出せる/出せない」と山札・ドボンボタンも変わる
+    invalidate(player, "field", "you", "deck", "dobon")
 
 async def cpu_draw(player: str):
-    global last_actor
-
-    # 山札補充
-    refill_deck_if_empty()
-    if len(deck) == 0:
+    # 山札補充込みで1枚引く（★直前に行動した人も engine 側で記録）
+    if state.draw(player) is None:
         set_msg("山札も捨て札もありません。\n", ng=True)
         return
 
-    hand = get_hand(player)
-
-    c = deck.pop()
-    hand.append(c)
-
-    # ★直前に行動した人（重要！）
-    last_actor = player
     set_msg(f"{name_ja(player)} が山から1枚取りました。\n", ok=True)
-    render_all()
+    invalidate(player, "deck")
 
 async def run_cpu_turns_until_you():
-    global busy, game_over, current_player, last_actor, dobon_waiting, cpu_running
+    global busy, dobon_waiting, cpu_running
 
     cpu_running = True
+    # 待たない速さでは途中を描いても見えないので、あなたの番に戻る（or 止まる）まで描かない
+    if scheduler.batch:
+        hold_render()
     try:
-        while (not game_over) and current_player != "you":
+        while (not state.game_over) and state.current_player != "you":
+            current_player = state.current_player
 
             set_turn_ui(current_player)
-            await asyncio.sleep(0.35)
+            await scheduler.cpu_turn()
 
             # ===== you優先：ドボンチャンスならCPU停止 =====
-            if can_dobon() and last_actor != "you":
+            if can_dobon() and state.last_actor != "you":
                 dobon_waiting = True
                 set_dobon_alert(True)
                 set_msg("ドボンチャンス！「ドボン！」を押してください。\n", ok=True)
                 return
 
-            hand = get_hand(current_player)
-
-            if field is None:
+            if state.field is None:
                 next_player()
                 continue
 
             # ===== CPU 即ドボン判定（行動前） =====
-            if cpu_can_dobon(hand) and last_actor != current_player:
-                loser = last_actor if last_actor else "（不明）"
+            if cpu_can_dobon(current_player) and state.last_actor != current_player:
+                loser = state.last_actor if state.last_actor else "（不明）"
                 end_game_by_dobon(current_player, loser)
                 return
 
             # ===== 行動選択 =====
-            if len(hand) == 1:
-                # ワンクッションルール
-                chosen = None
-
-            else:
-                chosen = None
-
-                # --- ① この1手で「次ターンドボン体制」を作れるか？ ---
-                playable = [c for c in hand if can_play(c, field)]
-                for c in playable:
-                    new_hand = hand[:]
-                    new_hand.remove(c)
-
-                    # 出した直後は自分はドボン不可（ワンクッション）
-                    # なので「次の自分の番でドボン可能形」になっているかを見る
-                    if cpu_can_dobon(new_hand):
-                        chosen = c
-                        break
-
-                # --- アルゴリズム ---
-                if chosen is None:
-                    if current_player == "cpuA":
-                        chosen = choose_card_lv1(hand, field, can_play)
-
-                    elif current_player == "cpuB":
-                        chosen = choose_card_lv2_keep_field(hand, field, can_play)
-
-                    elif current_player == "cpuC":
-                        chosen = choose_card_lv3(
-                            hand,
-                            field,
-                            can_play,
-                            discard=discard,
-                            you_hand_count=len(you),
-                            other_counts=[len(cpuA), len(cpuB)],
-                            keep_field_bias=True,
-                        )
-                    
-                    else:
-                        chosen = None
+            # 残り1枚（ワンクッション）・「次ターンドボン体制」・レベル別アルゴリズムは engine 側。
+            # 考えている間も描画とドボンボタンは動く。ドボン宣言されたら結果は捨てる
+            if inst.enabled:
+                t0 = now_ms()
+            try:
+                if isinstance(decider, InlineDecider):
+                    await ensure_cpu_modules(cpu_levels[current_player])
+                chosen = await decider.decide(state, current_player, cpu_levels[current_player])
+            except asyncio.CancelledError:
+                return
+            finally:
+                if inst.enabled:
+                    inst.add("decide", now_ms() - t0)
+            if state.game_over:
+                return
 
             # ===== 実行 =====
             if chosen is not None:
@@ -818,7 +1012,7 @@ async def run_cpu_turns_until_you():
                 await cpu_draw(current_player)
 
             # ===== 行動後：youのドボン停止 =====
-            if can_dobon() and last_actor != "you":
+            if can_dobon() and state.last_actor != "you":
                 dobon_waiting = True
                 set_dobon_alert(True)
                 set_msg("ドボンチャンス！「ドボン！」を押してください。\n", ok=True)
@@ -828,8 +1022,10 @@ async def run_cpu_turns_until_you():
 
     finally:
         cpu_running = False
-        if not game_over:
+        if not state.game_over:
             set_turn_ui("you")
+        if _render_held:
+            release_render()
 
 
 def set_dobon_alert(on: bool):
@@ -838,23 +1034,26 @@ def set_dobon_alert(on: bool):
     else:
         dobon_btn.classList.remove("dobon-alert")
 
-def cpu_can_dobon(hand):
-    if field is None or len(hand) == 0:
-        return False
-    target = card_to_suit_rank(field)[1]
-    total = sum(card_to_suit_rank(c)[1] for c in hand)
-    return total == target
+def cpu_can_dobon(player: str):
+    # 手札の合計は engine 側で play/draw のたびに更新済み
+    return state.can_dobon(player)
 
 def end_game_by_dobon(winner: str, loser: str):
-    global game_over, dobon_waiting, reveal_cpu, last_winner
+    global dobon_waiting, reveal_cpu
+
+    # CPU が考え中ならその結果は使わない
+    decider.cancel()
 
-    game_over = True
+    # 勝敗・次の先行（last_winner）は engine 側で記録
+    state.end_game_by_dobon(winner, loser)
+    publish_log()
+    if inst.enabled:
+        inst.turn(None)
     dobon_waiting = False
     set_dobon_alert(False)
-    last_winner = winner
 
     # ★勝者がCPUなら表にする（you勝利ならNoneでOK）
-    if winner in ("cpuA", "cpuB", "cpuC"):
+    if winner in CPU_PLAYERS:
         reveal_cpu = winner
     else:
         reveal_cpu = None
@@ -889,15 +1088,33 @@ def end_game_by_dobon(winner: str, loser: str):
         if el:
             el.classList.add("win-blink")
 
-    render_all()
+    # 勝率の表示・勝者の手札公開など全部変わる
+    invalidate()
+
+# ===== クリック（起動時に1回だけ登録） =====
+def on_hand_click(evt):
+    # クリックされたカードは dataset.cardId で見分ける
+    el = evt.target.closest("[data-card-id]") if evt.target else None
+    if not el:
+        return
+    asyncio.create_task(play_card(int(el.dataset.cardId)))
+
+def on_deck_click(evt):
+    asyncio.create_task(draw_from_deck())
+
+def wire_events():
+    your_hand.addEventListener("click", new_proxy(on_hand_click))
+    deck_img.addEventListener("click", new_proxy(on_deck_click))
+    publish_counters()
 
 # ===== PyScript entry points =====
 def reset_game(event=None):
-    global last_actor, dobon_waiting, game_over
+    global dobon_waiting
 
-    last_actor = None
+    decider.cancel()
+    state.last_actor = None
     dobon_waiting = False
-    game_over = False
+    state.game_over = False
 
     set_dobon_alert(False)
     dobon_btn.disabled = False
@@ -905,4 +1122,7 @@ def reset_game(event=None):
     asyncio.create_task(reset_async())
     
 # init
+wire_events()
+setup_debug_overlay()
+asyncio.create_task(connect_cpu_worker())
 asyncio.create_task(reset_async())
@@ -0,0 +1,235 @@
+# lv4: 情報集合モンテカルロ木探索（SO-ISMCTS）
+#
+# 1回の反復ごとに「見えていないカード」を並べ直して（determinization）、
+# 相手の手札・山札を1通りに決めてから木をたどる。
+#   ・見えているもの：自分の手札 / 場札 / 捨て札 / 各自の枚数 / 全員の行動（引いたカードは見えない）
+#   ・木のノードは「誰が・どのカードを出したか（引いたなら DRAW）」で分かれる
+#   ・葉から先は lv1/lv2 などの policy で最後まで打つ（rollout）
+# 持ち時間（秒）と反復回数の両方で打ち切る。
+# 自分の前回の手番で作った木は、その後の全員の行動をたどって使い回す。
+
+from __future__ import annotations
+
+import math
+import random
+import time
+from typing import Optional
+
+from handstats import BitHand
+from engine import (
+    DRAW,
+    GameState,
+    Policy,
+    check_interrupt,
+    play_turn,
+    policy_lv1,
+)
+
+# 報酬は勝率（win_stats と同じ物差し）：勝った人 1.0 / それ以外 0.0
+WIN, LOSE, NEUTRAL = 1.0, 0.0, 0.0
+
+class Node:
+    __slots__ = ("parent", "move", "player", "children", "visits", "avail", "reward")
+
+    def __init__(self, parent: Optional["Node"], move: int, player: Optional[str]):
+        self.parent = parent
+        self.move = move        # このノードに来た手（カード or DRAW）
+        self.player = player    # その手を打った人（報酬はこの人から見た値）
+        self.children: dict[int, Node] = {}
+        self.visits = 0
+        self.avail = 0          # この手が打てた回数（ISMCTS の UCB 用）
+        self.reward = 0.0
+
+def legal_moves(state: GameState, player: str) -> list[int]:
+    """出せるカード。無い / 残り1枚なら山から引くだけ"""
+    hand = state.hands[player]
+    if len(hand) == 1:
+        return [DRAW]
+    playable = state.playable_cards(player)
+    return playable if playable else [DRAW]
+
+def determinize(state: GameState, me: str, rng: random.Random) -> GameState:
+    """me から見えていないカードを並べ直した複製を作る（各自の枚数は保つ）"""
+    g = state.copy()
+    g.rng = rng
+    known = set(g.hands[me])
+    known.update(g.discard)
+    if g.field is not None:
+        known.add(g.field)
+    pool = [c for c in range(1, g.n_cards + 1) if c not in known]
+    rng.shuffle(pool)
+    for p in g.turn_order:
+        if p == me:
+            continue
+        n = len(g.hands[p])
+        hand = pool[len(pool) - n:]
+        del pool[len(pool) - n:]
+        g.hands[p] = hand
+        g.stats[p] = BitHand(hand)
+    g.deck = pool
+    return g
+
+def apply_move(state: GameState, player: str, move: int, interrupt_seats) -> None:
+    if move == DRAW or not state.play(player, move):
+        state.draw(player)
+    if not check_interrupt(state, interrupt_seats):
+        state.next_player()
+
+def score(state: GameState, player: str) -> float:
+    if not state.game_over:
+        return NEUTRAL
+    if state.winner == player:
+        return WIN
+    if state.loser == player:
+        return LOSE
+    return NEUTRAL
+
+
+MAX_TREES = 256  # 覚えておく木の数（ワーカーが多くのテーブルを受け持つとき用。古いものから捨てる）
+
+class ISMCTS:
+    """
+    policy として呼べる探索器（ISMCTS()(state, player) -> カード or None）。
+    木は (state.game_id, player) ごとに持ち、同じゲームの前回の履歴の続きなら次の手番で使い回す。
+    （state の複製やワーカー上で作り直した state でも、game_id と履歴が同じなら同じ木を使う）
+    配り直すと game_id が変わるので、前のゲームの木は使われずに押し出される。
+    """
+
+    def __init__(
+        self,
+        *,
+        time_budget: float = 0.05,
+        max_iterations: int = 5000,
+        rollout_policy: Policy = policy_lv1,
+        rollout_depth: int = 200,
+        exploration: float = 0.7,
+        interrupt_seats=("you",),
+        seed: Optional[int] = None,
+    ):
+        self.time_budget = time_budget
+        self.max_iterations = max_iterations
+        self.rollout_policy = rollout_policy
+        self.rollout_depth = rollout_depth
+        self.exploration = exploration
+        self.interrupt_seats = tuple(interrupt_seats)
+        self.rng = random.Random(seed)
+        # (game_id, player) -> (その時点の history, node)。入れた順に古いものから捨てる
+        self._trees: dict[tuple[int, str], tuple[list, Node]] = {}
+        self.last_iterations = 0
+
+    def __call__(self, state: GameState, player: str) -> Optional[int]:
+        moves = legal_moves(state, player)
+        if moves == [DRAW]:
+            return None
+
+        root = self._reuse_root(state, player)
+        seats = [p for p in self.interrupt_seats if p in state.hands]
+
+        deadline = time.perf_counter() + self.time_budget
+        it = 0
+        while it < self.max_iterations:
+            # 時計を見るのは 16 回に1回だけ
+            if (it & 15) == 0 and it > 0 and time.perf_counter() >= deadline:
+                break
+            self._iterate(state, player, root, seats)
+            it += 1
+        self.last_iterations = it
+
+        best = max(
+            (root.children[m] for m in moves if m in root.children),
+            key=lambda n: n.visits,
+            default=None,
+        )
+        chosen = best.move if best is not None else moves[0]
+
+        # 自分の手の下を次の手番の根として覚えておく（履歴が空なら続きかどうか見分けられないので覚えない）
+        trees = self._trees
+        key = (state.game_id, player)
+        trees.pop(key, None)
+        if state.history:
+            trees[key] = (state.history[:], root)
+            while len(trees) > MAX_TREES:
+                del trees[next(iter(trees))]
+        return None if chosen == DRAW else chosen
+
+    # ---- 木の使い回し ----
+    def _reuse_root(self, state: GameState, player: str) -> Node:
+        saved = self._trees.get((state.game_id, player))
+        if saved is not None and saved[0]:
+            history, node = saved
+            n = len(history)
+            if state.history[:n] == history:
+                for _, move in state.history[n:]:
+                    node = node.children.get(move)
+                    if node is None:
+                        break
+                else:
+                    node.parent = None
+                    return node
+        return Node(None, DRAW, None)
+
+    # ---- 1回分の探索 ----
+    def _iterate(self, state: GameState, me: str, root: Node, seats) -> None:
+        rng = self.rng
+        g = determinize(state, me, rng)
+        node = root
+        c = self.exploration
+
+        # 選択 → 展開
+        while not g.game_over:
+            p = g.current_player
+            if g.may_dobon(p):
+                g.end_game_by_dobon(p, g.last_actor)
+                break
+
+            moves = legal_moves(g, p)
+            children = node.children
+            untried = [m for m in moves if m not in children]
+            for m in moves:
+                ch = children.get(m)
+                if ch is not None:
+                    ch.avail += 1
+
+            if untried:
+                m = untried[rng.randrange(len(untried))]
+                child = Node(node, m, p)
+                child.avail = 1
+                children[m] = child
+                apply_move(g, p, m, seats)
+                node = child
+                break
+
+            best = None
+            best_v = -1.0
+            for m in moves:
+                ch = children[m]
+                v = ch.reward / ch.visits + c * math.sqrt(math.log(ch.avail) / ch.visits)
+                if v > best_v:
+                    best_v = v
+                    best = ch
+            apply_move(g, p, best.move, seats)
+            node = best
+
+        # rollout
+        depth = 0
+        policy = self.rollout_policy
+        while not g.game_over and depth < self.rollout_depth:
+            play_turn(g, policy)
+            if g.game_over or check_interrupt(g, seats):
+                break
+            g.next_player()
+            depth += 1
+
+        # 逆伝播
+        while node is not None:
+            node.visits += 1
+            if node.player is not None:
+                node.reward += score(g, node.player)
+            node = node.parent
+
+
+# engine.STRATEGIES["lv4"] から使う既定の探索器（持ち時間 50ms）
+default_ismcts = ISMCTS()
+
+def choose_card_lv4(state: GameState, player: str) -> Optional[int]:
+    return default_ismcts(state, player)
@@ -0,0 +1,83 @@
+# 相手がドボンできる確率（厳密計算）
+#
+# 相手の手札 n 枚は「自分から見えていないカード」から無作為に配られている、と考えて
+#   P(相手の手札の合計 == target)
+#     = (見えていないカードから n 枚選んで合計 target になる組み合わせ数) / C(見えていない枚数, n)
+# を数字ごとの枚数で DP して求める。
+# DP の表は「見えていない枚数（数字ごと）」の組ごとにキャッシュするので、
+# 1回の CPU の手番で候補カードごとに呼んでも、2回目以降は表を引くだけ。
+
+from __future__ import annotations
+
+from functools import lru_cache
+from math import comb
+
+MAX_TARGET = 13  # 場の数字は 1..13 なので、それより大きい合計は数えなくてよい
+
+@lru_cache(maxsize=None)
+def binom(n: int, k: int) -> int:
+    return comb(n, k)
+
+@lru_cache(maxsize=4096)
+def sum_ways(unseen: tuple[int, ...]) -> tuple[tuple[int, ...], ...]:
+    """
+    unseen[r-1] = 見えていない数字 r の枚数（長さ13）
+    戻り値 ways[n][t] = そこから n 枚選んで合計 t になる選び方の数（n, t <= 13）
+    """
+    size = MAX_TARGET + 1
+    ways = [[0] * size for _ in range(size)]
+    ways[0][0] = 1
+    for r in range(1, 14):
+        u = unseen[r - 1]
+        if u == 0:
+            continue
+        new = [row[:] for row in ways]
+        # 数字 r を k 枚使う（1枚ごとに合計が r 増える）
+        for k in range(1, u + 1):
+            add = r * k
+            if add > MAX_TARGET:
+                break
+            ck = binom(u, k)
+            for n in range(0, size - k):
+                src = ways[n]
+                dst = new[n + k]
+                for t in range(0, size - add):
+                    if src[t]:
+                        dst[t + add] += src[t] * ck
+        ways = new
+    return tuple(tuple(row) for row in ways)
+
+@lru_cache(maxsize=65536)
+def dobon_probability(unseen: tuple[int, ...], hand_size: int, target: int) -> float:
+    """見えていないカードから hand_size 枚配られた相手の合計がちょうど target になる確率"""
+    if hand_size <= 0 or hand_size > MAX_TARGET or not (1 <= target <= MAX_TARGET):
+        return 0.0
+    total = sum(unseen)
+    if total < hand_size:
+        return 0.0
+    return sum_ways(unseen)[hand_size][target] / binom(total, hand_size)
+
+def any_dobon_probability(unseen: tuple[int, ...], hand_sizes, target: int) -> float:
+    """
+    相手の誰か1人でもドボンできる確率。
+    相手ごとの確率は厳密だが、相手同士の手札の重なり（同じカードは2人に配られない）は無視して
+    1 - Π(1 - p) で合わせる。
+    """
+    q = 1.0
+    for n in hand_sizes:
+        q *= 1.0 - dobon_probability(unseen, n, target)
+    return 1.0 - q
+
+def any_dobon_probability_by_size(unseen: tuple[int, ...], size_counts: dict[int, int], target: int) -> float:
+    """any_dobon_probability と同じ。相手を {枚数: 人数} で渡す（同じ枚数の人は (1 - p)^人数 でまとめる）"""
+    q = 1.0
+    for n, k in size_counts.items():
+        q *= (1.0 - dobon_probability(unseen, n, target)) ** k
+    return 1.0 - q
+
+def unseen_counts(seen_counts, own_hand_counts, copies: int = 4) -> tuple[int, ...]:
+    """
+    seen_counts[r] / own_hand_counts[r]（r=1..13、index 0 は未使用）から
+    相手に配られうる数字ごとの枚数を作る
+    """
+    return tuple(max(0, copies - seen_counts[r] - own_hand_counts[r]) for r in range(1, 14))
@@ -0,0 +1,54 @@
+# CPU の手番の進め方（演出の待ち時間）
+#
+#   scheduler = TurnScheduler("fast", sleep=pause)
+#   await scheduler.cpu_turn()   # CPU の手番の前の待ち
+#   await scheduler.dealt()      # 配ったあとの待ち（メッセージを読む間）
+#   if scheduler.batch: ...      # CPU の手番の間は描かず、あなたの番に戻ってから1回だけ描く
+#
+# ・animated : いままでどおり（手番ごとに 0.35 秒、配ったあと 0.5 秒）
+# ・fast     : 待ちを短く
+# ・instant  : 待たない。CPU の手番を続けて打ち、描画は最後に1回（自動対戦のデモ・テスト用）
+# ドボンチャンスの割り込みは速さに関係なく、手番の前後で毎回確かめる（待ちの間に押されるのを待つわけではない）。
+# js / pyodide に依存しないので、ヘッドレスでも使える。
+
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable
+
+# 名前 -> (CPU の手番の前の待ち, 配ったあとの待ち)  秒
+SPEEDS: dict[str, tuple[float, float]] = {
+    "animated": (0.35, 0.5),
+    "fast": (0.08, 0.15),
+    "instant": (0.0, 0.0),
+}
+DEFAULT_SPEED = "animated"
+
+class TurnScheduler:
+    """
+    speed: SPEEDS の名前（途中で set_speed() で変えてよい。次の待ちから効く）
+    sleep: 待ちに使う関数（ブラウザ版は計測付きの pause）
+    """
+
+    def __init__(self, speed: str = DEFAULT_SPEED, *, sleep: Callable[[float], Awaitable] = asyncio.sleep):
+        self.sleep = sleep
+        self.set_speed(speed)
+
+    def set_speed(self, speed: str):
+        if speed not in SPEEDS:
+            raise ValueError(f"unknown speed: {speed} (choose from {', '.join(SPEEDS)})")
+        self.speed = speed
+        self.turn_delay, self.deal_delay = SPEEDS[speed]
+
+    @property
+    def batch(self) -> bool:
+        """待たないときは、CPU の手番の途中を描いても見えないので最後に1回だけ描く"""
+        return self.turn_delay <= 0
+
+    async def cpu_turn(self):
+        if self.turn_delay > 0:
+            await self.sleep(self.turn_delay)
+
+    async def dealt(self):
+        if self.deal_delay > 0:
+            await self.sleep(self.deal_delay)
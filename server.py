@@ -0,0 +1,493 @@
+# 複数テーブルのゲームサーバー（asyncio・ヘッドレス・WebSocket）
+#
+#   python server.py --port 8765 --workers 4
+#
+# 1接続 = 1テーブル。クライアントは最初に
+#   {"op": "new", "players": 4, "decks": 1, "games": 10, "levels": {"cpuA": "lv3"}, "seed": 1, "human": true}
+# を送る。human=true なら接続した人が「あなた」（you）の席に座り、
+#   {"op": "play", "card": 12, "id": 7} / {"op": "draw", "id": 8} / {"op": "dobon", "id": 9}
+# で行動する（id は任意。その行動の結果の diff に "ack" として返る）。human=false なら CPU だけで進むのを見るだけ。
+#
+# サーバーから来るもの
+#   {"type": "table", "table", "seats", "decks", "you"}         最初に1回
+#   {"type": "diff", "seq", "events", "turn", "field", "deck", ["hand"], ["ack"]}   行動のたび
+#       events: ["deal", 先行] / ["play", 席, card] / ["draw", 席] / ["refill", 枚数] / ["dobon", 勝者, 負け or null]
+#               / ["abort"]（max_turns で決着なし）
+#       hand  : 「あなた」の手札（変わったときだけ。他の人の手札は送らない）
+#   {"type": "error", "error", ["ack"]}                          受け付けなかった行動
+#       （最初のメッセージが受け付けられなかったときも error。切らずに次の {"op": "new"} を待つ）
+#   {"type": "end", "games", "wins"}                             games ゲーム終わったら送って切断
+#
+# CPU の席の思考は全テーブルで1つのプール（decider.PoolDecider の executor）を共有する。
+# 「あなた」は他の人の行動の直後にもドボンを宣言できる（サーバーは受け取った時点の状態で判定する）。
+# HTTP で GET /stats を送ると、動いているテーブル数などを JSON で返す。
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Awaitable, Callable, Optional
+
+from decider import InlineDecider, PoolDecider
+from engine import DEFAULT_LEVELS, STRATEGIES, GameState, seat_names
+from wsock import HandshakeError, WebSocket, accept, read_http_head
+
+HUMAN = "you"
+DEFAULT_LEVEL = "lv3"      # DEFAULT_LEVELS に無い席（5人目以降）のレベル
+POOL_LEVELS = ("lv4", "endgame")  # 既定でプールに送る先読みのレベル（他はイベントループの上でそのまま考える）
+MAX_GAMES = 10000          # 1テーブルで続けて遊べるゲーム数の上限
+IDLE_TIMEOUT = 300.0       # 「あなた」の手番でこれだけ何も来なければ切断扱い（秒）
+
+class DiffLog:
+    """
+    GameState.log に入れて、行動をクライアントに送る events にする（gamelog.GameLog と同じ呼ばれ方）。
+    山札の並びなど見えないものは送らない。
+    """
+    __slots__ = ("events",)
+
+    def __init__(self):
+        self.events: list[list] = []
+
+    def deal(self, start_player: str, deck: list[int]):
+        self.events.append(["deal", start_player])
+
+    def play(self, player: str, card: int):
+        self.events.append(["play", player, card])
+
+    def draw(self, player: str):
+        self.events.append(["draw", player])
+
+    def refill(self, deck: list[int]):
+        self.events.append(["refill", len(deck)])
+
+    def dobon(self, winner: str, loser: Optional[str]):
+        self.events.append(["dobon", winner, loser])
+
+
+class Table:
+    """
+    1テーブル分の進行。send で diff を送り、inbox に入った「あなた」の行動を待つ。
+    状態を書き換えるのは run() のタスクだけなので、ロックは要らない。
+    """
+
+    def __init__(
+        self,
+        table_id: int,
+        send: Callable[[dict], Awaitable[None]],
+        decider,
+        *,
+        players: int = 4,
+        decks: int = 1,
+        games: int = 1,
+        levels: Optional[dict[str, str]] = None,
+        seed: Optional[int] = None,
+        human: bool = True,
+        max_turns: int = 2000,
+        cpu_delay: float = 0.0,
+        idle_timeout: float = IDLE_TIMEOUT,
+    ):
+        seats = seat_names(players)
+        self.table_id = table_id
+        self.send = send
+        self.decider = decider
+        self.state = GameState(seats, seed=seed, decks=decks)
+        self.state.log = DiffLog()
+        self.human = HUMAN if human else None
+        levels = levels or {}
+        if not isinstance(levels, dict):
+            raise ValueError("levels must be an object: {seat: strategy}")
+        self.levels = {
+            p: levels.get(p, DEFAULT_LEVELS.get(p, DEFAULT_LEVEL))
+            for p in seats if p != self.human
+        }
+        for name in self.levels.values():
+            if name not in STRATEGIES:
+                raise ValueError(f"unknown strategy: {name}")
+        if not (1 <= games <= MAX_GAMES):
+            raise ValueError(f"games must be 1..{MAX_GAMES}: {games}")
+        self.games = games
+        self.max_turns = max_turns
+        self.cpu_delay = cpu_delay  # CPU の行動ごとに待つ秒数（0 ならすぐ次へ）
+        self.idle_timeout = idle_timeout
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.wins = {p: 0 for p in seats}
+        self.seq = 0
+        self.actions = 0
+        self.closed = False  # 相手が切断した
+        self._ack = None
+        self._hand_changed = False
+
+    # ===== 送信 =====
+    async def flush(self, **extra):
+        """たまった events を diff にして送る"""
+        st = self.state
+        msg = {
+            "type": "diff",
+            "seq": self.seq,
+            "events": st.log.events,
+            "turn": st.current_player,
+            "field": st.field,
+            "deck": len(st.deck),
+        }
+        st.log.events = []
+        self.seq += 1
+        if self._hand_changed and self.human is not None:
+            msg["hand"] = st.hands[self.human]
+            self._hand_changed = False
+        if self._ack is not None:
+            msg["ack"] = self._ack
+            self._ack = None
+        msg.update(extra)
+        await self.send(msg)
+
+    # ===== 進行 =====
+    async def run(self):
+        st = self.state
+        await self.send({
+            "type": "table",
+            "table": self.table_id,
+            "seats": st.turn_order,
+            "decks": st.decks,
+            "you": self.human,
+            "levels": self.levels,
+        })
+        for _ in range(self.games):
+            await self.drop_stale()
+            if self.closed:
+                return
+            st.deal()
+            self._hand_changed = True
+            await self.flush()
+            await self.play_game()
+            if st.winner is not None:
+                self.wins[st.winner] += 1
+        await self.send({"type": "end", "games": self.games, "wins": self.wins})
+
+    async def play_game(self):
+        st = self.state
+        for _ in range(self.max_turns):
+            p = st.current_player
+            if p == self.human:
+                await self.human_turn()
+            else:
+                await self.handle_pending()
+                if st.game_over or self.closed:
+                    return
+                await self.cpu_turn(p)
+                await self.flush()
+            if st.game_over or self.closed:
+                return
+            if self.cpu_delay:
+                await asyncio.sleep(self.cpu_delay)
+            elif p != self.human:
+                await asyncio.sleep(0)  # 他のテーブルにも回す
+        st.log.events.append(["abort"])
+        await self.flush()
+
+    async def cpu_turn(self, p: str):
+        """engine.play_turn と同じ手順（手番の最初にだけドボン判定）で、思考は decider に任せる"""
+        st = self.state
+        if st.may_dobon(p):
+            st.end_game_by_dobon(p, st.last_actor)
+            return
+        chosen = await self.decider.decide(st, p, self.levels[p])
+        if chosen is None or not st.play(p, chosen):
+            st.draw(p)
+        self.actions += 1
+        st.next_player()
+
+    async def human_turn(self):
+        """「あなた」の行動を1つ受け付けるまで待つ（受け付けなかったものは error を返して待ち続ける）"""
+        st = self.state
+        while st.current_player == self.human and not st.game_over:
+            try:
+                msg = await asyncio.wait_for(self.inbox.get(), self.idle_timeout)
+            except asyncio.TimeoutError:
+                msg = None
+            if msg is None:  # 切断
+                self.closed = True
+                return
+            await self.apply(msg)
+
+    async def drop_stale(self):
+        """配る前に、前のゲームの間に届いて使われなかった行動を断る（次のゲームに効かないように）"""
+        while not self.inbox.empty():
+            msg = self.inbox.get_nowait()
+            if msg is None:
+                self.closed = True
+                return
+            self._ack = msg.get("id")
+            await self.error("game is over")
+
+    async def handle_pending(self):
+        """CPU の手番の前に、届いている「あなた」の宣言（ドボン）を処理する"""
+        while not self.inbox.empty() and not self.state.game_over:
+            msg = self.inbox.get_nowait()
+            if msg is None:
+                self.closed = True
+                return
+            await self.apply(msg)
+
+    async def apply(self, msg: dict):
+        st = self.state
+        me = self.human
+        op = msg.get("op")
+        self._ack = msg.get("id")
+        if me is None:
+            return await self.error("this table has no human seat")
+        if op == "dobon":
+            if not st.may_dobon(me):
+                return await self.error("cannot dobon")
+            st.end_game_by_dobon(me, st.last_actor)
+        elif op in ("play", "draw"):
+            if st.current_player != me:
+                return await self.error("not your turn")
+            if op == "play":
+                if not st.play(me, msg.get("card")):
+                    return await self.error("cannot play that card")
+            elif st.has_playable(me):
+                return await self.error("you have a playable card")
+            elif st.draw(me) is None:
+                return await self.error("no cards to draw")
+            self._hand_changed = True
+            self.actions += 1
+            st.next_player()
+        else:
+            return await self.error(f"unknown op: {op}")
+        await self.flush()
+
+    async def error(self, text: str):
+        msg = {"type": "error", "error": text}
+        if self._ack is not None:
+            msg["ack"] = self._ack
+            self._ack = None
+        await self.send(msg)
+
+
+class GameServer:
+    """
+    テーブルをまとめて持つ。executor は全テーブルの CPU 席で共有する
+    （None ならすべてイベントループの上で考える）。
+    """
+
+    def __init__(
+        self,
+        *,
+        executor: Optional[Executor] = None,
+        pool_levels=POOL_LEVELS,
+        max_tables: int = 10000,
+        max_turns: int = 2000,
+    ):
+        self.executor = executor
+        self.pool_levels = pool_levels
+        self.max_tables = max_tables
+        self.max_turns = max_turns
+        self._ids = itertools.count(1)
+        self.tables: dict[int, Table] = {}
+        self.tables_done = 0
+        self.games_done = 0
+        self.actions = 0
+        self.started = time.perf_counter()
+
+    def make_decider(self):
+        if self.executor is None:
+            return InlineDecider()
+        return PoolDecider(self.executor, pool_levels=self.pool_levels)
+
+    def pooled(self, level: str) -> bool:
+        return self.executor is not None and (self.pool_levels is None or level in self.pool_levels)
+
+    def new_table(self, send: Callable[[dict], Awaitable[None]], req: dict) -> Table:
+        if len(self.tables) >= self.max_tables:
+            raise ValueError("server is full")
+        if not isinstance(req, dict):
+            raise ValueError("first message must be {\"op\": \"new\"}")
+        table = Table(
+            next(self._ids),
+            send,
+            self.make_decider(),
+            players=int(req.get("players", 4)),
+            decks=int(req.get("decks", 1)),
+            games=int(req.get("games", 1)),
+            levels=req.get("levels"),
+            seed=None if req.get("seed") is None else int(req["seed"]),
+            human=bool(req.get("human", True)),
+            max_turns=self.max_turns,
+            cpu_delay=float(req.get("cpu_delay", 0.0)),
+        )
+        for name in table.levels.values():
+            # 先読みをイベントループの上で回すと、その間ほかのテーブルが全部止まる
+            if name in POOL_LEVELS and not self.pooled(name):
+                raise ValueError(f"{name} needs worker processes (start the server with --workers)")
+        self.tables[table.table_id] = table
+        return table
+
+    def close_table(self, table: Table, finished: bool):
+        table.decider.cancel()
+        if self.tables.pop(table.table_id, None) is None:
+            return
+        self.actions += table.actions
+        if finished:
+            self.tables_done += 1
+            self.games_done += table.games
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "tables": len(self.tables),
+            "tables_done": self.tables_done,
+            "games_done": self.games_done,
+            "actions": self.actions + sum(t.actions for t in self.tables.values()),
+            "uptime": round(elapsed, 3),
+        }
+
+    # ===== 接続 =====
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            head = await read_http_head(reader)
+            if head[0].startswith("GET /stats "):
+                await self._send_stats(writer)
+                return
+            ws = await accept(reader, writer, head)
+        except (HandshakeError, ConnectionError):
+            writer.close()
+            return
+        try:
+            # 最初のメッセージが受け付けられなければ error を返して、次の {"op": "new"} を待つ
+            while True:
+                req = await ws.recv_json()
+                if req is None:
+                    return
+                try:
+                    if not isinstance(req, dict) or req.get("op") != "new":
+                        raise ValueError("first message must be {\"op\": \"new\"}")
+                    table = self.new_table(ws.send_json, req)
+                    break
+                except (ValueError, TypeError) as e:
+                    await ws.send_json({"type": "error", "error": str(e)})
+            await self.serve(table, ws.recv_json)
+        except (ConnectionError, ValueError):  # 壊れた JSON / UTF-8 も含む
+            pass
+        finally:
+            await ws.close()
+
+    async def serve(self, table: Table, recv: Callable[[], Awaitable[Optional[dict]]]):
+        """table を進めながら、recv で届く行動を inbox に入れる（切断したら None を入れる）"""
+        async def pump():
+            while True:
+                try:
+                    msg = await recv()
+                except (ValueError, UnicodeDecodeError):
+                    # 読めないフレーム（壊れた JSON / UTF-8）は切断として扱う
+                    msg = None
+                await table.inbox.put(msg if isinstance(msg, dict) or msg is None else {})
+                if msg is None:
+                    return
+
+        reader = asyncio.ensure_future(pump())
+        finished = False
+        try:
+            await table.run()
+            finished = True
+        finally:
+            reader.cancel()
+            self.close_table(table, finished)
+
+    async def _send_stats(self, writer: asyncio.StreamWriter):
+        body = json.dumps(self.stats()).encode("utf-8")
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+            + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("ascii")
+            + body
+        )
+        await writer.drain()
+        writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle, host, port, limit=1 << 16, backlog=4096)
+
+
+class LocalClient:
+    """
+    ソケットを通さずに GameServer とやりとりする（テスト・負荷試験でクライアントの代わりに使う）。
+    send_json / recv_json / close は wsock.WebSocket と同じ使い方で、最初に送るのも {"op": "new", ...}。
+    """
+
+    def __init__(self, server: GameServer):
+        self.server = server
+        self.table: Optional[Table] = None
+        self._out: asyncio.Queue = asyncio.Queue()
+        self._actions: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Future] = None
+
+    async def _run(self):
+        try:
+            await self.server.serve(self.table, self._actions.get)
+        finally:
+            await self._out.put(None)  # 「切断」
+
+    async def _deliver(self, msg: dict):
+        # 本物の接続と同じく、送った後に書き換えられても影響しないように複製する
+        await self._out.put(json.loads(json.dumps(msg)))
+
+    async def send_json(self, msg: dict):
+        if self.table is not None:
+            await self._actions.put(msg)
+            return
+        try:
+            if not isinstance(msg, dict) or msg.get("op") != "new":
+                raise ValueError("first message must be {\"op\": \"new\"}")
+            self.table = self.server.new_table(self._deliver, msg)
+        except (ValueError, TypeError) as e:
+            # 本物の接続と同じく、切らずに次の {"op": "new"} を待つ
+            await self._out.put({"type": "error", "error": str(e)})
+            return
+        self._task = asyncio.ensure_future(self._run())
+
+    async def recv_json(self) -> Optional[dict]:
+        return await self._out.get()
+
+    async def close(self):
+        if self._task is not None:
+            await self._actions.put(None)
+            await self._task
+        else:
+            await self._out.put(None)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="DOBON multi-table server (WebSocket)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                    help="CPU 席の思考に使うプロセス数（既定は CPU の数。0 ならイベントループの上で考え、lv4 / endgame は使えない）")
+    ap.add_argument("--pool-levels", default=",".join(POOL_LEVELS),
+                    help="プールに送るレベル（カンマ区切り。'all' なら全部）")
+    ap.add_argument("--max-tables", type=int, default=10000)
+    args = ap.parse_args(argv)
+
+    pool_levels = None if args.pool_levels == "all" else [x for x in args.pool_levels.split(",") if x]
+    executor = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 0 else None
+    server = GameServer(executor=executor, pool_levels=pool_levels, max_tables=args.max_tables)
+
+    async def run():
+        srv = await server.start(args.host, args.port)
+        print(f"listening on ws://{args.host}:{args.port}/ (workers={args.workers or 'inline'})")
+        async with srv:
+            await srv.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# 置換表（DecisionCache）を通しても、通さないとき（enabled=False）と同じカードを選ぶかを確かめる
+#
+#   python -m pytest -q test_decision_cache.py
+
+import random
+
+import pytest
+
+from cpu import LV2_DEFAULT, LV3_DEFAULT
+from decision_cache import DecisionCache
+from engine import GameState, can_play, play_game, seat_names
+
+
+def lv3_kwargs(state: GameState, player: str) -> dict:
+    """engine.policy_lv3 と同じ引数（「あなた」の枚数は別枠、他の相手は {枚数: 人数}）"""
+    hands = state.hands
+    order = state.turn_order
+    you = "you" if player != "you" else (order[1] if order[0] == player else order[0])
+    others: dict[int, int] = {}
+    for p in order:
+        if p not in (player, you):
+            n = len(hands[p])
+            others[n] = others.get(n, 0) + 1
+    return {
+        "discard": state.discard,
+        "you_hand_count": len(hands[you]),
+        "other_size_counts": others,
+        "keep_field_bias": True,
+        "stats": state.stats[player],
+        "seen": state.seen,
+    }
+
+def perturbed(weights: tuple, rng: random.Random) -> tuple:
+    return tuple(w * rng.uniform(0.5, 1.5) for w in weights)
+
+
+@pytest.mark.parametrize("seats,decks", [(2, 1), (4, 1), (5, 2), (8, 3)])
+@pytest.mark.parametrize("exact_danger", [False, True])
+def test_cache_matches_uncached(seats, decks, exact_danger):
+    rng = random.Random(seats * 100 + decks * 10 + exact_danger)
+    # 既定の重み（None）と、ずらした重みの CPU を混ぜる（重みも鍵に入る）
+    lv2_weights = [None, perturbed(LV2_DEFAULT, rng), perturbed(LV2_DEFAULT, rng)]
+    lv3_weights = [None, perturbed(LV3_DEFAULT, rng), perturbed(LV3_DEFAULT, rng)]
+    cached = DecisionCache(capacity=256)  # 小さめにして追い出しも通す
+    plain = DecisionCache(enabled=False)
+    checked = 0
+
+    def checking(state: GameState, player: str):
+        nonlocal checked
+        hand = state.hands[player]
+        field = state.field
+        stats = state.stats[player]
+        for w in lv2_weights:
+            for keep_field in (False, True):
+                assert cached.lv2(hand, field, can_play, keep_field=keep_field, stats=stats, weights=w) == plain.lv2(
+                    hand, field, can_play, keep_field=keep_field, stats=stats, weights=w
+                )
+        kw = lv3_kwargs(state, player)
+        chosen = [cached.lv3(hand, field, can_play, exact_danger=exact_danger, weights=w, **kw) for w in lv3_weights]
+        assert chosen == [plain.lv3(hand, field, can_play, exact_danger=exact_danger, weights=w, **kw) for w in lv3_weights]
+        checked += 1
+        return chosen[0]  # 対戦は既定の重みで進める
+
+    order = seat_names(seats)
+    st = GameState(order, rng=random.Random(seats + decks), decks=decks)
+    policies = {p: checking for p in order}
+    for _ in range(30):
+        play_game(st, policies)
+
+    stats = cached.stats()
+    assert checked > 100
+    # lv3 の鍵は残り枚数まで入るので、短い対戦では当たらないこともある（引いたことは確かめる）
+    assert stats["lv2"]["hits"] > 0 and stats["lv3"]["hits"] + stats["lv3"]["misses"] > 0
+    assert stats["lv2"]["evictions"] > 0
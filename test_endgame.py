@@ -0,0 +1,63 @@
+# 終盤の先読み（EndgameSolver）：全部見えている小さな局面で勝ちに行くカードを選ぶか、
+# 配り方が多すぎるときに fallback に任せるか
+#
+#   python -m pytest -q test_endgame.py
+
+import random
+
+from endgame import EndgameSolver
+from engine import GameState, policy_lv1, seat_names
+
+
+def position(hands: dict, field: int, deck=(), player: str = "cpuA") -> GameState:
+    """手札・場札・山札を決めた局面（残りのカードは全部捨て札）"""
+    order = seat_names(len(hands))
+    used = {field, *deck}
+    for h in hands.values():
+        used.update(h)
+    return GameState.from_dict(
+        {
+            "turn_order": order,
+            "deck": list(deck),
+            "field": field,
+            "discard": [c for c in range(1, 53) if c not in used],
+            "hands": hands,
+            "current_player_idx": order.index(player),
+            "last_actor": None,
+            "last_winner": None,
+            "game_over": False,
+            "winner": None,
+            "loser": None,
+            "turns": 0,
+            "games": 1,
+            "history": [],
+        },
+        rng=random.Random(0),
+    )
+
+
+def test_picks_forced_winning_card():
+    # 場札 ♣5。cpuA の手札は ♣9 / ♦5 / ♥2、あなたは ♦J / ♠7（見えていないカードはこの2枚だけ）。
+    #   ♦5 を出す → あなたが出せるのは ♦J だけ → 残りの ♣9 + ♥2 = 11 でドボン（必勝）
+    #   ♣9 を出す → あなたは出せずに引く（勝ちは決まらない）
+    st = position({"you": [24, 46], "cpuA": [9, 18, 28]}, field=5)
+    solver = EndgameSolver(time_budget=10)
+    assert solver(st, "cpuA") == 18
+    assert solver.last_worlds == 1
+    assert solver.solved == 1 and solver.fallbacks == 0
+
+
+def test_falls_back_when_too_many_worlds():
+    # 見えていないカードが多い（山札が残っている）と配り方が max_worlds を超える
+    st = position({"you": [24, 46], "cpuA": [9, 18, 28]}, field=5, deck=range(30, 40))
+    calls = []
+
+    def fallback(state, player):
+        calls.append(player)
+        return policy_lv1(state, player)
+
+    solver = EndgameSolver(max_worlds=10, time_budget=10, fallback=fallback)
+    assert solver(st, "cpuA") in st.playable_cards("cpuA")
+    assert solver.last_worlds > 10
+    assert calls == ["cpuA"]
+    assert solver.solved == 0 and solver.fallbacks == 1
@@ -0,0 +1,58 @@
+# GameState.snapshot / restore の往復を確かめる
+#
+#   python -m pytest -q test_engine.py
+
+import random
+
+import pytest
+
+from engine import DEFAULT_POLICIES, GameState, play_turn, seat_names
+
+
+@pytest.mark.parametrize("seats,decks", [(2, 1), (4, 1), (8, 2), (12, 4)])
+def test_snapshot_round_trip(seats, decks):
+    st = GameState(seat_names(seats), rng=random.Random(seats), decks=decks)
+    policy = DEFAULT_POLICIES["cpuA"]
+    for _ in range(5):
+        st.deal()
+        while not st.game_over and st.turns < 200:
+            snap = st.snapshot()
+            assert len(snap) == 3 + seats + 14 + 52 * decks
+            g = GameState(st.turn_order, decks=decks)
+            g.restore(snap)
+            for k in ("deck", "discard", "field", "hands", "current_player_idx", "last_actor", "turns", "games"):
+                assert getattr(g, k) == getattr(st, k), k
+            assert g.snapshot() == snap
+            play_turn(st, policy)
+            st.next_player()
+
+
+def test_snapshot_keeps_long_turn_counts():
+    # 行動数は u32（65535 回を超える長いゲームでも snapshot できる）
+    st = GameState(rng=random.Random(1))
+    st.deal()
+    st.turns = 70000
+    g = GameState()
+    g.restore(st.snapshot())
+    assert g.turns == 70000
+
+
+def test_lazy_belief_matches_eager():
+    # 推定を毎手読んだ（すぐ反映した）ときと、最後にまとめて読んだときで同じ重み
+    policy = DEFAULT_POLICIES["cpuC"]
+    eager = GameState(rng=random.Random(5))
+    lazy = GameState(rng=random.Random(5))
+    for _ in range(20):
+        eager.deal()
+        lazy.deal()
+        copies = []
+        while not eager.game_over and eager.turns < 300:
+            for st in (eager, lazy):
+                play_turn(st, policy)
+                st.next_player()
+            eager.belief
+            if eager.turns % 7 == 0:
+                copies.append((eager.belief.weights, lazy.copy()))  # 複製は読むまで元と推定を共有する
+        assert lazy.belief.weights == eager.belief.weights
+        for weights, g in copies:
+            assert g.belief.weights == weights
@@ -0,0 +1,85 @@
+# gamelog の記録 → 書き出し → 読み込み → replay で、対戦の最後の局面に戻るかを確かめる
+#
+#   python -m pytest -q test_gamelog.py
+
+import io
+import random
+
+import pytest
+
+from engine import GameState, play_game, policy_lv2, policy_lv3, seat_names
+from gamelog import (
+    END,
+    GameLog,
+    events,
+    read_games,
+    replay,
+    result,
+    write_games,
+    write_header,
+    write_records,
+)
+
+
+def final_state(st: GameState) -> tuple:
+    return (
+        st.deck,
+        st.discard,
+        st.field,
+        {p: list(h) for p, h in st.hands.items()},
+        st.winner,
+        st.loser,
+        st.turns,
+        st.game_over,
+    )
+
+
+@pytest.mark.parametrize("seats,decks,max_turns", [(4, 1, 2000), (6, 2, 2000), (5, 2, 30)])
+def test_play_log_replay_round_trip(seats, decks, max_turns):
+    order = seat_names(seats)
+    st = GameState(order, rng=random.Random(seats * 10 + decks), decks=decks)
+    st.log = GameLog(order)
+    policies = {p: policy_lv3 if i % 2 else policy_lv2 for i, p in enumerate(order)}
+    finals = []
+    for _ in range(20):
+        play_game(st, policies, max_turns=max_turns)
+        finals.append(final_state(st))
+    st.log.close()
+
+    fp = io.BytesIO()
+    write_games(fp, order, st.log.records)
+    names, games = read_games(fp.getvalue())
+    assert names == order
+    records = list(games)
+    assert len(records) == len(finals)
+    for rec, final in zip(records, finals):
+        assert final_state(replay(rec, names)) == final
+        winner, loser = result(rec)
+        assert (None if winner is None else names[winner]) == final[4]
+        assert (None if loser is None else names[loser]) == final[5]
+        assert list(events(rec))[-1][0] == END
+    if max_turns == 30:
+        assert any(f[4] is None for f in finals)  # 決着しないゲームも通す
+
+
+def test_unfinished_game_is_not_read_as_dobon():
+    # 2組のカード番号 0x50〜0x5F は上位4bitが DOBON と同じ。その PLAY の後に DRAW で
+    # 終わった決着なしのゲームを、末尾のバイトから勝敗ありと読まない
+    order = seat_names(4)
+    log = GameLog(order)
+    log.deal(order[0], list(range(104)))
+    log.play(order[0], 0x55)
+    log.draw(order[1])
+    log.close()
+    assert result(log.records[0]) == (None, None)
+
+
+def test_record_too_long_is_rejected():
+    fp = io.BytesIO()
+    write_header(fp, seat_names(4))
+    head = fp.tell()
+    with pytest.raises(ValueError):
+        write_records(fp, [bytes(0x10000)])
+    assert fp.tell() == head  # 壊れた長さは書かない
+    write_records(fp, [bytes(0xFFFF)])
+    assert fp.tell() == head + 2 + 0xFFFF
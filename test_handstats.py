@@ -0,0 +1,95 @@
+# BitHand（ビット版の手札の集計）がリスト版の参照実装と同じ値を返すかを確かめる
+#
+#   python -m pytest -q test_handstats.py
+
+import random
+
+import pytest
+
+from cardtable import deck_cards, ensure_decks
+from cpu import (
+    choose_card_lv2,
+    choose_card_lv3,
+    count_pairs_by_rank,
+    has_split_sum_structure,
+    total_rank,
+)
+from engine import GameState, can_play, play_game, policy_lv3, seat_names
+from handstats import BitHand
+
+
+def random_hands(seed: int, n: int = 2000, decks: int = 1):
+    ensure_decks(decks)
+    rng = random.Random(seed)
+    cards = list(deck_cards(decks))
+    for _ in range(n):
+        yield rng.sample(cards, rng.randint(0, 12))
+
+
+@pytest.mark.parametrize("decks", [1, 2, 4])
+def test_bithand_matches_reference(decks):
+    for hand in random_hands(decks, decks=decks):
+        bh = BitHand(hand)
+        assert bh.count == len(hand)
+        assert bh.total == total_rank(hand)
+        assert bh.pairs == count_pairs_by_rank(hand)
+        assert bh.has_split() == has_split_sum_structure(hand)
+        for i, c in enumerate(hand):
+            rest = hand[:i] + hand[i + 1:]
+            assert bh.without(c) == (total_rank(rest), count_pairs_by_rank(rest), has_split_sum_structure(rest))
+
+
+def test_bithand_add_remove_matches_reference():
+    # add / remove を続けても作り直したものと同じ（GameState が手札を持つやり方）
+    rng = random.Random(7)
+    cards = list(deck_cards(1))
+    hand: list[int] = []
+    bh = BitHand()
+    for _ in range(5000):
+        if hand and (len(hand) > 10 or rng.random() < 0.5):
+            c = hand.pop(rng.randrange(len(hand)))
+            bh.remove(c)
+        else:
+            c = rng.choice([c for c in cards if c not in hand])
+            hand.append(c)
+            bh.add(c)
+        ref = BitHand(hand)
+        assert (bh.mask, bh.hist, bh.total, bh.pairs, bh.count) == (ref.mask, ref.hist, ref.total, ref.pairs, ref.count)
+        assert bh.pairs == count_pairs_by_rank(hand)
+        assert bh.has_split() == has_split_sum_structure(hand)
+
+
+@pytest.mark.parametrize("seats,decks", [(4, 1), (3, 1), (6, 2)])
+def test_lv2_lv3_stats_path_matches_list_path(seats, decks):
+    # ゲームの途中の局面で、GameState の集計（stats / seen）を渡したときと
+    # 手札・捨て札のリストから作り直したとき（stats=None / seen=None）で同じカードを選ぶ
+    checked = 0
+
+    def checking(state: GameState, player: str):
+        nonlocal checked
+        hand = state.hands[player]
+        field = state.field
+        stats = state.stats[player]
+        assert stats.total == total_rank(hand)
+        assert stats.pairs == count_pairs_by_rank(hand)
+        assert stats.has_split() == has_split_sum_structure(hand)
+        for keep_field in (False, True):
+            assert choose_card_lv2(hand, field, can_play, keep_field=keep_field, stats=stats) == choose_card_lv2(
+                hand, field, can_play, keep_field=keep_field
+            )
+        others = [len(state.hands[p]) for p in state.turn_order if p not in (player, "you")]
+        # seen が無いときは1組（各数字4枚）として数えるので、厳密版の比較は1組のときだけ
+        for exact in (False, True) if decks == 1 else (False,):
+            kw = dict(discard=state.discard, you_hand_count=len(state.hands["you"]), other_counts=others, exact_danger=exact)
+            assert choose_card_lv3(hand, field, can_play, stats=stats, seen=state.seen, **kw) == choose_card_lv3(
+                hand, field, can_play, **kw
+            )
+        checked += 1
+        return policy_lv3(state, player)
+
+    order = seat_names(seats)
+    st = GameState(order, rng=random.Random(seats * 10 + decks), decks=decks)
+    policies = {p: checking for p in order}
+    for _ in range(40):
+        play_game(st, policies)
+    assert checked > 500
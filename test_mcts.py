@@ -0,0 +1,58 @@
+# lv4（ISMCTS）の木の使い回しが同じゲームの中だけで起きるかを確かめる
+#
+#   python -m pytest -q test_mcts.py
+
+import random
+
+from engine import GameState, check_interrupt, play_turn, policy_lv1
+from mcts import ISMCTS
+
+
+def find_position(seed: int):
+    """cpuA が ISMCTS で1手打った直後の局面（履歴が空でないところ）"""
+    solver = ISMCTS(max_iterations=200, time_budget=10, seed=seed)
+    st = GameState(rng=random.Random(seed))
+    for _ in range(50):
+        st.deal()
+        while not st.game_over:
+            p = st.current_player
+            if p == "cpuA" and st.history and len(st.hands[p]) > 1 and st.playable_cards(p):
+                play_turn(st, solver)
+                if not st.game_over:
+                    return solver, st
+                break
+            play_turn(st, policy_lv1)
+            if st.game_over or check_interrupt(st, ("you",)):
+                break
+            st.next_player()
+    raise AssertionError("no position found")
+
+
+def test_tree_reused_within_same_game():
+    solver, st = find_position(1)
+    root = solver._reuse_root(st, "cpuA")
+    assert root.visits > 0  # 前の手番の探索の続き
+    # 複製・to_dict を通しても同じゲーム
+    assert solver._reuse_root(GameState.from_dict(st.to_dict()), "cpuA").visits > 0
+
+
+def test_tree_not_reused_for_other_game():
+    solver, st = find_position(2)
+    other = st.copy()
+    other.game_id += 1  # 履歴は同じだが別のゲーム（別のテーブル・次のゲーム）
+    assert solver._reuse_root(other, "cpuA").visits == 0
+    # 配り直すと game_id が変わる
+    old = st.game_id
+    st.deal()
+    assert st.game_id != old
+    assert solver._reuse_root(st, "cpuA").visits == 0
+
+
+def test_empty_history_is_not_saved():
+    solver = ISMCTS(max_iterations=20, seed=3)
+    st = GameState(rng=random.Random(3))
+    st.deal("cpuA")
+    while st.current_player == "cpuA" and not st.playable_cards("cpuA"):
+        st.deal("cpuA")
+    solver(st, "cpuA")
+    assert not solver._trees
@@ -0,0 +1,91 @@
+# odds.py の厳密な確率を、カードを1枚ずつ並べた総当たりと比べる
+#
+#   python -m pytest -q test_odds.py
+
+import random
+from collections import Counter
+from itertools import combinations
+
+import pytest
+
+from odds import (
+    any_dobon_probability,
+    any_dobon_probability_by_size,
+    dobon_probability,
+    sum_ways,
+    unseen_counts,
+)
+
+
+def cards_of(unseen):
+    """数字ごとの枚数 → 数字の並び（同じ数字のカードも別のカードとして数える）"""
+    return [r for r in range(1, 14) for _ in range(unseen[r - 1])]
+
+def brute_ways(unseen, n):
+    """n 枚の選び方を全部並べて、合計ごとに数える"""
+    return Counter(sum(c) for c in combinations(cards_of(unseen), n))
+
+def brute_probability(unseen, n, target):
+    ways = brute_ways(unseen, n)
+    total = sum(ways.values())
+    return ways[target] / total if total else 0.0
+
+def random_unseen(rng, max_copies, max_cards):
+    while True:
+        unseen = tuple(rng.randint(0, max_copies) for _ in range(13))
+        if 0 < sum(unseen) <= max_cards:
+            return unseen
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_sum_ways_matches_brute_force(seed):
+    rng = random.Random(seed)
+    # 小さな山（1組 = 各数字4枚まで、2組なら8枚まで）
+    unseen = random_unseen(rng, 4 if seed % 2 else 8, 18)
+    ways = sum_ways(unseen)
+    for n in range(0, 6):
+        brute = brute_ways(unseen, n)
+        for t in range(0, 14):
+            assert ways[n][t] == brute.get(t, 0), (unseen, n, t)
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_dobon_probability_matches_brute_force(seed):
+    rng = random.Random(100 + seed)
+    unseen = random_unseen(rng, 4, 20)
+    for n in range(1, 6):
+        for target in range(1, 14):
+            assert dobon_probability(unseen, n, target) == pytest.approx(brute_probability(unseen, n, target))
+        # 場の数字にならない合計は数えない
+        assert dobon_probability(unseen, n, 0) == 0.0
+        assert dobon_probability(unseen, n, 14) == 0.0
+
+
+def test_dobon_probability_edge_cases():
+    unseen = (1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+    assert dobon_probability(unseen, 3, 3) == 0.0   # 枚数が足りない
+    assert dobon_probability(unseen, 0, 0) == 0.0
+    assert dobon_probability(unseen, 2, 3) == 1.0
+    assert dobon_probability(unseen, 1, 14) == 0.0
+
+
+def test_any_dobon_probability_by_size_matches_list():
+    rng = random.Random(7)
+    unseen = random_unseen(rng, 4, 30)
+    sizes = [2, 3, 3, 5]
+    by_size = dict(Counter(sizes))
+    for target in range(1, 14):
+        q = 1.0
+        for n in sizes:
+            q *= 1.0 - brute_probability(unseen, n, target)
+        assert any_dobon_probability(unseen, sizes, target) == pytest.approx(1.0 - q)
+        assert any_dobon_probability_by_size(unseen, by_size, target) == pytest.approx(1.0 - q)
+
+
+def test_unseen_counts():
+    seen = [0] + [1] * 13
+    own = [0] + [0] * 13
+    own[5] = 3
+    unseen = unseen_counts(seen, own, copies=4)
+    assert unseen[4] == 0 and unseen[0] == 3
+    assert unseen_counts(seen, own, copies=8)[4] == 4
@@ -0,0 +1,51 @@
+# TurnScheduler：速さの名前ごとに SPEEDS の待ち時間で待つか（instant は待たずにまとめて描く）
+#
+#   python -m pytest -q test_scheduler.py
+
+import asyncio
+
+import pytest
+
+from scheduler import DEFAULT_SPEED, SPEEDS, TurnScheduler
+
+
+def waits(scheduler: TurnScheduler) -> list[float]:
+    """配ったあと → CPU の手番2回 で待った秒数"""
+    slept: list[float] = []
+
+    async def sleep(seconds):
+        slept.append(seconds)
+
+    async def go():
+        scheduler.sleep = sleep
+        await scheduler.dealt()
+        await scheduler.cpu_turn()
+        await scheduler.cpu_turn()
+
+    asyncio.run(go())
+    return slept
+
+
+@pytest.mark.parametrize("speed", list(SPEEDS))
+def test_speed_maps_to_delays(speed):
+    turn, deal = SPEEDS[speed]
+    scheduler = TurnScheduler(speed)
+    assert (scheduler.turn_delay, scheduler.deal_delay) == (turn, deal)
+    assert waits(scheduler) == [d for d in (deal, turn, turn) if d > 0]
+    assert scheduler.batch == (speed == "instant")
+
+
+def test_documented_delays():
+    assert TurnScheduler().speed == DEFAULT_SPEED == "animated"
+    assert waits(TurnScheduler("animated")) == [0.5, 0.35, 0.35]
+    assert waits(TurnScheduler("fast")) == [0.15, 0.08, 0.08]
+    assert waits(TurnScheduler("instant")) == []
+
+
+def test_set_speed():
+    scheduler = TurnScheduler("instant")
+    scheduler.set_speed("fast")
+    assert waits(scheduler) == [0.15, 0.08, 0.08] and not scheduler.batch
+    with pytest.raises(ValueError):
+        scheduler.set_speed("slow")
+    assert scheduler.speed == "fast"  # 失敗しても前の速さのまま
@@ -0,0 +1,81 @@
+# server.py のテーブルの受け付け（LocalClient でつなぐ）
+#
+#   python -m pytest -q test_server.py
+
+import asyncio
+
+import pytest
+
+from handstats import BitHand
+from server import GameServer, LocalClient
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.mark.parametrize("first", [[1], "x", 5, {"op": "play"}, {"op": "new", "levels": ["lv1"]}])
+def test_bad_first_message_keeps_connection(first):
+    async def go():
+        c = LocalClient(GameServer())
+        await c.send_json(first)
+        err = await c.recv_json()
+        await c.send_json({"op": "new", "human": False, "seed": 1})
+        table = await c.recv_json()
+        await c.close()
+        return err, table
+
+    err, table = run(go())
+    assert err["type"] == "error"
+    assert table["type"] == "table"
+
+
+def test_search_levels_need_workers():
+    async def go():
+        c = LocalClient(GameServer())
+        await c.send_json({"op": "new", "levels": {"cpuA": "lv4"}})
+        msg = await c.recv_json()
+        await c.close()
+        return msg
+
+    msg = run(go())
+    assert msg["type"] == "error" and "lv4" in msg["error"]
+
+
+def test_draw_with_playable_card_is_rejected():
+    async def go():
+        c = LocalClient(GameServer())
+        await c.send_json({"op": "new", "seed": 1})
+        t = c.table
+        while True:
+            m = await c.recv_json()
+            st = t.state
+            if st.current_player == "you" and not st.game_over:
+                break
+        st.hands["you"] = [32, 11, 10, 23, 14]  # 場札 37 には 32 と 11 が出せる
+        st.stats["you"] = BitHand(st.hands["you"])
+        st.field = 37
+        await c.send_json({"op": "draw", "id": 9})
+        while m is not None and m.get("type") != "error":
+            m = await c.recv_json()
+        await c.close()
+        return m
+
+    assert run(go()) == {"type": "error", "error": "you have a playable card", "ack": 9}
+
+
+def test_stale_actions_are_rejected_before_deal():
+    async def go():
+        out = []
+
+        async def send(msg):
+            out.append(msg)
+
+        t = GameServer().new_table(send, {"op": "new"})
+        await t.inbox.put({"op": "play", "card": 3, "id": 4})
+        await t.drop_stale()
+        return out, t.inbox.empty()
+
+    out, empty = run(go())
+    assert out == [{"type": "error", "error": "game is over", "ack": 4}]
+    assert empty
@@ -0,0 +1,23 @@
+# tournament.py：ワーカー数を変えても集計結果とログが同じになるか
+#
+#   python -m pytest -q test_tournament.py
+
+import pytest
+
+from tournament import SERIES_LEN, run_tournament
+
+LINEUP = ["lv1", "lv2_keep_field", "lv3", "lv3"]
+RESULT_KEYS = ("wins", "victims", "draws", "turns_per_game")
+
+
+def run(tmp_path, workers: int) -> tuple[dict, bytes]:
+    path = tmp_path / f"games_{workers}.dbn"
+    res = run_tournament(LINEUP, SERIES_LEN * 5 + 17, seed=5, workers=workers, log_path=str(path))
+    return {k: res[k] for k in RESULT_KEYS}, path.read_bytes()
+
+
+@pytest.mark.parametrize("workers", [2, 3])
+def test_same_result_for_any_worker_count(tmp_path, workers):
+    single = run(tmp_path, 1)
+    assert sum(single[0]["wins"]) + single[0]["draws"] == SERIES_LEN * 5 + 17
+    assert run(tmp_path, workers) == single
@@ -0,0 +1,183 @@
+# CPUレベル同士の対戦（ヘッドレス・マルチプロセス）
+#
+#   python tournament.py --players lv1,lv2_keep_field,lv3,lv3 --games 1000000 --seed 1
+#   python tournament.py --players lv3,lv3,lv3,lv3,lv3,lv3,lv1,lv1 --decks 2   # 8人卓・2組
+#   python tournament.py --profile tuned_lv3.json --players tuned_lv3,lv1,lv2_keep_field,lv3   # tune.py の重み
+#
+# 席の数は --players の数（2..12、席名は engine.seat_names）。
+# ゲームは SERIES_LEN ゲームずつの「シリーズ」に分けて各プロセスに配る。
+# ・シリーズ i の乱数は engine.game_rng(seed, i) だけで決まる
+# ・席の割り当てはシリーズごとに1つずつ回す（全員が全部の席に同じだけ座る）
+# ・シリーズの中は「前回の勝者が先行」（ブラウザ版と同じ）
+# なので、ワーカー数を変えても集計結果は同じになる。
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from engine import MAX_SEATS, MIN_SEATS, STRATEGIES, GameState, game_rng, load_profile, play_game, seat_names
+from gamelog import GameLog, write_header, write_records
+
+SERIES_LEN = 100  # 1シリーズのゲーム数（= ワーカーに渡す1単位）
+
+def seat_assignment(index: int, n_seats: int) -> list[int]:
+    """シリーズ index で席 i に座る出場者（lineup の番号）"""
+    rot = index % n_seats
+    return [(i + rot) % n_seats for i in range(n_seats)]
+
+def run_series(job) -> tuple[list[int], list[int], int, int, list[bytes]]:
+    """1シリーズ分を対戦して (勝ち数, ドボンされた数, 決着なし, 行動数, ログ) を返す"""
+    seed, index, n_games, lineup, interrupt_seats, max_turns, keep_log, decks, profiles = job
+    for path in profiles:
+        load_profile(path)  # ワーカーのプロセスでも同じ名前で引けるように
+    seats = seat_names(len(lineup))
+    entry_of = dict(zip(seats, seat_assignment(index, len(seats))))
+    policies = {p: STRATEGIES[lineup[e]] for p, e in entry_of.items()}
+
+    state = GameState(seats, rng=game_rng(seed, index), decks=decks)
+    if keep_log:
+        state.log = GameLog(seats)
+    wins = [0] * len(lineup)
+    victims = [0] * len(lineup)
+    draws = 0
+    turns = 0
+    for _ in range(n_games):
+        winner = play_game(state, policies, interrupt_seats=interrupt_seats, max_turns=max_turns)
+        turns += state.turns
+        if winner is None:
+            draws += 1
+            continue
+        wins[entry_of[winner]] += 1
+        if state.loser is not None:
+            victims[entry_of[state.loser]] += 1
+    records = []
+    if keep_log:
+        state.log.close()
+        records = state.log.records
+    return wins, victims, draws, turns, records
+
+def run_tournament(
+    lineup: list[str],
+    games: int,
+    *,
+    seed: int = 0,
+    workers: Optional[int] = None,
+    interrupt_seats=("you",),
+    max_turns: int = 2000,
+    log_path: Optional[str] = None,
+    decks: int = 1,
+    profiles=(),
+) -> dict:
+    """log_path を渡すと全ゲームのログ（gamelog 形式、席は seat_names の名前）を書き出す"""
+    if not (MIN_SEATS <= len(lineup) <= MAX_SEATS):
+        raise ValueError(f"players must have {MIN_SEATS}..{MAX_SEATS} entries: {lineup}")
+    seats = seat_names(len(lineup))
+    for path in profiles:
+        load_profile(path)
+    GameState(seats, decks=decks)  # 組数・枚数が足りるかをワーカーに配る前に確かめる
+    for name in lineup:
+        if name not in STRATEGIES:
+            raise ValueError(f"unknown strategy: {name} (choose from {', '.join(STRATEGIES)})")
+
+    jobs = []
+    for index, start in enumerate(range(0, games, SERIES_LEN)):
+        n = min(SERIES_LEN, games - start)
+        jobs.append((seed, index, n, tuple(lineup), tuple(interrupt_seats), max_turns, log_path is not None,
+                     decks, tuple(profiles)))
+
+    workers = workers or os.cpu_count() or 1
+    wins = [0] * len(lineup)
+    victims = [0] * len(lineup)
+    draws = 0
+    turns = 0
+    log_fp = open(log_path, "wb") if log_path is not None else None
+    if log_fp is not None:
+        write_header(log_fp, seats)
+
+    t0 = time.perf_counter()
+    ex = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        if ex is None:
+            results = map(run_series, jobs)
+        else:
+            results = ex.map(run_series, jobs, chunksize=max(1, len(jobs) // (workers * 8)))
+        # 結果はシリーズ順に届くので、ログもその順で書く
+        for w, v, d, t, records in results:
+            wins = [a + b for a, b in zip(wins, w)]
+            victims = [a + b for a, b in zip(victims, v)]
+            draws += d
+            turns += t
+            if log_fp is not None:
+                write_records(log_fp, records)
+    finally:
+        if ex is not None:
+            ex.shutdown()
+        if log_fp is not None:
+            log_fp.close()
+    elapsed = time.perf_counter() - t0
+
+    return {
+        "lineup": list(lineup),
+        "decks": decks,
+        "games": games,
+        "seed": seed,
+        "workers": workers,
+        "wins": wins,
+        "victims": victims,
+        "draws": draws,
+        "turns_per_game": turns / games if games else 0.0,
+        "elapsed": elapsed,
+        "games_per_sec": games / elapsed if elapsed > 0 else 0.0,
+    }
+
+def format_report(res: dict) -> str:
+    games = res["games"] or 1
+    lines = [f"{'#':>2} {'strategy':<16} {'勝ち':>9} {'勝率':>7} {'ドボンされ率':>10}"]
+    for i, name in enumerate(res["lineup"]):
+        w = res["wins"][i]
+        v = res["victims"][i]
+        lines.append(f"{i:>2} {name:<16} {w:>9} {w / games * 100:>6.2f}% {v / games * 100:>9.2f}%")
+    lines.append(f"決着なし: {res['draws']}  平均行動数: {res['turns_per_game']:.1f}")
+    lines.append(
+        f"{res['games']} games / {res['elapsed']:.2f}s = {res['games_per_sec']:.0f} games/sec"
+        f"（workers={res['workers']}, seed={res['seed']}, decks={res['decks']}）"
+    )
+    return "\n".join(lines)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="DOBON CPU tournament")
+    ap.add_argument("--players", default="lv1,lv2_keep_field,lv3,lv3",
+                    help=f"席の数だけ strategy をカンマ区切りで（{', '.join(STRATEGIES)}）")
+    ap.add_argument("--games", type=int, default=10000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=None, help="既定は CPU コア数")
+    ap.add_argument("--decks", type=int, default=1, help="使うトランプの組数（人数が多い卓用）")
+    ap.add_argument("--profile", action="append", default=[],
+                    help="tune.py が書き出した重み（JSON）。中の name で --players に書ける（何回でも）")
+    ap.add_argument("--max-turns", type=int, default=2000)
+    ap.add_argument("--no-interrupt", action="store_true",
+                    help="「あなた」席の割り込みドボンを無効にする（全席同じ条件）")
+    ap.add_argument("--json", action="store_true", help="結果を JSON で出力")
+    ap.add_argument("--log", default=None, help="全ゲームのログを書き出すファイル（gamelog 形式）")
+    args = ap.parse_args(argv)
+
+    res = run_tournament(
+        args.players.split(","),
+        args.games,
+        seed=args.seed,
+        workers=args.workers,
+        interrupt_seats=() if args.no_interrupt else ("you",),
+        max_turns=args.max_turns,
+        log_path=args.log,
+        decks=args.decks,
+        profiles=args.profile,
+    )
+    print(json.dumps(res, ensure_ascii=False) if args.json else format_report(res))
+
+if __name__ == "__main__":
+    main()
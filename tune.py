@@ -0,0 +1,262 @@
+# lv2 / lv3 の点数の重みを自己対戦で調整する（ヘッドレス・マルチプロセス）
+#
+#   python tune.py --level lv3 --generations 30 --games 400 --out tuned_lv3.json
+#   python tournament.py --profile tuned_lv3.json --players tuned_lv3,lv1,lv2_keep_field,lv3
+#
+# ・探索は sep-CMA-ES（共分散を対角だけで持つ CMA-ES。numpy 無しで回せる）
+#   重みは 既定値 × exp(x) の x を探す（符号は cpu.py の式の側にあるので、値は正のまま動かす）
+# ・共通乱数：1世代の候補は全員「同じ seed の同じ配り」で打つ。候補どうしの差に配りの運が入らないので、
+#   少ないゲーム数で比べられる。世代ごとに seed を変えて、特定の配りに合わせ込まないようにする
+# ・評価は「候補1人 + opponents」の卓で、候補の席をゲームごとに回す（割り込みドボンは全席なし）
+#   点数 = (ドボンした数 - ドボンされた数) / ゲーム数
+# ・最後に、平均と各世代のいちばん良かった候補を新しい seed で既定の重みと比べ直し、いちばん良いものを書き出す
+
+from __future__ import annotations
+
+import argparse
+import functools
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from cpu import LV2_WEIGHTS, LV3_WEIGHTS, weights_vector
+from engine import STRATEGIES, WEIGHTED_POLICIES, GameState, play_game, seat_names
+
+DEFAULT_OPPONENTS = ("lv1", "lv2_keep_field", "lv3")
+
+def default_weights(level: str) -> dict[str, float]:
+    return dict(LV2_WEIGHTS if level.startswith("lv2") else LV3_WEIGHTS)
+
+def profile_weights(level: str, x: list[float]) -> dict[str, float]:
+    """探索の座標 x → {名前: 値}"""
+    return {k: round(v * math.exp(xi), 4) for (k, v), xi in zip(default_weights(level).items(), x)}
+
+# ===== 評価（ワーカーで動く） =====
+def play_games(job) -> tuple[int, int, int]:
+    """
+    job = (level, 重み or None, opponents, seed, 最初のゲーム, ゲーム数, max_turns)
+    ゲーム i は game_rng(seed, i + 1) の配りで、候補は席 i % 席数 に座る（重み None なら既定値）
+    """
+    level, weights, opponents, seed, start, n_games, max_turns = job
+    family = "lv2" if level.startswith("lv2") else "lv3"
+    candidate = functools.partial(WEIGHTED_POLICIES[level], weights=weights_vector(family, weights))
+    seats = seat_names(len(opponents) + 1)
+    n_seats = len(seats)
+    others = [STRATEGIES[name] for name in opponents]
+
+    wins = victims = 0
+    for i in range(start, start + n_games):
+        me = seats[i % n_seats]
+        rest = iter(others)
+        policies = {p: candidate if p == me else next(rest) for p in seats}
+        state = GameState(seats, seed=seed)
+        state.games = i  # deal で i + 1 になる = game_rng(seed, i + 1)
+        winner = play_game(state, policies, interrupt_seats=(), start_player=seats[0], max_turns=max_turns)
+        if winner == me:
+            wins += 1
+        elif winner is not None and state.loser == me:
+            victims += 1
+    return wins, victims, n_games
+
+
+class Evaluator:
+    """候補の重みをまとめて評価する（候補 × ゲームの塊 に分けてプールに流す）"""
+
+    def __init__(self, level: str, opponents, games: int, *, workers: Optional[int] = None, max_turns: int = 2000):
+        self.level = level
+        self.opponents = tuple(opponents)
+        self.games = games
+        self.workers = workers or os.cpu_count() or 1
+        self.max_turns = max_turns
+        self.ex = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        self.games_played = 0
+
+    def close(self):
+        if self.ex is not None:
+            self.ex.shutdown()
+
+    def fitness(self, candidates: list[Optional[dict[str, float]]], seed: int, games: Optional[int] = None) -> list[float]:
+        """candidates（重み or None=既定値）を同じ seed の同じ配りで打たせた点数"""
+        games = games or self.games
+        chunk = max(1, math.ceil(games * len(candidates) / (self.workers * 4)))
+        jobs, owner = [], []
+        for k, w in enumerate(candidates):
+            for start in range(0, games, chunk):
+                jobs.append((self.level, w, self.opponents, seed, start, min(chunk, games - start), self.max_turns))
+                owner.append(k)
+        results = map(play_games, jobs) if self.ex is None else self.ex.map(play_games, jobs)
+        net = [0] * len(candidates)
+        for k, (wins, victims, n) in zip(owner, results):
+            net[k] += wins - victims
+            self.games_played += n
+        return [v / games for v in net]
+
+
+class SepCMAES:
+    """対角共分散の CMA-ES（Ros & Hansen 2008）。ask() で候補を出し、tell() で点数（大きいほど良い）を返す"""
+
+    def __init__(self, dim: int, sigma: float, rng: random.Random, popsize: Optional[int] = None):
+        n = dim
+        self.n = n
+        self.rng = rng
+        self.lam = popsize or 4 + int(3 * math.log(n))
+        self.mu = self.lam // 2
+        raw = [math.log(self.mu + 0.5) - math.log(i + 1) for i in range(self.mu)]
+        total = sum(raw)
+        self.w = [x / total for x in raw]
+        self.mueff = 1.0 / sum(x * x for x in self.w)
+        mueff = self.mueff
+
+        self.cs = (mueff + 2) / (n + mueff + 5)
+        self.ds = 1 + 2 * max(0.0, math.sqrt((mueff - 1) / (n + 1)) - 1) + self.cs
+        self.cc = (4 + mueff / n) / (n + 4 + 2 * mueff / n)
+        c1 = 2 / ((n + 1.3) ** 2 + mueff)
+        cmu = min(1 - c1, 2 * (mueff - 2 + 1 / mueff) / ((n + 2) ** 2 + mueff))
+        # 対角だけなので学習率を (n + 2) / 3 倍にできる
+        self.c1 = min(1.0, c1 * (n + 2) / 3)
+        self.cmu = min(1.0 - self.c1, cmu * (n + 2) / 3)
+        self.chin = math.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n * n))
+
+        self.mean = [0.0] * n
+        self.sigma = sigma
+        self.diag = [1.0] * n   # C の対角
+        self.ps = [0.0] * n
+        self.pc = [0.0] * n
+        self.gen = 0
+        self._z: list[list[float]] = []
+
+    def ask(self) -> list[list[float]]:
+        gauss = self.rng.gauss
+        self._z = [[gauss(0.0, 1.0) for _ in range(self.n)] for _ in range(self.lam)]
+        sd = [math.sqrt(c) for c in self.diag]
+        return [[m + self.sigma * s * z for m, s, z in zip(self.mean, sd, zs)] for zs in self._z]
+
+    def tell(self, scores: list[float]):
+        n, cs, cc = self.n, self.cs, self.cc
+        order = sorted(range(self.lam), key=lambda k: -scores[k])[:self.mu]
+        sd = [math.sqrt(c) for c in self.diag]
+        zs = [self._z[k] for k in order]
+        ys = [[s * z for s, z in zip(sd, zk)] for zk in zs]
+        zw = [sum(w * z[j] for w, z in zip(self.w, zs)) for j in range(n)]
+        yw = [sd[j] * zw[j] for j in range(n)]
+
+        self.mean = [m + self.sigma * y for m, y in zip(self.mean, yw)]
+        a = math.sqrt(cs * (2 - cs) * self.mueff)
+        self.ps = [(1 - cs) * p + a * z for p, z in zip(self.ps, zw)]
+        norm = math.sqrt(sum(p * p for p in self.ps))
+        self.gen += 1
+        hsig = norm / math.sqrt(1 - (1 - cs) ** (2 * self.gen)) < (1.4 + 2 / (n + 1)) * self.chin
+        b = math.sqrt(cc * (2 - cc) * self.mueff) if hsig else 0.0
+        self.pc = [(1 - cc) * p + b * y for p, y in zip(self.pc, yw)]
+        c1, cmu = self.c1, self.cmu
+        for j in range(n):
+            rank_mu = sum(w * y[j] * y[j] for w, y in zip(self.w, ys))
+            old = self.diag[j]
+            self.diag[j] = ((1 - c1 - cmu) * old
+                            + c1 * (self.pc[j] ** 2 + (0.0 if hsig else cc * (2 - cc) * old))
+                            + cmu * rank_mu)
+        self.sigma *= math.exp((cs / self.ds) * (norm / self.chin - 1))
+
+
+def tune(
+    level: str,
+    *,
+    generations: int,
+    games: int,
+    popsize: Optional[int] = None,
+    sigma: float = 0.3,
+    seed: int = 0,
+    opponents=DEFAULT_OPPONENTS,
+    workers: Optional[int] = None,
+    validate_games: Optional[int] = None,
+    log=print,
+) -> dict:
+    if level not in WEIGHTED_POLICIES:
+        raise ValueError(f"level must be one of {', '.join(WEIGHTED_POLICIES)}: {level}")
+    for name in opponents:
+        if name not in STRATEGIES:
+            raise ValueError(f"unknown strategy: {name}")
+
+    names = list(default_weights(level))
+    es = SepCMAES(len(names), sigma, random.Random(seed), popsize)
+    ev = Evaluator(level, opponents, games, workers=workers)
+    finalists: list[list[float]] = []
+    t0 = time.perf_counter()
+    try:
+        for g in range(generations):
+            xs = es.ask()
+            # 既定の重みも同じ配りで打たせて、候補の点数を「既定との差」で見る（共通乱数）
+            gen_seed = seed * 1_000_003 + g
+            scores = ev.fitness([None] + [profile_weights(level, x) for x in xs], gen_seed)
+            base, scores = scores[0], scores[1:]
+            es.tell(scores)
+            best = max(range(len(xs)), key=lambda k: scores[k])
+            finalists.append(xs[best])
+            log(f"gen {g + 1:>3}: best {scores[best] - base:+.4f}  mean {sum(scores) / len(scores) - base:+.4f}"
+                f"  (default {base:+.4f})  sigma {es.sigma:.3f}")
+        finalists.append(es.mean)
+
+        # 新しい seed で既定の重みと比べ直す（選んだ世代の配りに合わせ込んだ分を取り除く）
+        validate_games = validate_games or games * 4
+        cands = [profile_weights(level, x) for x in finalists]
+        scores = ev.fitness([None] + cands, seed * 1_000_003 + generations + 1, validate_games)
+        base, scores = scores[0], scores[1:]
+        k = max(range(len(cands)), key=lambda i: scores[i])
+        improved = scores[k] > base
+        weights = cands[k] if improved else default_weights(level)
+        log(f"validation ({validate_games} games): best {scores[k]:+.4f} vs default {base:+.4f}"
+            + ("" if improved else "  -> keep defaults"))
+    finally:
+        ev.close()
+
+    return {
+        "name": f"tuned_{level}",
+        "level": level,
+        "weights": {k: weights[k] for k in names},
+        "fitness": scores[k] if improved else base,
+        "default_fitness": base,
+        "opponents": list(opponents),
+        "seed": seed,
+        "generations": generations,
+        "games_per_candidate": games,
+        "validate_games": validate_games,
+        "games_played": ev.games_played,
+        "elapsed": round(time.perf_counter() - t0, 2),
+    }
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="tune lv2/lv3 scoring weights by self-play")
+    ap.add_argument("--level", default="lv3", help=f"調整するレベル（{', '.join(WEIGHTED_POLICIES)}）")
+    ap.add_argument("--generations", type=int, default=30)
+    ap.add_argument("--games", type=int, default=400, help="1候補あたりのゲーム数（1世代の全候補で同じ配り）")
+    ap.add_argument("--popsize", type=int, default=None, help="1世代の候補数（既定は次元から決める）")
+    ap.add_argument("--sigma", type=float, default=0.3, help="最初の探索の幅（exp(x) の x の標準偏差）")
+    ap.add_argument("--opponents", default=",".join(DEFAULT_OPPONENTS), help="相手の strategy（カンマ区切り）")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=None, help="既定は CPU コア数")
+    ap.add_argument("--validate-games", type=int, default=None, help="最後の比べ直しのゲーム数（既定 games × 4）")
+    ap.add_argument("--out", default=None, help="書き出すプロファイル（JSON）。既定は tuned_<level>.json")
+    args = ap.parse_args(argv)
+
+    profile = tune(
+        args.level,
+        generations=args.generations,
+        games=args.games,
+        popsize=args.popsize,
+        sigma=args.sigma,
+        seed=args.seed,
+        opponents=[x for x in args.opponents.split(",") if x],
+        workers=args.workers,
+        validate_games=args.validate_games,
+    )
+    out = args.out or f"tuned_{args.level}.json"
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(profile, f, ensure_ascii=False, indent=2)
+    print(f"saved: {out} ({profile['games_played']} games, {profile['elapsed']}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+# WebSocket（RFC 6455）の最小実装（標準ライブラリだけ・asyncio のストリーム上）
+#
+#   ws = await accept(reader, writer)        # サーバー側：HTTP の Upgrade を受けて握手
+#   ws = await connect("127.0.0.1", 8765)    # クライアント側（負荷試験・テスト用）
+#   await ws.send_json({...}) / msg = await ws.recv_json()   # 切れたら recv は None
+#
+# テキストとバイナリのメッセージ、分割フレーム、ping / pong / close だけを扱う（拡張・圧縮は無し）。
+# サーバーが送るフレームはマスクしない。クライアントが送るフレームはマスクする（規格どおり）。
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+from typing import Optional, Union
+
+GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONT, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+MAX_MESSAGE = 1 << 20  # 1メッセージの上限（これより大きいものは切断）
+HIGH_WATER = 64 * 1024  # 送信バッファがこれを超えたら drain を待つ
+
+class HandshakeError(Exception):
+    pass
+
+def accept_key(key: Union[str, bytes]) -> str:
+    if isinstance(key, str):
+        key = key.encode("ascii")
+    return base64.b64encode(hashlib.sha1(key.strip() + GUID).digest()).decode("ascii")
+
+def _mask(data: bytes, key: bytes) -> bytes:
+    """4バイトの key で XOR（整数にまとめて1回で）"""
+    n = len(data)
+    if n == 0:
+        return b""
+    k = (key * (n // 4 + 1))[:n]
+    return (int.from_bytes(data, "little") ^ int.from_bytes(k, "little")).to_bytes(n, "little")
+
+async def read_http_head(reader: asyncio.StreamReader) -> tuple[str, dict[str, str]]:
+    """HTTP のリクエスト行（or ステータス行）とヘッダ（名前は小文字）"""
+    try:
+        raw = await reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+        raise HandshakeError("bad http header") from e
+    lines = raw.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    return lines[0], headers
+
+
+class WebSocket:
+    """1本の接続（サーバー側・クライアント側どちらも）"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, *, client: bool, path: str = "/"):
+        self.reader = reader
+        self.writer = writer
+        self.client = client  # True なら送るフレームをマスクする
+        self.path = path
+        self.closed = False
+
+    # ===== 送信 =====
+    def _frame(self, opcode: int, payload: bytes) -> bytes:
+        n = len(payload)
+        mask_bit = 0x80 if self.client else 0
+        if n < 126:
+            head = struct.pack("!BB", 0x80 | opcode, mask_bit | n)
+        elif n < 1 << 16:
+            head = struct.pack("!BBH", 0x80 | opcode, mask_bit | 126, n)
+        else:
+            head = struct.pack("!BBQ", 0x80 | opcode, mask_bit | 127, n)
+        if self.client:
+            key = os.urandom(4)
+            return head + key + _mask(payload, key)
+        return head + payload
+
+    async def send(self, data: Union[str, bytes]):
+        if self.closed:
+            return
+        if isinstance(data, str):
+            frame = self._frame(OP_TEXT, data.encode("utf-8"))
+        else:
+            frame = self._frame(OP_BINARY, data)
+        self.writer.write(frame)
+        # 毎回 drain すると遅いので、たまったときだけ待つ
+        if self.writer.transport.get_write_buffer_size() > HIGH_WATER:
+            await self.writer.drain()
+
+    async def send_json(self, obj) -> None:
+        await self.send(json.dumps(obj, separators=(",", ":")))
+
+    async def close(self, code: int = 1000):
+        if not self.closed:
+            self.closed = True
+            try:
+                self.writer.write(self._frame(OP_CLOSE, struct.pack("!H", code)))
+                await self.writer.drain()
+            except (ConnectionError, RuntimeError):
+                pass
+        self.writer.close()
+
+    # ===== 受信 =====
+    async def _read_frame(self) -> tuple[bool, int, bytes]:
+        b0, b1 = await self.reader.readexactly(2)
+        n = b1 & 0x7F
+        if n == 126:
+            (n,) = struct.unpack("!H", await self.reader.readexactly(2))
+        elif n == 127:
+            (n,) = struct.unpack("!Q", await self.reader.readexactly(8))
+        if n > MAX_MESSAGE:
+            raise ConnectionError("websocket frame too large")
+        key = await self.reader.readexactly(4) if b1 & 0x80 else None
+        payload = await self.reader.readexactly(n)
+        if key is not None:
+            payload = _mask(payload, key)
+        return bool(b0 & 0x80), b0 & 0x0F, payload
+
+    async def recv(self) -> Optional[Union[str, bytes]]:
+        """次のメッセージ（テキストは str、バイナリは bytes）。切れたら None"""
+        parts: list[bytes] = []
+        kind = OP_TEXT
+        try:
+            while True:
+                fin, op, payload = await self._read_frame()
+                if op == OP_PING:
+                    self.writer.write(self._frame(OP_PONG, payload))
+                    continue
+                if op == OP_PONG:
+                    continue
+                if op == OP_CLOSE:
+                    await self.close()
+                    return None
+                if op != OP_CONT:
+                    kind = op
+                    parts = []
+                parts.append(payload)
+                if sum(map(len, parts)) > MAX_MESSAGE:
+                    raise ConnectionError("websocket message too large")
+                if fin:
+                    data = b"".join(parts)
+                    return data.decode("utf-8") if kind == OP_TEXT else data
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self.closed = True
+            self.writer.close()
+            return None
+
+    async def recv_json(self):
+        data = await self.recv()
+        return None if data is None else json.loads(data)
+
+
+async def accept(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, head=None) -> WebSocket:
+    """
+    サーバー側の握手。WebSocket でなければ 400 を返して HandshakeError
+    head: 読み終えた read_http_head() の結果（パスを見てから握手したいとき）
+    """
+    request, headers = head if head is not None else await read_http_head(reader)
+    parts = request.split()
+    key = headers.get("sec-websocket-key")
+    if len(parts) < 2 or headers.get("upgrade", "").lower() != "websocket" or not key:
+        writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+        await writer.drain()
+        writer.close()
+        raise HandshakeError(f"not a websocket request: {request!r}")
+    writer.write(
+        b"HTTP/1.1 101 Switching Protocols\r\n"
+        b"Upgrade: websocket\r\n"
+        b"Connection: Upgrade\r\n"
+        b"Sec-WebSocket-Accept: " + accept_key(key).encode("ascii") + b"\r\n\r\n"
+    )
+    await writer.drain()
+    return WebSocket(reader, writer, client=False, path=parts[1])
+
+async def connect(host: str, port: int, path: str = "/") -> WebSocket:
+    """クライアント側の握手"""
+    reader, writer = await asyncio.open_connection(host, port)
+    key = base64.b64encode(os.urandom(16)).decode("ascii")
+    writer.write(
+        f"GET {path} HTTP/1.1\r\n"
+        f"Host: {host}:{port}\r\n"
+        "Upgrade: websocket\r\n"
+        "Connection: Upgrade\r\n"
+        f"Sec-WebSocket-Key: {key}\r\n"
+        "Sec-WebSocket-Version: 13\r\n\r\n".encode("ascii")
+    )
+    await writer.drain()
+    status, headers = await read_http_head(reader)
+    if status.split()[1:2] != ["101"] or headers.get("sec-websocket-accept") != accept_key(key):
+        writer.close()
+        raise HandshakeError(f"websocket handshake failed: {status!r}")
+    return WebSocket(reader, writer, client=True, path=path)